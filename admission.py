@@ -0,0 +1,109 @@
+import math
+import threading
+import time
+from collections import OrderedDict
+
+
+class RateLimiter:
+    """Token buckets per key (client IP, roll number, ...), held in process memory.
+
+    Each key may spend ``burst`` requests at once and earns ``rate`` more
+    per second after that. Buckets live in an LRU of ``maxsize`` keys; an
+    evicted key just starts again with a full bucket, so memory stays
+    bounded under a flood of distinct keys.
+    """
+
+    def __init__(self, name, rate, burst, maxsize=100_000):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> [tokens, last refill time]
+        self._allowed = 0
+        self._rejected = 0
+        self._evicted = 0
+
+    def hit(self, key, cost=1):
+        """Spend ``cost`` tokens for ``key``; returns 0 if allowed, else seconds until it would be"""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                bucket = self._buckets[key] = [self.burst, now]
+                if len(self._buckets) > self.maxsize:
+                    self._buckets.popitem(last=False)
+                    self._evicted += 1
+            else:
+                self._buckets.move_to_end(key)
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+
+            if bucket[0] >= cost:
+                bucket[0] -= cost
+                self._allowed += 1
+                return 0.0
+            self._rejected += 1
+            return (cost - bucket[0]) / self.rate
+
+    def stats(self):
+        with self._lock:
+            return {
+                "rate_per_s": self.rate,
+                "burst": self.burst,
+                "keys": len(self._buckets),
+                "allowed": self._allowed,
+                "rejected": self._rejected,
+                "evicted": self._evicted,
+            }
+
+
+class ConcurrencyLimiter:
+    """Caps how many requests run an expensive section at once.
+
+    A request that cannot get a slot within ``wait`` seconds is turned away
+    instead of queueing behind the others, so a burst is answered quickly
+    with 503 rather than piling up threads and DB connections.
+    """
+
+    def __init__(self, name, limit, wait=0.0):
+        self.name = name
+        self.limit = limit
+        self.wait = wait
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._peak = 0
+        self._admitted = 0
+        self._rejected = 0
+
+    def acquire(self):
+        if not self._slots.acquire(timeout=self.wait):
+            with self._lock:
+                self._rejected += 1
+            return False
+        with self._lock:
+            self._in_flight += 1
+            self._peak = max(self._peak, self._in_flight)
+            self._admitted += 1
+        return True
+
+    def release(self):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "peak": self._peak,
+                "admitted": self._admitted,
+                "rejected": self._rejected,
+            }
+
+
+def retry_after_header(seconds):
+    """Retry-After value: whole seconds, at least 1"""
+    return str(max(1, math.ceil(seconds)))
@@ -1,23 +1,97 @@
-from flask import Flask, render_template, request, send_from_directory, session, send_file, redirect
+from flask import Flask, g, request, send_from_directory, session, send_file, redirect, jsonify, Response, stream_with_context, url_for
+from flask import render_template as flask_render_template
 import json
-import qrcode
+import base64
+import hashlib
+import hmac
+import multiprocessing
 import os
+import secrets
+import shutil
+import smtplib
+import ssl
+import tempfile
+import threading
+import time
 from werkzeug.utils import secure_filename
-import pandas as pd
+from werkzeug.middleware.proxy_fix import ProxyFix
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 from io import BytesIO
 import cloudinary
 import cloudinary.uploader
 from dotenv import load_dotenv
 import mysql.connector
-from mysql.connector import Error
+from mysql.connector import Error, errorcode
 import traceback
+from db_pool import ConnectionPool
+from upload_queue import UploadQueue, LocalUploader
+import exports
+import logging
+from logging_setup import configure_logging, init_request_logging
+from qr_cache import QRCodeCache, render_qr_png
+from dedup import RegistrationFilter, normalize_identity
+from batch_writer import BatchWriter
+import csv
+import click
+from events import parse_events_with_categories
+from pricing import PricingEngine, DEFAULT_CATALOG_PATH, count_group_members
+from metrics import REGISTRY, timed, init_request_metrics
+from profiler import SlowRequestProfiler, init_slow_request_profiler
+from screenshots import InvalidScreenshot, ScreenshotNormalizer, validate_screenshot
+import registration_stats
+import outbox
+from outbox import OutboxDispatcher
+from admission import RateLimiter, ConcurrencyLimiter, retry_after_header
+from change_feed import ChangeFeed, sse_frame
+import idempotency
+from tickets import TicketSigner, InvalidTicket
+from checkin import CheckInLog, CheckInService
+from idempotency import MemoryIdempotencyStore, SQLiteIdempotencyStore
+from session_store import ServerSideSessionInterface, MemorySessionBackend, SQLiteSessionBackend
+from migrations import (MigrationError, LATEST_VERSION, create_database, migrate,
+                        pending_migrations, schema_version)
+
+_import_started = time.perf_counter()
 
 # Load environment variables
 load_dotenv()
 
+# JSON logs via a background queue listener; DEBUG lines are sampled at LOG_DEBUG_SAMPLE_RATE
+configure_logging(
+    level=os.getenv('LOG_LEVEL', 'INFO').upper(),
+    debug_sample_rate=float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '0.01'))
+)
+logger = logging.getLogger(__name__)
+
 app = Flask(__name__)
 app.secret_key = "zeal10_secret_key_2025"
+init_request_logging(app)
+init_request_metrics(app)
+
+# ---------------- METRICS ----------------
+# Helper timings are recorded with @timed; everything is exposed on /metrics
+TEMPLATE_SECONDS = REGISTRY.histogram(
+    "zeal_template_render_seconds", "render_template() time per template", ("template",)
+)
+DB_CONNECT_FAILURES = REGISTRY.counter(
+    "zeal_db_connect_failures", "get_db_connection() calls that returned no connection"
+)
+DUPLICATE_CHECKS = REGISTRY.counter(
+    "zeal_duplicate_checks", "is_already_registered() by result (filter_skip means no DB query)", ("result",)
+)
+REQUEST_KEY_OUTCOMES = REGISTRY.counter(
+    "zeal_request_key_outcomes", "Final-step submissions by request key outcome", ("outcome",)
+)
+ADMISSION_REJECTIONS = REGISTRY.counter(
+    "zeal_admission_rejections", "Registration POSTs turned away by admission control", ("reason",)
+)
+
+def render_template(template_name, **context):
+    """flask.render_template, timed per template"""
+    with TEMPLATE_SECONDS.labels(template=template_name).time():
+        return flask_render_template(template_name, **context)
 
 # ---------------- CLOUDINARY CONFIG ----------------
 cloudinary.config(
@@ -27,197 +101,447 @@ cloudinary.config(
 )
 
 # ---------------- CONFIG ----------------
-QR_DIR = "static/qr"
-os.makedirs(QR_DIR, exist_ok=True)
+# Payment QR PNGs are rendered in memory and cached per amount.
+# QR_PREWARM=1 renders every achievable total in the background at startup.
+QR_CACHE_SIZE = int(os.getenv('QR_CACHE_SIZE', '256'))
+QR_PREWARM = os.getenv('QR_PREWARM', '0') == '1'
+UPI_ID = "mangalmayinstituteof.69356291@hdfcbank"
 
 ALLOWED_EXTENSIONS = {"png", "jpg", "jpeg"}
 
+# Request bodies over MAX_UPLOAD_MB are refused with 413 from the Content-Length
+# header, before the body is read. Screenshots are re-encoded in the upload
+# workers to at most SCREENSHOT_MAX_SIDE px / SCREENSHOT_MAX_KB before upload.
+MAX_UPLOAD_MB = float(os.getenv('MAX_UPLOAD_MB', '10'))
+app.config['MAX_CONTENT_LENGTH'] = int(MAX_UPLOAD_MB * 1024 * 1024)
+SCREENSHOT_MAX_SIDE = int(os.getenv('SCREENSHOT_MAX_SIDE', '1920'))
+SCREENSHOT_MAX_KB = int(os.getenv('SCREENSHOT_MAX_KB', '400'))
+SCREENSHOT_FORMAT = os.getenv('SCREENSHOT_FORMAT', 'JPEG')  # or WEBP: smaller files, slower to encode
+
+# Event prices and discount rules; edits to the file are picked up without a restart
+EVENT_CATALOG_PATH = os.getenv('EVENT_CATALOG_PATH', DEFAULT_CATALOG_PATH)
+pricing_engine = PricingEngine(EVENT_CATALOG_PATH)
+
+# Payment screenshots are spooled locally and uploaded in the background.
+# SCREENSHOT_UPLOADER=local stores them under static/uploads instead of Cloudinary.
+UPLOAD_SPOOL_DIR = os.getenv('UPLOAD_SPOOL_DIR', 'spool/uploads')
+UPLOAD_WORKERS = int(os.getenv('UPLOAD_WORKERS', '2'))
+UPLOAD_MAX_ATTEMPTS = int(os.getenv('UPLOAD_MAX_ATTEMPTS', '6'))
+SCREENSHOT_UPLOADER = os.getenv('SCREENSHOT_UPLOADER', 'cloudinary')
+
+# ---------------- ADMISSION CONTROL ----------------
+# Registration POSTs are rate limited per client IP and per roll number
+# (token buckets: *_BURST at once, then *_PER_MIN per minute), and the
+# expensive steps run at most MAX_CONCURRENT_* at a time; anything over is
+# answered at once with 429/503 and Retry-After. Limits are per worker
+# process. Behind a reverse proxy set TRUSTED_PROXIES to the number of
+# proxies so the client IP is taken from X-Forwarded-For.
+#
+# The per-IP limit is off unless RATE_LIMIT_IP_PER_MIN is set. A campus
+# NATs every student behind one address and each registration is about
+# three POSTs (details, qr, final), so size it as three times the peak
+# registrations per minute expected from the busiest network, divided by
+# the worker count. The per-roll limit and the concurrency caps protect
+# the expensive steps either way.
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+RATE_LIMIT_IP_PER_MIN = float(os.getenv('RATE_LIMIT_IP_PER_MIN', '0'))
+RATE_LIMIT_IP_BURST = int(os.getenv('RATE_LIMIT_IP_BURST', '100'))
+RATE_LIMIT_ROLL_PER_MIN = float(os.getenv('RATE_LIMIT_ROLL_PER_MIN', '6'))
+RATE_LIMIT_ROLL_BURST = int(os.getenv('RATE_LIMIT_ROLL_BURST', '5'))
+MAX_CONCURRENT_UPLOADS = int(os.getenv('MAX_CONCURRENT_UPLOADS', '8'))
+MAX_CONCURRENT_QR = int(os.getenv('MAX_CONCURRENT_QR', '16'))
+ADMISSION_WAIT_MS = int(os.getenv('ADMISSION_WAIT_MS', '100'))
+TRUSTED_PROXIES = int(os.getenv('TRUSTED_PROXIES', '0'))
+
+if TRUSTED_PROXIES:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=TRUSTED_PROXIES, x_proto=TRUSTED_PROXIES)
+
+ip_limiter = RateLimiter("ip", RATE_LIMIT_IP_PER_MIN / 60, RATE_LIMIT_IP_BURST) if RATE_LIMIT_IP_PER_MIN > 0 else None
+roll_limiter = RateLimiter("roll", RATE_LIMIT_ROLL_PER_MIN / 60, RATE_LIMIT_ROLL_BURST)
+step_limiters = {
+    "final": ConcurrencyLimiter("final", MAX_CONCURRENT_UPLOADS, wait=ADMISSION_WAIT_MS / 1000),
+    "qr": ConcurrencyLimiter("qr", MAX_CONCURRENT_QR, wait=ADMISSION_WAIT_MS / 1000),
+}
+
+def reject(status, reason, retry_after):
+    """Short 429/503 with Retry-After; deliberately cheaper than rendering the form"""
+    ADMISSION_REJECTIONS.labels(reason=reason).inc()
+    logger.info("Request rejected by admission control", extra={"reason": reason, "status": status})
+    message = ("Too many attempts. Please wait a moment and try again."
+               if status == 429 else "Registrations are very busy right now. Please try again in a few seconds.")
+    return Response(message, status=status, mimetype="text/plain",
+                    headers={"Retry-After": retry_after_header(retry_after)})
+
+@app.before_request
+def _limit_registration_posts():
+    # Runs before the multipart body is parsed, so a flood costs almost nothing
+    if not RATE_LIMIT_ENABLED or ip_limiter is None or request.method != "POST" or request.endpoint != "register":
+        return None
+    wait = ip_limiter.hit(request.remote_addr or "unknown")
+    if wait:
+        return reject(429, "ip", wait)
+    return None
+
+def admit_step(step, roll):
+    """Per-roll rate limit and concurrency slot for a registration step; a response if refused
+    
+    The slot is held until the request ends (released in teardown).
+    """
+    if not RATE_LIMIT_ENABLED:
+        return None
+    if roll:
+        wait = roll_limiter.hit(normalize_identity(roll))
+        if wait:
+            return reject(429, "roll", wait)
+    limiter = step_limiters.get(step)
+    if limiter is not None:
+        if not limiter.acquire():
+            return reject(503, f"busy_{step}", 1)
+        g.admission_slot = limiter
+    return None
+
+@app.teardown_request
+def _release_admission_slot(exc):
+    limiter = g.pop("admission_slot", None)
+    if limiter is not None:
+        limiter.release()
+
+# ---------------- SESSIONS ----------------
+# Form state is kept server-side and the cookie only carries a session id.
+# SESSION_BACKEND: sqlite (default; one file shared by all workers on the host),
+# memory (per-process LRU, single worker only) or cookie (Flask's signed cookie).
+SESSION_BACKEND = os.getenv('SESSION_BACKEND', 'sqlite')
+SESSION_TTL = int(os.getenv('SESSION_TTL', '3600'))
+SESSION_SQLITE_PATH = os.getenv('SESSION_SQLITE_PATH', 'spool/sessions.sqlite3')
+SESSION_MEMORY_SIZE = int(os.getenv('SESSION_MEMORY_SIZE', '10000'))
+
+session_backend = None
+if SESSION_BACKEND == 'sqlite':
+    os.makedirs(os.path.dirname(os.path.abspath(SESSION_SQLITE_PATH)), exist_ok=True)
+    session_backend = SQLiteSessionBackend(SESSION_SQLITE_PATH, ttl=SESSION_TTL)
+elif SESSION_BACKEND == 'memory':
+    session_backend = MemorySessionBackend(maxsize=SESSION_MEMORY_SIZE, ttl=SESSION_TTL)
+elif SESSION_BACKEND != 'cookie':
+    raise ValueError(f"Unknown SESSION_BACKEND: {SESSION_BACKEND}")
+if session_backend is not None:
+    app.session_interface = ServerSideSessionInterface(session_backend)
+
+# ---------------- IDEMPOTENT SUBMISSIONS ----------------
+# The qr step issues a request key that the final step sends back. The first
+# final POST with a key claims it; a retry of the same key (slow network,
+# double tap, refresh) gets the first attempt's success page instead of a
+# second insert and screenshot upload, waiting up to IDEMPOTENCY_WAIT_MS if
+# that attempt is still running. A failed attempt releases its key. Finished
+# keys are kept for IDEMPOTENCY_TTL seconds; a claim whose worker died frees
+# up after IDEMPOTENCY_LEASE. IDEMPOTENCY_BACKEND: sqlite (shared by the
+# workers on the host) or memory (single worker only).
+IDEMPOTENCY_BACKEND = os.getenv('IDEMPOTENCY_BACKEND', 'sqlite')
+IDEMPOTENCY_SQLITE_PATH = os.getenv('IDEMPOTENCY_SQLITE_PATH', 'spool/idempotency.sqlite3')
+IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', '86400'))
+IDEMPOTENCY_LEASE = int(os.getenv('IDEMPOTENCY_LEASE', '120'))
+IDEMPOTENCY_WAIT_MS = int(os.getenv('IDEMPOTENCY_WAIT_MS', '5000'))
+
+if IDEMPOTENCY_BACKEND == 'sqlite':
+    os.makedirs(os.path.dirname(os.path.abspath(IDEMPOTENCY_SQLITE_PATH)), exist_ok=True)
+    idempotency_store = SQLiteIdempotencyStore(IDEMPOTENCY_SQLITE_PATH, ttl=IDEMPOTENCY_TTL, lease=IDEMPOTENCY_LEASE)
+elif IDEMPOTENCY_BACKEND == 'memory':
+    idempotency_store = MemoryIdempotencyStore(ttl=IDEMPOTENCY_TTL, lease=IDEMPOTENCY_LEASE)
+else:
+    raise ValueError(f"Unknown IDEMPOTENCY_BACKEND: {IDEMPOTENCY_BACKEND}")
+
+def claim_request_key(key, roll, email):
+    """Claim a final-step request key; returns an idempotency.Claim
+    
+    The key is bound to the roll number and email it was first used with.
+    While another request holds it, polls until that request finishes or
+    IDEMPOTENCY_WAIT_MS runs out (and then answers PENDING).
+    """
+    fingerprint = f"{normalize_identity(roll)}|{normalize_identity(email)}"
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_MS / 1000
+    while True:
+        claim = idempotency_store.claim(key, fingerprint)
+        if claim.state != idempotency.PENDING or time.monotonic() >= deadline:
+            break
+        time.sleep(0.1)
+    REQUEST_KEY_OUTCOMES.labels(outcome=claim.state).inc()
+    if claim.state == idempotency.CLAIMED:
+        g.request_key = key
+    return claim
+
+def complete_request_key(registration_id, ticket):
+    """Record the outcome of the request key this request claimed, if any"""
+    key = g.pop("request_key", None)
+    if key is not None:
+        idempotency_store.complete(key, {"registration_id": registration_id, "ticket": ticket})
+
+@app.teardown_request
+def _release_request_key(exc):
+    # Still held means the attempt did not finish; let the student retry with the key
+    key = g.pop("request_key", None)
+    if key is not None:
+        try:
+            idempotency_store.release(key)
+        except Exception as e:
+            logger.error("Could not release request key: %s", e)
+
 # ---------------- MYSQL CONFIG ----------------
 DB_CONFIG = {
     'host': os.getenv('MYSQL_HOST', 'localhost'),
     'user': os.getenv('MYSQL_USER', 'root'),
     'password': os.getenv('MYSQL_PASSWORD', ''),
     'database': os.getenv('MYSQL_DATABASE', 'zeal10_db'),
-    
+    # Fail fast instead of hanging workers and probes when MySQL is unreachable
+    'connection_timeout': int(os.getenv('MYSQL_CONNECT_TIMEOUT', '5')),
 }
 
-# ---------------- EVENTS & PRICES ----------------
-EVENT_PRICES = {
-    "Business Idea Pitching Contest (Case Cracker)": 100,
-    "Caselet Solving Competition": 100,
-    "Paper / Balloon Tower Making (Paper Peaks)": 100,
-    "Corporate Collage (Bizmosaic)": 100,
-    "Sales Pitching Contest (DealQuest)": 100,
-    "Turbo AI Challenge": 100,
-    "INNO Quest": 100,
-    "Robo Race": 100,
-    "CODING": 100,
-    "Clip Clash – REEL": 100,
-    "Quiz Competition": 100,
-    "Poster Making (Tech Theme)": 100,
-    "Rangoli Competition": 100,
-    "Cook without Fire": 100,
-    "Ad-Mad Show": 100,
-    "Eco-Fashion / Recycled Clothing Show": 100,
-    "T-Shirt Painting": 100,
-    "Eco-Voice Debate / GreenSpeak Debate": 100,
-    "Face Painting Competition": 100,
-    "BGMI": 100,
-    "Beat Boxing": 100,
-    "Band": 500,
-    "Stand up Comedy (Mike & Madness)": 100,
-    "Nail Art Competition (Nail Fusion)": 100,
-    # Category-based events
-    "Dance Competition - Solo": 100,
-    "Dance Competition - Duet": 200,
-    "Dance Competition - Group": 300,
-    "Fashion Show Competition - Solo": 100,
-    "Fashion Show Competition - Duet": 200,
-    "Fashion Show Competition - Group": 300,
-    "Singing - Solo": 100,
-    "Singing - Duet": 200,
-}
+# Duplicate-check bloom filter: how often (seconds) to fold in rows added by other workers
+DEDUP_REFRESH_INTERVAL = float(os.getenv('DEDUP_REFRESH_INTERVAL', '30'))
+
+# Write-behind batching for registration inserts (group commit). Off by default;
+# when on, rows are flushed every REGISTRATION_BATCH_SIZE rows or
+# REGISTRATION_BATCH_WAIT_MS milliseconds, whichever comes first. A request
+# whose batch takes longer than REGISTRATION_BATCH_TIMEOUT seconds logs a
+# warning and keeps waiting, up to REGISTRATION_BATCH_GIVE_UP seconds in all;
+# then it answers 503 and the screenshot follows the row if the batch commits.
+REGISTRATION_BATCHING = os.getenv('REGISTRATION_BATCHING', '0') == '1'
+REGISTRATION_BATCH_SIZE = int(os.getenv('REGISTRATION_BATCH_SIZE', '50'))
+REGISTRATION_BATCH_WAIT_MS = float(os.getenv('REGISTRATION_BATCH_WAIT_MS', '10'))
+REGISTRATION_BATCH_TIMEOUT = float(os.getenv('REGISTRATION_BATCH_TIMEOUT', '30'))
+REGISTRATION_BATCH_GIVE_UP = float(os.getenv('REGISTRATION_BATCH_GIVE_UP', '90'))
+
+# Connection pool sizing (connections, seconds)
+DB_POOL_SIZE = int(os.getenv('MYSQL_POOL_SIZE', '10'))
+DB_POOL_TIMEOUT = float(os.getenv('MYSQL_POOL_TIMEOUT', '5'))
+DB_POOL_PING_INTERVAL = float(os.getenv('MYSQL_POOL_PING_INTERVAL', '30'))
+
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    size=DB_POOL_SIZE,
+    timeout=DB_POOL_TIMEOUT,
+    ping_interval=DB_POOL_PING_INTERVAL
+)
 
 # ---------------- DATABASE FUNCTIONS ----------------
+@timed("get_db_connection")
 def get_db_connection():
-    """Create and return a database connection"""
+    """Check a connection out of the pool; close() returns it"""
     try:
-        connection = mysql.connector.connect(**DB_CONFIG)
-        if connection.is_connected():
-            return connection
+        return db_pool.acquire()
     except Error as e:
-        print(f"Error connecting to MySQL: {e}")
+        DB_CONNECT_FAILURES.inc()
+        logger.error("Error connecting to MySQL: %s", e, extra={"pool": db_pool.stats()})
         return None
 
-def init_db():
-    """Initialize MySQL database and create tables if they don't exist"""
+def run_migrations(target=None):
+    """Create the database if needed and apply pending schema migrations
+    
+    Run once per deploy with `flask migrate`, not on import: web workers only
+    check the schema version (see /readyz).
+    """
+    create_database(DB_CONFIG)
+    connection = get_db_connection()
+    if connection is None:
+        raise MigrationError("Failed to connect to database")
     try:
-        # First, connect without specifying database to create it if needed
-        temp_config = DB_CONFIG.copy()
-        database_name = temp_config.pop('database')
-        
-        connection = mysql.connector.connect(**temp_config)
-        cursor = connection.cursor()
-        
-        # Create database if not exists
-        cursor.execute(f"CREATE DATABASE IF NOT EXISTS {database_name}")
-        print(f"Database '{database_name}' checked/created successfully!")
-        
-        cursor.close()
+        return migrate(connection, target)
+    finally:
         connection.close()
-        
-        # Now connect to the specific database
+
+@app.cli.command("migrate")
+@click.option("--status", is_flag=True, help="Show applied and pending migrations without running them")
+@click.option("--target", type=int, default=None, help="Stop after this version (default: latest)")
+def migrate_command(status, target):
+    """Create the database and bring its schema up to date."""
+    if status:
         connection = get_db_connection()
         if connection is None:
-            print("Failed to connect to database!")
-            return False
-            
+            raise click.ClickException("Failed to connect to database")
+        try:
+            click.echo(f"schema version: {schema_version(connection)} (latest {LATEST_VERSION})")
+            for version, description, _ in pending_migrations(connection):
+                click.echo(f"pending: {version} {description}")
+        finally:
+            connection.close()
+        return
+    
+    try:
+        applied = run_migrations(target)
+    except (Error, MigrationError) as e:
+        raise click.ClickException(str(e))
+    click.echo(f"applied: {', '.join(map(str, applied))}" if applied else "schema is up to date")
+
+class DuplicateRegistrationError(Exception):
+    """The roll number or email is already registered"""
+
+class RegistrationPendingError(Exception):
+    """A batched insert outlived REGISTRATION_BATCH_GIVE_UP; ``future`` still resolves when it ends"""
+
+    def __init__(self, future):
+        super().__init__("Registration batch did not finish in time")
+        self.future = future
+
+REGISTRATION_INSERT_QUERY = """
+INSERT INTO registrations 
+(student_name, roll_no,email, course, college, college_id, other_college, 
+ events, group_members, contact_numbers, total_amount, 
+ payment_screenshot_url, payment_status, screenshot_status)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def registration_values(registration_data):
+    """Parameter tuple for REGISTRATION_INSERT_QUERY"""
+    return (
+        registration_data['student_name'],
+        registration_data['roll_no'],
+        registration_data['email'],
+        registration_data['course'],
+        registration_data['college'],
+        registration_data.get('college_id', ''),
+        registration_data.get('other_college', ''),
+        registration_data['events'],
+        registration_data.get('group_members', ''),
+        registration_data['contact_numbers'],
+        registration_data['total_amount'],
+        registration_data['payment_screenshot_url'],
+        registration_data.get('payment_status', 'Submitted'),
+        registration_data.get('screenshot_status', 'Uploaded')
+    )
+
+@timed("add_registration")
+def add_registration(registration_data):
+    """Add a new registration to the database
+    
+    With REGISTRATION_BATCHING enabled the row is queued and committed in one
+    transaction together with concurrent registrations; the call still
+    returns this row's id. A batch slower than REGISTRATION_BATCH_TIMEOUT
+    is logged and waited for, since it may still commit; one still running
+    after REGISTRATION_BATCH_GIVE_UP raises RegistrationPendingError, whose
+    future tells the caller how it ended. Raises DuplicateRegistrationError
+    when the unique roll_no/email constraints reject the row.
+    """
+    if REGISTRATION_BATCHING:
+        future = registration_writer.submit(registration_data)
+        try:
+            return future.result(timeout=REGISTRATION_BATCH_TIMEOUT)
+        except FutureTimeout:
+            logger.warning("Registration batch slow; still waiting for it", extra=registration_writer.stats())
+        try:
+            return future.result(timeout=max(0.0, REGISTRATION_BATCH_GIVE_UP - REGISTRATION_BATCH_TIMEOUT))
+        except FutureTimeout:
+            logger.error("Registration batch still running; giving up on it", extra=registration_writer.stats())
+            raise RegistrationPendingError(future)
+    
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
+    try:
         cursor = connection.cursor()
-        
-        # Create registrations table
-        create_table_query = """
-        CREATE TABLE IF NOT EXISTS registrations (
-            id INT AUTO_INCREMENT PRIMARY KEY,
-            student_name VARCHAR(255) NOT NULL,
-            roll_no VARCHAR(100) NOT NULL,
-            email VARCHAR(255) NOT NULL,
-            course VARCHAR(255) NOT NULL,
-            college VARCHAR(255) NOT NULL,
-            college_id VARCHAR(100),
-            other_college VARCHAR(255),
-            events TEXT NOT NULL,
-            group_members TEXT,
-            contact_numbers VARCHAR(255) NOT NULL,
-            total_amount DECIMAL(10, 2) NOT NULL,
-            payment_screenshot_url TEXT NOT NULL,
-            payment_status VARCHAR(50) DEFAULT 'Submitted',
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            INDEX idx_student_name (student_name),
-            INDEX idx_roll_no (roll_no),
-            INDEX idx_college (college),
-            INDEX idx_created_at (created_at)
-        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
-        """
-        
-        cursor.execute(create_table_query)
+        cursor.execute(REGISTRATION_INSERT_QUERY, registration_values(registration_data))
+        registration_id = cursor.lastrowid
+        registration_stats.record_registrations(cursor, [(registration_id, registration_data)])
+        if CONFIRMATION_EMAILS:
+            outbox.enqueue(cursor, [outbox.confirmation(registration_id, registration_data)])
         connection.commit()
         
-        print("Table 'registrations' checked/created successfully!")
-        print("Database initialization completed!")
+        registration_filter.add(registration_data['roll_no'], registration_data['email'], registration_id)
+        
+        logger.info("Registration added", extra={"registration_id": registration_id})
         
         cursor.close()
-        connection.close()
-        return True
         
+        return registration_id
+        
+    except mysql.connector.IntegrityError as e:
+        if e.errno == errorcode.ER_DUP_ENTRY:
+            logger.info("Duplicate registration rejected: %s", e)
+            raise DuplicateRegistrationError(str(e))
+        logger.exception("Error adding registration: %s", e)
+        raise
     except Error as e:
-        print(f"Error during database initialization: {e}")
-        traceback.print_exc()
-        return False
+        logger.exception("Error adding registration: %s", e)
+        raise
+    finally:
+        connection.close()
 
-def add_registration(registration_data):
-    """Add a new registration to the database"""
+def insert_registrations(batch, send_confirmations=True):
+    """Insert a group of registrations in a single transaction
+    
+    Returns one entry per row, in order: the new id, or the exception that
+    rejected that row. The group goes in with one multi-row INSERT; if a
+    duplicate spoils it, the rows are retried one by one inside the same
+    transaction so only the duplicates fail. Either way there is one commit,
+    which also covers the rows' registration_events and stats updates and,
+    with ``send_confirmations``, their confirmation emails in the outbox.
+    """
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
     try:
-        connection = get_db_connection()
-        if connection is None:
-            raise Exception("Database connection failed")
-            
         cursor = connection.cursor()
+        try:
+            cursor.executemany(REGISTRATION_INSERT_QUERY, [registration_values(row) for row in batch])
+            if len(batch) == 1:
+                results = [cursor.lastrowid]
+            else:
+                # roll_no is unique, so it maps the new ids back to their rows
+                rolls = [row['roll_no'] for row in batch]
+                cursor.execute(
+                    f"SELECT id, roll_no FROM registrations WHERE roll_no IN ({', '.join(['%s'] * len(rolls))})",
+                    rolls
+                )
+                ids = {normalize_identity(roll): row_id for row_id, roll in cursor.fetchall()}
+                results = [ids[normalize_identity(roll)] for roll in rolls]
+        except mysql.connector.IntegrityError as e:
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            connection.rollback()
+            results = []
+            for row in batch:
+                try:
+                    cursor.execute(REGISTRATION_INSERT_QUERY, registration_values(row))
+                    results.append(cursor.lastrowid)
+                except mysql.connector.IntegrityError as row_error:
+                    if row_error.errno != errorcode.ER_DUP_ENTRY:
+                        raise
+                    results.append(DuplicateRegistrationError(str(row_error)))
         
-        insert_query = """
-        INSERT INTO registrations 
-        (student_name, roll_no,email, course, college, college_id, other_college, 
-         events, group_members, contact_numbers, total_amount, 
-         payment_screenshot_url, payment_status)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,%s)
-        """
-        
-        values = (
-            registration_data['student_name'],
-            registration_data['roll_no'],
-            registration_data['email'],
-            registration_data['course'],
-            registration_data['college'],
-            registration_data.get('college_id', ''),
-            registration_data.get('other_college', ''),
-            registration_data['events'],
-            registration_data.get('group_members', ''),
-            registration_data['contact_numbers'],
-            registration_data['total_amount'],
-            registration_data['payment_screenshot_url'],
-            registration_data.get('payment_status', 'Submitted')
-        )
-        
-        cursor.execute(insert_query, values)
+        inserted_rows = [(result, row) for row, result in zip(batch, results) if not isinstance(result, Exception)]
+        registration_stats.record_registrations(cursor, inserted_rows)
+        if send_confirmations and CONFIRMATION_EMAILS:
+            outbox.enqueue(cursor, [outbox.confirmation(result, row) for result, row in inserted_rows])
         connection.commit()
-        
-        registration_id = cursor.lastrowid
-        
-        print(f"Registration added successfully with ID: {registration_id}")
-        
         cursor.close()
-        connection.close()
-        
-        return registration_id
         
+        for row, result in zip(batch, results):
+            if not isinstance(result, Exception):
+                registration_filter.add(row['roll_no'], row['email'], result)
+        inserted = sum(1 for result in results if not isinstance(result, Exception))
+        logger.info("Batch insert committed", extra={"inserted": inserted, "batch_size": len(batch)})
+        return results
+    
     except Error as e:
-        print(f"Error adding registration: {e}")
-        traceback.print_exc()
+        logger.exception("Error in batch insert: %s", e)
+        connection.rollback()
         raise
+    finally:
+        connection.close()
 
 def get_all_registrations():
     """Get all registrations sorted by created_at (newest first)"""
+    connection = get_db_connection()
+    if connection is None:
+        return []
+    
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return []
-            
         cursor = connection.cursor(dictionary=True)
         
         query = """
         SELECT id, student_name, roll_no, email, course, college, college_id, 
                other_college, events, group_members, contact_numbers, 
                total_amount, payment_screenshot_url, payment_status, 
-               created_at
+               screenshot_status, created_at
         FROM registrations
         ORDER BY created_at DESC
         """
@@ -225,25 +549,252 @@ def get_all_registrations():
         cursor.execute(query)
         registrations = cursor.fetchall()
         
-        print(f"Retrieved {len(registrations)} registrations from database")
+        logger.debug("Retrieved %d registrations from database", len(registrations))
         
         cursor.close()
-        connection.close()
         
         return registrations
         
     except Error as e:
-        print(f"Error retrieving registrations: {e}")
-        traceback.print_exc()
+        logger.exception("Error retrieving registrations: %s", e)
         return []
+    finally:
+        connection.close()
+
+def iter_registrations(batch_size=1000):
+    """Stream every registration (newest first) through an unbuffered server-side cursor
+    
+    Rows are pulled from MySQL batch_size at a time, so callers can export the
+    whole table without holding it in memory. The pooled connection is held
+    until the generator is exhausted or closed.
+    """
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
+    try:
+        cursor = connection.cursor(dictionary=True, buffered=False)
+        cursor.execute(
+            """
+            SELECT id, student_name, roll_no, email, course, college, college_id, 
+                   other_college, events, group_members, contact_numbers, 
+                   total_amount, payment_screenshot_url, payment_status, 
+                   screenshot_status, created_at
+            FROM registrations
+            ORDER BY created_at DESC, id DESC
+            """
+        )
+        try:
+            while True:
+                batch = cursor.fetchmany(batch_size)
+                if not batch:
+                    break
+                yield from batch
+        finally:
+            try:
+                cursor.close()
+            except Error:
+                # Abandoned mid-stream; the pool discards the connection if it is unusable
+                pass
+    finally:
+        connection.close()
+
+def encode_cursor(row):
+    """Opaque keyset cursor for the row a page ended on"""
+    raw = f"{row['created_at'].isoformat()}|{row['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor_token):
+    """Inverse of encode_cursor; raises ValueError on a malformed token"""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor_token.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+def event_filter(event):
+    """SQL condition and params selecting registration ids for an event
+    
+    The admin filters send event names as the catalog lists them, so a
+    multi-category parent ("Dance Competition") matches every one of its
+    "Parent - Category" entries as well as an exact event name. Both are
+    prefix lookups on idx_event_registration.
+    """
+    return (
+        "SELECT registration_id FROM registration_events WHERE event = %s OR event LIKE %s",
+        [event, f"{event} - %"]
+    )
+
+def get_registrations_page(limit=50, cursor=None, search=None, name=None,
+                           roll_no=None, college=None, event=None):
+    """One page of registrations, newest first, using keyset pagination on (created_at, id)
+    
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    conditions = []
+    params = []
+    
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        conditions.append("(created_at < %s OR (created_at = %s AND id < %s))")
+        params.extend([created_at, created_at, row_id])
+    if name:
+        conditions.append("student_name LIKE %s")
+        params.append(f"{name}%")
+    if roll_no:
+        conditions.append("roll_no LIKE %s")
+        params.append(f"{roll_no}%")
+    if college:
+        conditions.append("college = %s")
+        params.append(college)
+    if event:
+        event_query, event_params = event_filter(event)
+        conditions.append(f"id IN ({event_query})")
+        params.extend(event_params)
+    if search:
+        conditions.append(
+            "(student_name LIKE %s OR roll_no LIKE %s OR college LIKE %s OR email LIKE %s OR events LIKE %s)"
+        )
+        params.extend([f"%{search}%"] * 5)
+    
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    query = f"""
+    SELECT id, student_name, roll_no, email, course, college, college_id, 
+           other_college, events, group_members, contact_numbers, 
+           total_amount, payment_screenshot_url, payment_status, 
+           screenshot_status, created_at
+    FROM registrations
+    {where}
+    ORDER BY created_at DESC, id DESC
+    LIMIT %s
+    """
+    # Fetch one extra row to know whether another page exists
+    params.append(limit + 1)
+    
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
+    try:
+        cursor_obj = connection.cursor(dictionary=True)
+        cursor_obj.execute(query, params)
+        rows = cursor_obj.fetchall()
+        cursor_obj.close()
+    finally:
+        connection.close()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1])
+    return rows, next_cursor
+
+PARTICIPANT_COLUMNS = """
+    r.id, r.student_name, r.roll_no, r.email, r.course, r.college, r.events,
+    r.group_members, r.contact_numbers, r.total_amount, r.payment_status, r.created_at
+"""
+
+def _fetch_participants(query, params):
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+    finally:
+        connection.close()
+
+def get_event_participants(event, college=None):
+    """Everyone registered for an event (optionally from one college), sorted by name
+    
+    Looks the event up in registration_events (idx_event_registration), so
+    the cost follows the event's size rather than the whole table. A
+    category parent lists everyone in any of its categories, once.
+    """
+    event_query, params = event_filter(event)
+    query = f"""
+    SELECT {PARTICIPANT_COLUMNS}
+    FROM registrations r
+    WHERE r.id IN ({event_query}) {"AND r.college = %s" if college else ""}
+    ORDER BY r.student_name, r.id
+    """
+    if college:
+        params.append(college)
+    return _fetch_participants(query, params)
+
+def get_college_participants(college, event=None):
+    """Everyone registered from a college (optionally for one event), sorted by name"""
+    if event:
+        return get_event_participants(event, college)
+    query = f"""
+    SELECT {PARTICIPANT_COLUMNS}
+    FROM registrations r
+    WHERE r.college = %s
+    ORDER BY r.student_name, r.id
+    """
+    return _fetch_participants(query, [college])
+
+def get_registration_stats():
+    """Figures for the admin stats cards, read from the materialized registration_stats rows
+    
+    Besides the card values this includes per-event and per-college
+    breakdowns ("events" / "colleges"). Nothing here scans registrations.
+    """
+    connection = get_db_connection()
+    if connection is None:
+        return {}
+    
+    try:
+        cursor = connection.cursor()
+        summary = registration_stats.read(cursor)
+        cursor.close()
+    except Error as e:
+        logger.error("Error reading registration stats: %s", e)
+        return {}
+    finally:
+        connection.close()
+    
+    totals = summary["totals"]
+    home_college = next(
+        (entry for entry in summary["colleges"] if entry["name"] == 'Mangalmay Group of Institutions'), {}
+    )
+    return {
+        "total_registrations": totals["registrations"],
+        "total_revenue": totals["revenue"],
+        "pending": totals["submitted"],
+        "verified": totals["verified"],
+        "mangalmay": home_college.get("registrations", 0),
+        "event_entries": totals["event_entries"],
+        "events": summary["events"],
+        "colleges": summary["colleges"],
+    }
+
+@app.cli.command("rebuild-stats")
+def rebuild_stats_command():
+    """Recompute registration_stats from the registrations table (run while registrations are quiet)."""
+    connection = get_db_connection()
+    if connection is None:
+        raise click.ClickException("Database connection failed")
+    try:
+        cursor = connection.cursor()
+        count = registration_stats.rebuild(cursor)
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+    click.echo(f"Rebuilt stats from {count} registrations")
 
 def get_registration_by_id(registration_id):
     """Get a specific registration by ID"""
+    connection = get_db_connection()
+    if connection is None:
+        return None
+    
     try:
-        connection = get_db_connection()
-        if connection is None:
-            return None
-            
         cursor = connection.cursor(dictionary=True)
         
         query = """
@@ -254,25 +805,424 @@ def get_registration_by_id(registration_id):
         registration = cursor.fetchone()
         
         cursor.close()
-        connection.close()
         
         return registration
         
     except Error as e:
-        print(f"Error retrieving registration: {e}")
+        logger.error("Error retrieving registration: %s", e)
         return None
+    finally:
+        connection.close()
 
-# Initialize database on startup
-print("Initializing database...")
-if init_db():
-    print("Database ready!")
-else:
-    print("Database initialization failed!")
+def update_screenshot(registration_id, url, status):
+    """Record the outcome of a background screenshot upload"""
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            """
+            UPDATE registrations
+            SET payment_screenshot_url = %s, screenshot_status = %s
+            WHERE id = %s
+            """,
+            (url or '', status, registration_id)
+        )
+        connection.commit()
+        cursor.close()
+    finally:
+        connection.close()
+
+# ---------------- BATCHED INSERTS ----------------
+registration_writer = BatchWriter(
+    insert_registrations,
+    max_batch=REGISTRATION_BATCH_SIZE,
+    max_wait=REGISTRATION_BATCH_WAIT_MS / 1000,
+    name="registration-writer"
+)
+
+IMPORT_REQUIRED_FIELDS = ('student_name', 'roll_no', 'email', 'course', 'college', 'contact_numbers', 'events')
+
+def import_registrations_csv(path, batch_size=500, payment_status='Submitted', send_confirmations=False):
+    """Bulk-load offline/spot registrations from a CSV through the batched insert path
+    
+    Columns follow the export (events joined with ", "). total_amount is
+    computed from the event catalog when blank. Confirmation emails are only
+    queued with ``send_confirmations``. Returns a summary dict.
+    """
+    writer = BatchWriter(
+        lambda batch: insert_registrations(batch, send_confirmations=send_confirmations),
+        max_batch=batch_size, max_wait=0.05, name="registration-import"
+    )
+    catalog = pricing_engine.catalog()
+    summary = {"inserted": 0, "duplicates": 0, "invalid": 0, "errors": 0}
+    pending = []
+    
+    def drain():
+        for line_no, future in pending:
+            try:
+                future.result()
+                summary["inserted"] += 1
+            except DuplicateRegistrationError:
+                summary["duplicates"] += 1
+            except Exception as e:
+                summary["errors"] += 1
+                logger.warning("Import line %d failed: %s", line_no, e)
+        pending.clear()
+    
+    with open(path, newline='', encoding='utf-8-sig') as fh:
+        for line_no, raw in enumerate(csv.DictReader(fh), start=2):
+            row = {key: (value or '').strip() for key, value in raw.items() if key}
+            missing = [field for field in IMPORT_REQUIRED_FIELDS if not row.get(field)]
+            if missing:
+                summary["invalid"] += 1
+                logger.warning("Import line %d skipped, missing %s", line_no, ", ".join(missing))
+                continue
+            
+            if not row.get('total_amount'):
+                events_list = [event for event in row['events'].split(', ') if event]
+                row['total_amount'], _ = catalog.quote(
+                    events_list, row['college'], count_group_members(row.get('group_members'))
+                )
+            row['payment_status'] = row.get('payment_status') or payment_status
+            row['payment_screenshot_url'] = row.get('payment_screenshot_url', '')
+            row['screenshot_status'] = 'Uploaded' if row['payment_screenshot_url'] else 'Offline'
+            
+            pending.append((line_no, writer.submit(row)))
+            # Bound memory on large files: wait for the in-flight rows every few batches
+            if len(pending) >= batch_size * 4:
+                drain()
+    drain()
+    
+    logger.info("Import finished", extra={**summary, "batches": writer.stats()})
+    return summary
+
+@app.cli.command("import-registrations")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--batch-size", default=500, show_default=True, help="Rows per INSERT transaction")
+@click.option("--payment-status", default="Submitted", show_default=True,
+              help="Status for rows without a payment_status column")
+@click.option("--send-confirmations", is_flag=True, help="Queue a confirmation email for every imported row")
+def import_registrations_command(path, batch_size, payment_status, send_confirmations):
+    """Import offline/spot registrations from a CSV file."""
+    summary = import_registrations_csv(path, batch_size=batch_size, payment_status=payment_status,
+                                       send_confirmations=send_confirmations)
+    click.echo(", ".join(f"{key}: {value}" for key, value in summary.items()))
+
+# ---------------- PAYMENT RECONCILIATION ----------------
+RECONCILE_BATCH_SIZE = int(os.getenv('RECONCILE_BATCH_SIZE', '1000'))
+
+def get_unverified_registrations():
+    """(id, roll_no, total_amount, created_at) of every registration still 'Submitted'"""
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT id, roll_no, total_amount, created_at FROM registrations WHERE payment_status = 'Submitted'"
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+    finally:
+        connection.close()
+
+def get_used_payment_credits():
+    """(bank references, credit fingerprints) already recorded against a registration"""
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "SELECT payment_reference, payment_credit FROM registrations "
+            "WHERE payment_reference IS NOT NULL OR payment_credit IS NOT NULL"
+        )
+        rows = cursor.fetchall()
+        cursor.close()
+        return {row[0] for row in rows if row[0]}, {row[1] for row in rows if row[1]}
+    finally:
+        connection.close()
+
+def _case_by_id(column, ids):
+    return f"{column} = CASE id {' '.join(['WHEN %s THEN %s'] * len(ids))} END"
+
+def apply_payment_matches(matches, batch_size=RECONCILE_BATCH_SIZE):
+    """Mark matched registrations 'Verified', one transaction per batch
+    
+    ``matches`` is a list of (registration_id, reference, method, paid_at,
+    credit fingerprint). Each batch locks its rows that are still
+    'Submitted' (SELECT ... FOR UPDATE), sets status, reference, match
+    method, paid_at and the credit fingerprint for all of them in a single
+    UPDATE (the unique indexes refuse a credit that is already used), moves their counts in registration_stats, queues
+    a "payment verified" email carrying the reissued ticket, and commits.
+    Rows verified or changed in the meantime are skipped.
+    Returns {"verified": n, "skipped": n}.
+    """
+    summary = {"verified": 0, "skipped": 0}
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
+    try:
+        cursor = connection.cursor()
+        for start in range(0, len(matches), batch_size):
+            batch = matches[start:start + batch_size]
+            cursor.execute(
+                f"""
+                SELECT id, college, events, student_name, roll_no, email, group_members, total_amount
+                FROM registrations
+                WHERE id IN ({', '.join(['%s'] * len(batch))}) AND payment_status = 'Submitted'
+                FOR UPDATE
+                """,
+                [match[0] for match in batch]
+            )
+            locked = {row[0]: row for row in cursor.fetchall()}
+            rows = [match for match in batch if match[0] in locked]
+            
+            if rows:
+                ids = [row[0] for row in rows]
+                params = []
+                for position in (1, 2, 3, 4):
+                    for row in rows:
+                        params.extend([row[0], row[position]])
+                params.extend(ids)
+                cursor.execute(
+                    f"""
+                    UPDATE registrations
+                    SET payment_status = 'Verified',
+                        {_case_by_id('payment_reference', ids)},
+                        {_case_by_id('payment_match', ids)},
+                        {_case_by_id('paid_at', ids)},
+                        {_case_by_id('payment_credit', ids)}
+                    WHERE id IN ({', '.join(['%s'] * len(ids))})
+                    """,
+                    params
+                )
+                delta = registration_stats.StatsDelta()
+                verified = []
+                for registration_id in ids:
+                    _, college, events, student_name, roll_no, email, group_members, total_amount = locked[registration_id]
+                    delta.change_status({"college": college, "events": events}, "Submitted", "Verified")
+                    verified.append(outbox.payment_verified(registration_id, {
+                        "student_name": student_name, "roll_no": roll_no, "email": email, "college": college,
+                        "events": events, "group_members": group_members, "total_amount": total_amount,
+                    }))
+                registration_stats.apply_delta(cursor, delta)
+                if CONFIRMATION_EMAILS:
+                    outbox.enqueue(cursor, verified)
+            
+            connection.commit()
+            summary["verified"] += len(rows)
+            summary["skipped"] += len(batch) - len(rows)
+        cursor.close()
+        return summary
+    
+    except Error as e:
+        logger.exception("Error applying payment matches: %s", e)
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+def _payment_matches(matched):
+    """apply_payment_matches() tuples from a reconcile.match_payments() frame"""
+    return [
+        (int(registration_id), reference or None, method, paid_at.to_pydatetime(), fingerprint)
+        for registration_id, reference, method, paid_at, fingerprint in matched[
+            ["registration_id", "reference", "method", "txn_time", "fingerprint"]
+        ].itertuples(index=False, name=None)
+    ]
+
+def reconcile_payments(statement_path, window_before_min=60, window_after_min=10,
+                       reference_only=False, dry_run=False, report_path=None, review_path=None):
+    """Match a bank/UPI statement CSV against unverified registrations and verify the matches
+    
+    Only credits that name the roll number verify a registration. Amount/time
+    pairs are a guess, so they are counted as ``needs_review`` and written to
+    ``review_path`` for someone to check and load with ``flask confirm-payments``.
+    Returns a summary with counts and per-stage timings in ms.
+    """
+    # pandas is only needed here; importing it lazily keeps app start-up fast
+    import pandas as pd
+    import reconcile
+    
+    timings = {}
+    started = time.perf_counter()
+    statement = reconcile.load_statement(statement_path)
+    timings["load_ms"] = (time.perf_counter() - started) * 1000
+    
+    started = time.perf_counter()
+    statement = reconcile.without_used_credits(statement, *get_used_payment_credits())
+    registrations = reconcile.registrations_frame(get_unverified_registrations())
+    timings["fetch_ms"] = (time.perf_counter() - started) * 1000
+    
+    started = time.perf_counter()
+    matched = reconcile.match_payments(
+        statement, registrations,
+        window_before=pd.Timedelta(minutes=window_before_min),
+        window_after=pd.Timedelta(minutes=window_after_min),
+        reference_only=reference_only
+    )
+    timings["match_ms"] = (time.perf_counter() - started) * 1000
+    by_reference = matched[matched["method"] == reconcile.MATCH_REFERENCE]
+    review = matched[matched["method"] != reconcile.MATCH_REFERENCE]
+    
+    if report_path:
+        matched.to_csv(report_path, index=False)
+    if review_path:
+        review.to_csv(review_path, index=False)
+    
+    summary = {
+        "credits": len(statement),
+        "unverified": len(registrations),
+        "matched": len(matched),
+        "by_reference": len(by_reference),
+        "needs_review": len(review),
+        "verified": 0,
+        "skipped": 0,
+    }
+    if not dry_run and len(by_reference):
+        started = time.perf_counter()
+        summary.update(apply_payment_matches(_payment_matches(by_reference)))
+        timings["apply_ms"] = (time.perf_counter() - started) * 1000
+    
+    summary.update({key: round(value, 1) for key, value in timings.items()})
+    logger.info("Payment reconciliation finished", extra=summary)
+    return summary
+
+def confirm_payments(review_path):
+    """Verify the reviewed matches left in a ``--review`` CSV from reconcile_payments()
+    
+    Rows whose credit has been used since the review are skipped and counted
+    as ``already_used``.
+    """
+    import pandas as pd
+    
+    review = pd.read_csv(review_path, dtype={"reference": str, "fingerprint": str}, keep_default_na=False,
+                         parse_dates=["txn_time"])
+    used_references, used_fingerprints = get_used_payment_credits()
+    used = review["fingerprint"].isin(used_fingerprints) | (
+        (review["reference"] != "") & review["reference"].isin(used_references)
+    )
+    summary = {"reviewed": len(review), "already_used": int(used.sum()), "verified": 0, "skipped": 0}
+    if (~used).any():
+        summary.update(apply_payment_matches(_payment_matches(review[~used])))
+    logger.info("Reviewed payments confirmed", extra=summary)
+    return summary
+
+@app.cli.command("reconcile-payments")
+@click.argument("statement", type=click.Path(exists=True, dir_okay=False))
+@click.option("--window-before", default=60, show_default=True,
+              help="Minutes a credit may precede its registration")
+@click.option("--window-after", default=10, show_default=True,
+              help="Minutes a credit may follow its registration (clock skew)")
+@click.option("--reference-only", is_flag=True, help="Skip amount/time pairing altogether")
+@click.option("--dry-run", is_flag=True, help="Match and report, but do not update registrations")
+@click.option("--report", type=click.Path(dir_okay=False), help="Write the matches to this CSV")
+@click.option("--review", type=click.Path(dir_okay=False),
+              help="Write the amount/time matches, which are not applied, to this CSV for review")
+def reconcile_payments_command(statement, window_before, window_after, reference_only, dry_run, report, review):
+    """Verify payments by matching a bank/UPI statement CSV to registrations."""
+    summary = reconcile_payments(statement, window_before, window_after, reference_only, dry_run, report, review)
+    click.echo(", ".join(f"{key}: {value}" for key, value in summary.items()))
+
+@app.cli.command("confirm-payments")
+@click.argument("review", type=click.Path(exists=True, dir_okay=False))
+def confirm_payments_command(review):
+    """Verify the amount/time matches kept in a reviewed reconcile-payments --review CSV."""
+    summary = confirm_payments(review)
+    click.echo(", ".join(f"{key}: {value}" for key, value in summary.items()))
+
+# ---------------- DUPLICATE CHECK FILTER ----------------
+registration_filter = RegistrationFilter()
+_filter_refreshed_at = 0.0
+_filter_refresh_lock = threading.Lock()
+
+def _fetch_identities(connection, after_id=0):
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT id, roll_no, email FROM registrations WHERE id > %s ORDER BY id",
+        (after_id,)
+    )
+    rows = cursor.fetchall()
+    cursor.close()
+    return rows
+
+def load_registration_filter():
+    """Build the duplicate-check bloom filter from every registration in the DB"""
+    with _filter_refresh_lock:
+        return _load_registration_filter()
+
+def _reload_registration_filter():
+    # Runs in its own thread; the warm-up may have loaded the filter meanwhile
+    with _filter_refresh_lock:
+        if registration_filter.ready and not registration_filter.is_saturated():
+            return
+        _load_registration_filter()
+
+def _load_registration_filter():
+    global _filter_refreshed_at
+    connection = get_db_connection()
+    if connection is None:
+        logger.warning("Duplicate-check filter not loaded; every check will hit the database")
+        return False
+    
+    try:
+        rows = _fetch_identities(connection)
+        registration_filter.rebuild(rows, expected=len(rows))
+        _filter_refreshed_at = time.monotonic()
+        logger.info("Duplicate-check filter loaded with %d registrations", len(rows))
+        return True
+    except Error as e:
+        logger.error("Error loading duplicate-check filter: %s", e)
+        return False
+    finally:
+        connection.close()
+
+def refresh_registration_filter():
+    """Fold in registrations made by other workers since the last refresh
+    
+    Never blocks the request: while another thread holds the filter it
+    returns at once, and a full (re)build, which scans every registration,
+    is handed to a background thread. Until the filter is ready every check
+    goes to the database.
+    """
+    global _filter_refreshed_at
+    if time.monotonic() - _filter_refreshed_at < DEDUP_REFRESH_INTERVAL:
+        return
+    if not _filter_refresh_lock.acquire(blocking=False):
+        return
+    try:
+        if not registration_filter.ready or registration_filter.is_saturated():
+            # Also spaces out retries when the database is unreachable
+            _filter_refreshed_at = time.monotonic()
+            threading.Thread(target=_reload_registration_filter, name="dedup-reload", daemon=True).start()
+            return
+        
+        connection = get_db_connection()
+        if connection is None:
+            return
+        try:
+            registration_filter.add_since(_fetch_identities(connection, registration_filter.last_id))
+            _filter_refreshed_at = time.monotonic()
+        except Error as e:
+            logger.error("Error refreshing duplicate-check filter: %s", e)
+        finally:
+            connection.close()
+    finally:
+        _filter_refresh_lock.release()
 
 # ---------------- HELPERS ----------------
 def allowed_file(filename):
     return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
 
+@timed("upload_to_cloudinary")
 def upload_to_cloudinary(file, roll_no):
     """Upload file to Cloudinary and return the URL"""
     try:
@@ -286,80 +1236,187 @@ def upload_to_cloudinary(file, roll_no):
             overwrite=True
         )
         
-        print(f"File uploaded to Cloudinary: {result['secure_url']}")
+        logger.info("File uploaded to Cloudinary: %s", result['secure_url'])
         return result['secure_url']
     except Exception as e:
-        print(f"Cloudinary upload error: {e}")
+        logger.error("Cloudinary upload error: %s", e)
         raise
 
-def parse_events_with_categories(form_data):
-    """Parse events and their categories from form data"""
-    selected_events = form_data.getlist("events")
-    events_list = []
-    
-    print(f"Raw selected events: {selected_events}")
-    print(f"All form keys: {list(form_data.keys())}")
-    
-    category_map = {}
-    for key in form_data.keys():
-        if key.startswith('category_'):
-            event_idx = key.replace('category_', '')
-            category_map[event_idx] = form_data.get(key)
-            print(f"Found category: {key} = {form_data.get(key)}")
-    
-    for i, event in enumerate(selected_events):
-        category_found = False
-        for cat_idx, category in category_map.items():
-            checkbox_indices = [j for j, e in enumerate(selected_events) if e == event]
-            if str(cat_idx) in [str(idx) for idx in range(len(form_data.getlist("events")))]:
-                all_event_checkboxes = [(k, v) for k, v in form_data.items() if k == 'events']
-                test_key = f"category_{i}"
-                if test_key in category_map:
-                    event_with_category = f"{event} - {category_map[test_key]}"
-                    events_list.append(event_with_category)
-                    print(f"Event with category (matched by index): {event_with_category}")
-                    category_found = True
-                    break
-        
-        if not category_found:
-            if event in ["Dance Competition", "Fashion Show Competition", "Singing"]:
-                for cat_idx, category in category_map.items():
-                    if category:
-                        event_with_category = f"{event} - {category}"
-                        events_list.append(event_with_category)
-                        print(f"Event with category (fallback): {event_with_category}")
-                        category_found = True
-                        del category_map[cat_idx]
-                        break
-            
-            if not category_found:
-                events_list.append(event)
-                print(f"Event without category: {event}")
-    
-    print(f"Final parsed events: {events_list}")
-    return events_list
-
-def calculate_total_from_events(events_list, college):
-    """Calculate total amount from events list"""
-    total = 0
-    for event in events_list:
-        price = EVENT_PRICES.get(event, 0)
-        if price == 0:
-            print(f"WARNING: No price found for event: {event}")
-        if college == "Mangalmay Group of Institutions":
-            price = price // 2
-        total += price
-        print(f"Event: {event}, Price: ₹{price}, Running Total: ₹{total}")
-    print(f"Final total calculated: ₹{total} for {len(events_list)} events (College: {college})")
+def upi_payload(amount):
+    """UPI deep link encoded in the payment QR"""
+    return (
+        f"upi://pay?"
+        f"pa={UPI_ID}&"
+        f"pn=ZEAL10&"
+        f"am={amount}&"
+        f"cu=INR"
+    )
+
+# ---------------- PAYMENT QR CACHE ----------------
+qr_cache = QRCodeCache(maxsize=QR_CACHE_SIZE)
+
+def prewarm_qr_cache():
+    """Render the QR for every total the current catalog can produce"""
+    totals = sorted(pricing_engine.catalog().achievable_totals)
+    count = qr_cache.prewarm(upi_payload(total) for total in totals)
+    logger.info("QR cache pre-warmed with %d amounts", count)
+
+# ---------------- SCREENSHOT UPLOAD QUEUE ----------------
+def _screenshot_uploaded(registration_id, url):
+    update_screenshot(registration_id, url, 'Uploaded')
+
+def _screenshot_upload_failed(registration_id, error):
+    logger.error("Giving up on screenshot upload: %s", error, extra={"registration_id": registration_id})
+    update_screenshot(registration_id, '', 'Failed')
+
+upload_queue = UploadQueue(
+    UPLOAD_SPOOL_DIR,
+    uploader=LocalUploader() if SCREENSHOT_UPLOADER == 'local' else upload_to_cloudinary,
+    on_complete=_screenshot_uploaded,
+    on_failure=_screenshot_upload_failed,
+    workers=UPLOAD_WORKERS,
+    max_attempts=UPLOAD_MAX_ATTEMPTS,
+    preprocess=ScreenshotNormalizer(
+        max_side=SCREENSHOT_MAX_SIDE,
+        max_bytes=SCREENSHOT_MAX_KB * 1024,
+        image_format=SCREENSHOT_FORMAT
+    )
+)
+
+# ---------------- LAZY STARTUP ----------------
+# Importing the app never touches MySQL. Background services start on the
+# first request a worker serves (the readiness probe is usually that request);
+# the duplicate-check filter and QR cache are warmed in a thread so even that
+# request is not held up. Until the filter is loaded every check goes to the DB.
+_services_started = False
+_services_lock = threading.Lock()
+startup_timings = {"import_ms": None, "warmup_ms": None, "first_request_at": None}
+
+def _warm_up():
+    started = time.perf_counter()
+    load_registration_filter()
+    if QR_PREWARM:
+        prewarm_qr_cache()
+    startup_timings["warmup_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    logger.info("Warm-up finished", extra=startup_timings)
+
+def start_background_services():
+    """Start the upload workers, email dispatcher and warm-up thread once per process"""
+    global _services_started
+    with _services_lock:
+        if _services_started:
+            return
+        _services_started = True
+    startup_timings["first_request_at"] = round(time.perf_counter() - _import_started, 3)
+    upload_queue.start()
+    if outbox_dispatcher is not None:
+        outbox_dispatcher.start()
+    threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+
+@app.before_request
+def _start_services_on_first_request():
+    if not _services_started:
+        start_background_services()
+
+@timed("calculate_total_from_events")
+def calculate_total_from_events(events_list, college, group_size=0, catalog=None):
+    """Calculate total amount from events list using the compiled event catalog"""
+    catalog = catalog or pricing_engine.catalog()
+    total, unknown = catalog.quote(events_list, college, group_size)
+    for event in unknown:
+        logger.warning("No price found for event: %s", event)
     return total
 
+# ---------------- REGISTER PAGE ----------------
+# The banner is checked at most every BANNER_CHECK_INTERVAL seconds instead of
+# on every render; dropping the file in place still shows up without a restart.
+BANNER_PATH = os.path.join('static', 'images', 'zeal_banner.jpeg')
+BANNER_CHECK_INTERVAL = 30.0
+_banner = {"exists": False, "checked_at": None}
+
+def banner_exists():
+    now = time.monotonic()
+    if _banner["checked_at"] is None or now - _banner["checked_at"] >= BANNER_CHECK_INTERVAL:
+        _banner["exists"] = os.path.exists(BANNER_PATH)
+        _banner["checked_at"] = now
+    return _banner["exists"]
+
+def render_register(catalog, **context):
+    """Render register.html with the shared context; the form is refilled from the session"""
+    context.setdefault('form_data', session.get('form_data', {}))
+    context.setdefault('selected_events', session.get('selected_events', []))
+    return render_template(
+        "register.html",
+        pricing=catalog,
+        banner_exists=banner_exists(),
+        **context
+    )
+
+def render_registration_success(catalog, registration_id, ticket=None):
+    """The success page with the entry ticket; also what a replayed final-step retry gets"""
+    session.pop('form_data', None)
+    session.pop('selected_events', None)
+    return render_register(
+        catalog,
+        success=True,
+        registration_id=registration_id,
+        ticket=ticket,
+        form_data={},
+        selected_events=[]
+    )
+
+# The blank form is identical for every visitor with nothing in their session,
+# so it is rendered once per (catalog version, banner) and answered with 304
+# when the browser already has it.
+_blank_page = {"key": None, "body": None, "etag": None}
+_blank_page_lock = threading.Lock()
+
+def anonymous_register_page(catalog):
+    key = (catalog.version, banner_exists())
+    with _blank_page_lock:
+        if _blank_page["key"] != key:
+            body = render_register(catalog, form_data={}, selected_events=[]).encode()
+            _blank_page.update(key=key, body=body, etag=hashlib.sha1(body).hexdigest())
+        body, etag = _blank_page["body"], _blank_page["etag"]
+    
+    response = Response(body, mimetype="text/html")
+    response.set_etag(etag)
+    # Revalidate every time so a catalog edit is picked up on the next load
+    response.cache_control.no_cache = True
+    response.vary.add("Cookie")
+    return response.make_conditional(request)
+
+@app.route("/catalog.json")
+def catalog_json():
+    """Event prices and discount rules; ?v=<version> URLs are immutable and cached for a year"""
+    catalog = pricing_engine.catalog()
+    response = Response(catalog.client_json, mimetype="application/json")
+    response.set_etag(catalog.version)
+    if request.args.get("v") == catalog.version:
+        response.cache_control.public = True
+        response.cache_control.max_age = 31536000
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
 # ---------------- ROUTES ----------------
-# ---------------- ROUTES ----------------
+def _finish_late_registration(future, upload_job, roll):
+    # A batch the request gave up on: upload the screenshot if its row committed after all
+    if future.exception() is None:
+        upload_queue.enqueue(upload_job, future.result(), roll)
+        logger.info("Late registration committed, screenshot queued", extra={"registration_id": future.result()})
+    else:
+        upload_queue.discard(upload_job)
+
 @app.route("/", methods=["GET", "POST"])
 def register():
+    # One catalog version for the whole request, even if it reloads mid-way
+    catalog = pricing_engine.catalog()
+    
     if request.method == "POST":
         step = request.form.get("step")
-        print(f"Processing step: {step}")
+        logger.debug("Processing step: %s", step)
 
         name = request.form.get("student_name", "").strip()
         roll = request.form.get("roll_no", "").strip()
@@ -371,20 +1428,41 @@ def register():
         group_members = request.form.get("group_members", "").strip()
         contact_numbers = request.form.get("contact_numbers", "").strip()
 
+        # ---------------- REQUEST KEY ----------------
+        # Before admission so a replayed retry costs no rate-limit tokens or upload slot
+        request_key = request.form.get("request_key", "")
+        if step == "final" and idempotency.valid_key(request_key):
+            claim = claim_request_key(request_key, roll, email)
+            if claim.state == idempotency.DONE:
+                logger.info("Replaying completed registration", extra=claim.result)
+                return render_registration_success(catalog, claim.result["registration_id"], claim.result.get("ticket"))
+            if claim.state == idempotency.PENDING:
+                return render_register(
+                    catalog,
+                    error="Your registration is still being processed. Please wait a few seconds and refresh this page."
+                )
+            if claim.state == idempotency.CONFLICT:
+                return render_register(
+                    catalog,
+                    error="This payment form was already used with a different roll number or email. Please generate the QR code again."
+                )
+
+        # ---------------- ADMISSION ----------------
+        if step in ["qr", "final"]:
+            refused = admit_step(step, roll)
+            if refused is not None:
+                return refused
+
         # ---------------- EMAIL VALIDATION (SERVER SIDE) ----------------
         import re
         email_pattern = r'^[^\s@]+@[^\s@]+\.[^\s@]+$'
         if not email or not re.match(email_pattern, email):
-            return render_template(
-                "register.html",
-                error="Please enter a valid email address.",
-                form_data=session.get('form_data', {}),
-                selected_events=session.get('selected_events', []),
-                events=EVENT_PRICES,
-                banner_exists=os.path.exists('static/images/zeal_banner.jpeg')
+            return render_register(
+                catalog,
+                error="Please enter a valid email address."
             )
 
-        events_list = parse_events_with_categories(request.form)
+        events_list = parse_events_with_categories(request.form, catalog.category_parents)
 
         # ---------------- STORE FORM IN SESSION ----------------
         session['form_data'] = {
@@ -402,62 +1480,31 @@ def register():
 
         # ---------------- DUPLICATE CHECK ----------------
         if step in ["qr", "final"]:
-            if is_already_registered(roll, email):
-                return render_template(
-                    "register.html",
-                    error="This Roll Number or Email is already registered.",
-                    form_data=session.get('form_data', {}),
-                    selected_events=session.get('selected_events', []),
-                    events=EVENT_PRICES,
-                    banner_exists=os.path.exists('static/images/zeal_banner.jpeg')
+            if is_already_registered(roll, email, use_filter=(step == "final")):
+                return render_register(
+                    catalog,
+                    error="This Roll Number or Email is already registered."
                 )
 
         # ================= STEP : QR =================
         if step == "qr":
             if not events_list:
-                return render_template(
-                    "register.html",
-                    error="Please select at least one event.",
-                    form_data=session.get('form_data', {}),
-                    selected_events=session.get('selected_events', []),
-                    events=EVENT_PRICES,
-                    banner_exists=os.path.exists('static/images/zeal_banner.jpeg')
+                return render_register(
+                    catalog,
+                    error="Please select at least one event."
                 )
 
-            total = calculate_total_from_events(events_list, college)
-
-            upi_link = (
-                f"upi://pay?"
-                f"pa=mangalmayinstituteof.69356291@hdfcbank&"
-                f"pn=ZEAL10&"
-                f"am={total}&"
-                f"cu=INR"
-            )
-
-            qr_file = f"{roll}_qr.png"
-            qr_path = os.path.join(QR_DIR, qr_file)
+            total = calculate_total_from_events(events_list, college, count_group_members(group_members), catalog)
 
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(upi_link)
-            qr.make(fit=True)
-            img = qr.make_image(fill_color="black", back_color="white")
-            img.save(qr_path)
-
-            print(f"QR generated: {qr_file} | Amount: ₹{total}")
+            # The PNG itself is served (and cached) by payment_qr()
+            qr_url = url_for("payment_qr", amount=total)
+            logger.debug("QR ready: %s", qr_url, extra={"amount": total})
 
-            return render_template(
-                "register.html",
-                qr=qr_file,
+            return render_register(
+                catalog,
+                qr=qr_url,
                 total=total,
-                form_data=session.get('form_data', {}),
-                selected_events=session.get('selected_events', []),
-                events=EVENT_PRICES,
-                banner_exists=os.path.exists('static/images/zeal_banner.jpeg')
+                request_key=secrets.token_urlsafe(24)
             )
 
         # ================= STEP : FINAL =================
@@ -465,27 +1512,28 @@ def register():
             screenshot = request.files.get("payment_screenshot")
 
             if not screenshot or screenshot.filename == '':
-                return render_template(
-                    "register.html",
-                    error="Payment screenshot is required.",
-                    form_data=session.get('form_data', {}),
-                    selected_events=session.get('selected_events', []),
-                    events=EVENT_PRICES,
-                    banner_exists=os.path.exists('static/images/zeal_banner.jpeg')
+                return render_register(
+                    catalog,
+                    error="Payment screenshot is required."
                 )
 
             if not allowed_file(screenshot.filename):
-                return render_template(
-                    "register.html",
-                    error="Invalid file format. Upload PNG, JPG or JPEG only.",
-                    form_data=session.get('form_data', {}),
-                    selected_events=session.get('selected_events', []),
-                    events=EVENT_PRICES,
-                    banner_exists=os.path.exists('static/images/zeal_banner.jpeg')
+                return render_register(
+                    catalog,
+                    error="Invalid file format. Upload PNG, JPG or JPEG only."
+                )
+
+            # The extension is only a hint; check what the bytes actually are
+            try:
+                validate_screenshot(screenshot.stream)
+            except InvalidScreenshot as e:
+                logger.info("Screenshot rejected: %s", e)
+                return render_register(
+                    catalog,
+                    error="The screenshot could not be read as a PNG or JPEG image. Please upload the original screenshot."
                 )
 
-            cloudinary_url = upload_to_cloudinary(screenshot, roll)
-            total = calculate_total_from_events(events_list, college)
+            total = calculate_total_from_events(events_list, college, count_group_members(group_members), catalog)
 
             registration_data = {
                 "student_name": name,
@@ -499,151 +1547,717 @@ def register():
                 "group_members": group_members,
                 "contact_numbers": contact_numbers,
                 "total_amount": total,
-                "payment_screenshot_url": cloudinary_url,
-                "payment_status": "Submitted"
+                "payment_screenshot_url": "",
+                "payment_status": "Submitted",
+                "screenshot_status": "Pending"
             }
 
-            reg_id = add_registration(registration_data)
-            print(f"Registration SUCCESS | ID: {reg_id}")
-
-            session.pop('form_data', None)
-            session.pop('selected_events', None)
+            # Spool the screenshot before the insert, so no registration row is
+            # left without a file to upload; the URL is filled in by the upload queue
+            try:
+                upload_job = upload_queue.spool(screenshot)
+            except OSError:
+                logger.exception("Could not spool payment screenshot")
+                return render_register(
+                    catalog,
+                    error="We could not save your screenshot. Please try again in a moment."
+                )
+            try:
+                reg_id = add_registration(registration_data)
+            except DuplicateRegistrationError:
+                upload_queue.discard(upload_job)
+                return render_register(
+                    catalog,
+                    error="This Roll Number or Email is already registered."
+                )
+            except RegistrationPendingError as e:
+                e.future.add_done_callback(lambda future: _finish_late_registration(future, upload_job, roll))
+                return reject(503, "registration_batch", 30)
+            except Exception:
+                upload_queue.discard(upload_job)
+                raise
+            upload_queue.enqueue(upload_job, reg_id, roll)
+            ticket = issue_ticket(reg_id, events_list, registration_data["payment_status"])
+            complete_request_key(reg_id, ticket)
+            logger.info("Registration complete, screenshot queued", extra={"registration_id": reg_id})
 
-            return render_template(
-                "register.html",
-                success=True,
-                registration_id=reg_id,
-                form_data={},
-                selected_events=[],
-                events=EVENT_PRICES,
-                banner_exists=os.path.exists('static/images/zeal_banner.jpeg')
-            )
+            return render_registration_success(catalog, reg_id, ticket)
 
     # ---------------- GET REQUEST ----------------
-    return render_template(
-        "register.html",
-        form_data=session.get('form_data', {}),
-        selected_events=session.get('selected_events', []),
-        events=EVENT_PRICES,
-        banner_exists=os.path.exists('static/images/zeal_banner.jpeg')
-    )
+    if not session.get('form_data') and not session.get('selected_events'):
+        return anonymous_register_page(catalog)
+    return render_register(catalog)
 
 
 
-def is_already_registered(roll_no, email):
-    try:
-        connection = get_db_connection()
-        if connection is None:
-            return False
+@app.errorhandler(413)
+def request_too_large(e):
+    """Body over MAX_CONTENT_LENGTH; rejected before werkzeug buffers it"""
+    logger.info("Request body too large", extra={"content_length": request.content_length})
+    if request.endpoint == "register":
+        return render_register(
+            pricing_engine.catalog(),
+            error=f"The screenshot is too large. Please upload an image under {MAX_UPLOAD_MB:g} MB."
+        ), 413
+    return "Request too large", 413
+
+@app.route("/qr/<int:amount>.png")
+def payment_qr(amount):
+    """Payment QR for an amount, rendered once and served from memory"""
+    if amount not in pricing_engine.catalog().achievable_totals:
+        return "Unknown amount", 404
+    
+    png, etag = qr_cache.get(upi_payload(amount))
+    response = Response(png, mimetype="image/png")
+    response.set_etag(etag)
+    response.cache_control.public = True
+    response.cache_control.max_age = 86400
+    return response.make_conditional(request)
+
+@timed("is_already_registered")
+def is_already_registered(roll_no, email, use_filter=True):
+    """Early duplicate warning for the form; the unique constraints are authoritative
+    
+    With ``use_filter`` a bloom filter miss skips the query. The filter can
+    lag registrations made in other workers by DEDUP_REFRESH_INTERVAL, so
+    the qr step, which hands out the payment QR, always asks the database;
+    the final step's insert is rejected by the unique indexes anyway.
+    """
+    if not use_filter:
+        return _registered_in_db(roll_no, email)
+    refresh_registration_filter()
+    if not registration_filter.might_exist(roll_no, email):
+        DUPLICATE_CHECKS.labels(result="filter_skip").inc()
+        return False
+    return _registered_in_db(roll_no, email)
+
+def _registered_in_db(roll_no, email):
+    connection = get_db_connection()
+    if connection is None:
+        DUPLICATE_CHECKS.labels(result="no_connection").inc()
+        return False
 
+    try:
         cursor = connection.cursor()
+        # Two unique-index lookups instead of an OR that can fall back to a scan
         query = """
-        SELECT id FROM registrations
-        WHERE roll_no = %s OR email = %s
+        SELECT id FROM registrations WHERE roll_no = %s
+        UNION ALL
+        SELECT id FROM registrations WHERE email = %s
         LIMIT 1
         """
         cursor.execute(query, (roll_no.strip(), email.strip()))
         result = cursor.fetchone()
 
         cursor.close()
-        connection.close()
+        DUPLICATE_CHECKS.labels(result="found" if result is not None else "not_found").inc()
         return result is not None
 
     except Error as e:
-        print(f"Duplicate check error: {e}")
+        DUPLICATE_CHECKS.labels(result="error").inc()
+        logger.error("Duplicate check error: %s", e)
         return False
+    finally:
+        connection.close()
+
+
+
+# ---------------- ENTRY TICKETS & CHECK-IN ----------------
+# Every registration gets an HMAC-signed ticket QR (see tickets.py) on the
+# success page. Gate devices run `flask checkin`, which verifies tickets with
+# the secret alone and appends each scan to a local log, so check-in keeps
+# working when the venue network does not; the log is pushed to
+# /checkin/sync whenever the server is reachable. TICKET_SECRETS is a
+# comma-separated list (first signs, all verify) and must be the same on the
+# server and every gate device; without it no tickets are issued or checked.
+# Tickets are re-signed with the current payment status whenever one is
+# viewed, and reissued by email when reconciliation verifies the payment,
+# so `--require-verified` gates see verified tickets. CHECKIN_SYNC_TOKEN
+# enables the sync endpoint.
+TICKET_SECRETS = [secret for secret in os.getenv('TICKET_SECRETS', '').split(',') if secret]
+TICKET_QR_CACHE_SIZE = int(os.getenv('TICKET_QR_CACHE_SIZE', '1024'))
+CHECKIN_SYNC_TOKEN = os.getenv('CHECKIN_SYNC_TOKEN', '')
+CHECKIN_SYNC_BATCH_SIZE = int(os.getenv('CHECKIN_SYNC_BATCH_SIZE', '500'))
+
+if not TICKET_SECRETS:
+    logger.error("TICKET_SECRETS is not set; entry tickets are disabled")
+ticket_signer = TicketSigner(TICKET_SECRETS) if TICKET_SECRETS else None
+ticket_qr_cache = QRCodeCache(maxsize=TICKET_QR_CACHE_SIZE, renderer=render_qr_png)
+
+CHECKIN_INSERT_QUERY = """
+INSERT IGNORE INTO checkins
+(scan_id, registration_id, gate, device, result, payment_status, scanned_at)
+VALUES (%s, %s, %s, %s, %s, %s, %s)
+"""
+
+def issue_ticket(registration_id, events, payment_status, issued_at=None):
+    """A signed ticket token, or None when TICKET_SECRETS is not configured"""
+    if ticket_signer is None:
+        return None
+    return ticket_signer.issue(registration_id, events, payment_status, issued_at)
+
+def require_ticket_signer():
+    if ticket_signer is None:
+        raise click.ClickException("TICKET_SECRETS is not set; tickets cannot be issued or checked")
+    return ticket_signer
+
+@app.route("/ticket/<token>.png")
+def ticket_qr(token):
+    """QR image of an entry ticket; only renders tokens we signed
+    
+    A ticket issued before payment was verified is re-signed with the
+    registration's current status, so opening it again after verification
+    shows a ticket that `--require-verified` gates accept.
+    """
+    if ticket_signer is None:
+        return "Tickets are not enabled", 404
+    try:
+        ticket = ticket_signer.verify(token)
+    except InvalidTicket:
+        return "Unknown ticket", 404
+    
+    if ticket.payment_status != "Verified":
+        registration = get_registration_by_id(ticket.registration_id)
+        if registration is not None and registration["payment_status"] != ticket.payment_status:
+            # Keeping the original issue time makes the reissued token, and its cached QR, stable
+            token = issue_ticket(ticket.registration_id, ticket.events,
+                                 registration["payment_status"], ticket.issued_at)
+            ticket = ticket._replace(payment_status=registration["payment_status"])
+    
+    png, etag = ticket_qr_cache.get(token)
+    response = Response(png, mimetype="image/png")
+    response.set_etag(etag)
+    # The student's own ticket; fine for their browser to keep, not for shared caches
+    response.cache_control.private = True
+    if ticket.payment_status == "Verified":
+        response.cache_control.max_age = 86400
+    else:
+        # Revalidate so the verified ticket shows up once the payment is matched
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def store_checkins(scans):
+    """Insert synced gate scans; returns how many were new (re-sent scan ids are ignored)"""
+    rows = [
+        (scan["scan_id"], scan.get("registration_id"), scan.get("gate") or "", scan["device"],
+         scan["result"], scan.get("payment_status"), scan["scanned_at"])
+        for scan in scans
+    ]
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
+    try:
+        cursor = connection.cursor()
+        cursor.executemany(CHECKIN_INSERT_QUERY, rows)
+        stored = max(cursor.rowcount, 0)
+        connection.commit()
+        cursor.close()
+        return stored
+    except Error:
+        connection.rollback()
+        raise
+    finally:
+        connection.close()
+
+@app.route("/checkin/sync", methods=["POST"])
+def checkin_sync():
+    """Receive a batch of scans from a gate device's log (Authorization: Bearer CHECKIN_SYNC_TOKEN)"""
+    if not CHECKIN_SYNC_TOKEN:
+        return jsonify(error="check-in sync is not enabled"), 404
+    supplied = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+    if not hmac.compare_digest(supplied.encode(), CHECKIN_SYNC_TOKEN.encode()):
+        return jsonify(error="bad sync token"), 403
+    
+    scans = (request.get_json(silent=True) or {}).get("scans")
+    if not isinstance(scans, list):
+        return jsonify(error="expected {\"scans\": [...]}"), 400
+    try:
+        stored = store_checkins(scans)
+    except (KeyError, TypeError) as e:
+        return jsonify(error=f"malformed scan: {e}"), 400
+    except Exception as e:
+        logger.exception("Error storing check-ins: %s", e)
+        return jsonify(error=str(e)), 500
+    
+    logger.info("Check-ins synced", extra={"received": len(scans), "stored": stored})
+    return jsonify(received=len(scans), stored=stored)
+
+def push_checkins(url, token):
+    """A CheckInLog.sync() push callable that POSTs batches to a server's /checkin/sync"""
+    import urllib.request
+    
+    def push(scans):
+        req = urllib.request.Request(
+            url,
+            data=json.dumps({"scans": scans}).encode(),
+            headers={"Content-Type": "application/json", "Authorization": f"Bearer {token}"},
+            method="POST"
+        )
+        with urllib.request.urlopen(req, timeout=10) as response:
+            response.read()
+    return push
+
+@app.cli.command("ticket")
+@click.argument("registration_id", type=int)
+@click.option("--png", "png_path", type=click.Path(dir_okay=False), help="Also write the QR image here")
+def ticket_command(registration_id, png_path):
+    """Issue a fresh ticket for a registration, with its current payment status (e.g. after verification)."""
+    signer = require_ticket_signer()
+    registration = get_registration_by_id(registration_id)
+    if registration is None:
+        raise click.ClickException(f"No registration {registration_id}")
+    token = signer.issue(
+        registration_id, registration_stats.split_events(registration["events"]), registration["payment_status"]
+    )
+    if png_path:
+        with open(png_path, "wb") as fh:
+            fh.write(render_qr_png(token))
+    click.echo(token)
+
+def _sync_loop(log, push, interval, stop):
+    while not stop.wait(interval):
+        try:
+            sent = log.sync(push, batch_size=CHECKIN_SYNC_BATCH_SIZE)
+            if sent:
+                logger.info("Check-in log synced", extra={"scans": sent})
+        except Exception as e:
+            logger.warning("Check-in sync failed, will retry: %s", e)
+
+@app.cli.command("checkin")
+@click.option("--log", "log_path", required=True, type=click.Path(dir_okay=False), help="Append-only scan log on this device")
+@click.option("--gate", default=None, help="Event being checked in to (default: venue entrance)")
+@click.option("--device", default=lambda: os.uname().nodename, help="Name recorded with each scan")
+@click.option("--require-verified", is_flag=True, help="Refuse tickets issued before payment was verified")
+@click.option("--sync-url", default=None, help="Server /checkin/sync URL to push the log to in the background")
+@click.option("--sync-interval", default=30.0, show_default=True, help="Seconds between sync attempts")
+def checkin_command(log_path, gate, device, require_verified, sync_url, sync_interval):
+    """Check tickets in at a gate, offline: one scanned ticket per line on stdin (USB scanners type + Enter)."""
+    signer = require_ticket_signer()
+    log = CheckInLog(log_path)
+    service = CheckInService(signer, log, gate=gate, device=device, require_verified=require_verified)
+    stop = threading.Event()
+    if sync_url:
+        threading.Thread(
+            target=_sync_loop, args=(log, push_checkins(sync_url, CHECKIN_SYNC_TOKEN), sync_interval, stop),
+            name="checkin-sync", daemon=True
+        ).start()
+    click.echo(f"Checking in {gate or 'venue entrance'} on {device}; {service.stats()['admitted']} already in")
+    try:
+        for line in click.get_text_stream("stdin"):
+            if not line.strip():
+                continue
+            record = service.scan(line)
+            click.echo(f"{record['result'].upper():<20} #{record['registration_id'] or '-'} "
+                       f"{record['payment_status'] or record['reason']}")
+    finally:
+        stop.set()
+        log.close()
+
+@app.cli.command("checkin-sync")
+@click.option("--log", "log_path", required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option("--url", required=True, help="Server /checkin/sync URL")
+def checkin_sync_command(log_path, url):
+    """Push a gate device's unsynced scans to the server now."""
+    log = CheckInLog(log_path)
+    try:
+        sent = log.sync(push_checkins(url, CHECKIN_SYNC_TOKEN), batch_size=CHECKIN_SYNC_BATCH_SIZE)
+    except Exception as e:
+        raise click.ClickException(f"Sync failed after the last accepted batch: {e}")
+    finally:
+        log.close()
+    click.echo(f"Synced {sent} scans")
+
+# ---------------- CONFIRMATION EMAILS ----------------
+# Registrations queue their confirmation in email_outbox inside the same
+# transaction (see outbox.py), so no request waits on SMTP and no committed
+# registration loses its email. With SMTP_HOST set, every worker process runs
+# a dispatcher that drains the table over one reused SMTP connection; claims
+# skip rows another worker holds. OUTBOX_RATE_PER_MIN caps each process, so
+# the provider's limit divided by the worker count is the value to use.
+# `flask send-emails` drains the outbox once, e.g. from cron on a host
+# where the web workers have no SMTP access. Emails are only queued by
+# default when SMTP_HOST is set; such a split setup sets CONFIRMATION_EMAILS=1.
+SMTP_HOST = os.getenv('SMTP_HOST', '')
+CONFIRMATION_EMAILS = os.getenv('CONFIRMATION_EMAILS', '1' if SMTP_HOST else '0') == '1'
+if CONFIRMATION_EMAILS and not SMTP_HOST:
+    logger.error("CONFIRMATION_EMAILS is on but SMTP_HOST is not set: emails stay in email_outbox "
+                 "until `flask send-emails` runs somewhere with SMTP access")
+SMTP_PORT = int(os.getenv('SMTP_PORT', '587'))
+SMTP_USER = os.getenv('SMTP_USER', '')
+SMTP_PASSWORD = os.getenv('SMTP_PASSWORD', '')
+SMTP_STARTTLS = os.getenv('SMTP_STARTTLS', '1') == '1'
+SMTP_TIMEOUT = float(os.getenv('SMTP_TIMEOUT', '10'))
+MAIL_FROM = os.getenv('MAIL_FROM', SMTP_USER or 'no-reply@localhost')
+PUBLIC_BASE_URL = os.getenv('PUBLIC_BASE_URL', '').rstrip('/')
+OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', '50'))
+OUTBOX_INTERVAL = float(os.getenv('OUTBOX_INTERVAL', '2'))
+OUTBOX_RATE_PER_MIN = float(os.getenv('OUTBOX_RATE_PER_MIN', '120'))
+OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', '8'))
+OUTBOX_MAX_PER_CONNECTION = int(os.getenv('OUTBOX_MAX_PER_CONNECTION', '100'))
+# How stale the backlog gauges on /metrics may be (seconds)
+OUTBOX_BACKLOG_TTL = float(os.getenv('OUTBOX_BACKLOG_TTL', '30'))
 
+def connect_smtp():
+    """A logged-in SMTP connection for the dispatcher"""
+    smtp = smtplib.SMTP(SMTP_HOST, SMTP_PORT, timeout=SMTP_TIMEOUT)
+    if SMTP_STARTTLS:
+        smtp.starttls(context=ssl.create_default_context())
+    if SMTP_USER:
+        smtp.login(SMTP_USER, SMTP_PASSWORD)
+    return smtp
 
+def render_outbox_email(row):
+    """The email for a claimed outbox row, with a ticket link when PUBLIC_BASE_URL and tickets are set up"""
+    ticket_url = None
+    if PUBLIC_BASE_URL and ticket_signer is not None:
+        data = json.loads(row["payload"])
+        events = registration_stats.split_events(data["events"])
+        token = issue_ticket(row["registration_id"], events, data.get("payment_status") or "Submitted")
+        ticket_url = f"{PUBLIC_BASE_URL}/ticket/{token}.png"
+    return outbox.confirmation_email(row, MAIL_FROM, ticket_url)
+
+def get_outbox_backlog():
+    """Unsent/failed counts and the oldest unsent email's age, for /debug and /metrics"""
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    try:
+        return outbox.backlog(connection)
+    finally:
+        connection.close()
+
+outbox_backlog = outbox.BacklogCache(get_outbox_backlog, ttl=OUTBOX_BACKLOG_TTL)
+
+def make_outbox_dispatcher():
+    return OutboxDispatcher(
+        get_db_connection,
+        connect_smtp,
+        render_outbox_email,
+        batch_size=OUTBOX_BATCH_SIZE,
+        interval=OUTBOX_INTERVAL,
+        rate=OUTBOX_RATE_PER_MIN / 60,
+        max_attempts=OUTBOX_MAX_ATTEMPTS,
+        max_per_connection=OUTBOX_MAX_PER_CONNECTION,
+        backlog=outbox_backlog
+    )
+
+outbox_dispatcher = make_outbox_dispatcher() if SMTP_HOST else None
+
+@app.cli.command("send-emails")
+def send_emails_command():
+    """Send every confirmation email that is due, then exit."""
+    if not SMTP_HOST:
+        raise click.ClickException("SMTP_HOST is not set")
+    dispatcher = outbox_dispatcher or make_outbox_dispatcher()
+    claimed = dispatcher.drain()
+    stats = dispatcher.stats()
+    click.echo(f"claimed: {claimed}, sent: {stats['sent']}, retrying: {stats['retried']}, failed: {stats['failed']}")
 
 # ---------------- ADMIN ----------------
+ADMIN_PAGE_SIZE = 50
+ADMIN_MAX_PAGE_SIZE = 200
+
+def serialize_registration(row):
+    """JSON-friendly copy of a registration row"""
+    row = dict(row)
+    row['total_amount'] = float(row['total_amount']) if row.get('total_amount') is not None else 0
+    if row.get('created_at'):
+        row['created_at'] = row['created_at'].strftime('%d-%m-%Y %H:%M')
+    return row
+
 @app.route("/adminmgizeal")
 def admin():
     try:
-        data = get_all_registrations()
-        print(f"Displaying {len(data)} registrations on admin page")
+        stats = get_registration_stats()
+        catalog = pricing_engine.catalog()
         
-        return render_template("admin.html", data=data)
+        return render_template(
+            "admin.html",
+            stats=stats,
+            latest_id=get_latest_registration_id(),
+            colleges=sorted(entry["name"] for entry in stats.get("colleges", [])),
+            event_names=catalog.event_names,
+            college_discounts=dict(catalog.college_discounts),
+            page_size=ADMIN_PAGE_SIZE
+        )
     except Exception as e:
-        print(f"Error loading admin page: {e}")
-        traceback.print_exc()
+        logger.exception("Error loading admin page: %s", e)
         return f"Error loading admin page: {str(e)}", 500
 
+@app.route("/adminmgizeal/api/registrations")
+def admin_registrations_api():
+    """Paginated, filtered registrations for the admin page"""
+    try:
+        limit = min(max(int(request.args.get("limit", ADMIN_PAGE_SIZE)), 1), ADMIN_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify(error="limit must be an integer"), 400
+    
+    try:
+        rows, next_cursor = get_registrations_page(
+            limit=limit,
+            cursor=request.args.get("cursor") or None,
+            search=request.args.get("q", "").strip() or None,
+            name=request.args.get("name", "").strip() or None,
+            roll_no=request.args.get("roll_no", "").strip() or None,
+            college=request.args.get("college", "").strip() or None,
+            event=request.args.get("event", "").strip() or None
+        )
+    except ValueError as e:
+        return jsonify(error=str(e)), 400
+    except Exception as e:
+        logger.exception("Error loading registrations page: %s", e)
+        return jsonify(error=str(e)), 500
+    
+    return jsonify(
+        data=[serialize_registration(row) for row in rows],
+        next_cursor=next_cursor,
+        has_more=next_cursor is not None
+    )
+
+@app.route("/adminmgizeal/api/participants")
+def admin_participants_api():
+    """Participants of one event and/or one college, for event coordinators"""
+    event = request.args.get("event", "").strip() or None
+    college = request.args.get("college", "").strip() or None
+    if not event and not college:
+        return jsonify(error="event or college is required"), 400
+    
+    try:
+        if event:
+            rows = get_event_participants(event, college)
+        else:
+            rows = get_college_participants(college)
+    except Exception as e:
+        logger.exception("Error loading participants: %s", e)
+        return jsonify(error=str(e)), 500
+    
+    return jsonify(
+        event=event,
+        college=college,
+        count=len(rows),
+        data=[serialize_registration(row) for row in rows]
+    )
+
+# ---------------- LIVE ADMIN FEED ----------------
+# Open admin pages hold an SSE stream instead of reloading. One poller thread
+# per worker reads rows above the last id it saw (plus the stats summary)
+# every CHANGE_FEED_INTERVAL seconds while anyone is connected, and fans
+# them out; each stream only touches the DB for its reconnect catch-up.
+# Every open stream holds a server thread for as long as the page is open, so
+# run threaded workers (gunicorn --worker-class gthread --threads N) or gevent;
+# under sync workers one admin tab takes a whole worker. SERVER_THREADS is N,
+# and the feed gets at most half of a worker's threads (the default and the
+# cap for CHANGE_FEED_MAX_CLIENTS) so registrations always find a free one.
+# With gevent a stream only holds a greenlet: set SERVER_THREADS=0 for no cap.
+SERVER_THREADS = int(os.getenv('SERVER_THREADS', '8'))
+CHANGE_FEED_INTERVAL = float(os.getenv('CHANGE_FEED_INTERVAL', '2'))
+CHANGE_FEED_BATCH_SIZE = int(os.getenv('CHANGE_FEED_BATCH_SIZE', '200'))
+CHANGE_FEED_MAX_CLIENTS = int(os.getenv('CHANGE_FEED_MAX_CLIENTS', str(max(1, SERVER_THREADS // 2) if SERVER_THREADS else 50)))
+if SERVER_THREADS and CHANGE_FEED_MAX_CLIENTS > max(1, SERVER_THREADS // 2):
+    logger.warning("CHANGE_FEED_MAX_CLIENTS=%d would leave too few of SERVER_THREADS=%d for other requests; using %d",
+                   CHANGE_FEED_MAX_CLIENTS, SERVER_THREADS, max(1, SERVER_THREADS // 2))
+    CHANGE_FEED_MAX_CLIENTS = max(1, SERVER_THREADS // 2)
+CHANGE_FEED_HEARTBEAT = float(os.getenv('CHANGE_FEED_HEARTBEAT', '15'))
+
+def get_latest_registration_id():
+    """Highest registration id so far (0 when empty); a primary-key lookup"""
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT COALESCE(MAX(id), 0) FROM registrations")
+        (latest,) = cursor.fetchone()
+        cursor.close()
+        return int(latest)
+    finally:
+        connection.close()
+
+def get_registrations_after(after_id, gap_ids=(), limit=200):
+    """Registrations with id above after_id, plus any of gap_ids, in id order"""
+    conditions = ["id > %s"]
+    params = [after_id]
+    if gap_ids:
+        conditions.append(f"id IN ({', '.join(['%s'] * len(gap_ids))})")
+        params.extend(gap_ids)
+    query = f"""
+    SELECT id, student_name, roll_no, email, course, college, college_id, 
+           other_college, events, group_members, contact_numbers, 
+           total_amount, payment_screenshot_url, payment_status, 
+           screenshot_status, created_at
+    FROM registrations
+    WHERE {' OR '.join(conditions)}
+    ORDER BY id
+    LIMIT %s
+    """
+    params.append(limit)
+    
+    connection = get_db_connection()
+    if connection is None:
+        raise Exception("Database connection failed")
+    
+    try:
+        cursor = connection.cursor(dictionary=True)
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        cursor.close()
+        return rows
+    finally:
+        connection.close()
+
+change_feed = ChangeFeed(
+    fetch_rows=get_registrations_after,
+    latest_id=get_latest_registration_id,
+    read_stats=get_registration_stats,
+    serialize=serialize_registration,
+    interval=CHANGE_FEED_INTERVAL,
+    batch_size=CHANGE_FEED_BATCH_SIZE,
+    max_subscribers=CHANGE_FEED_MAX_CLIENTS
+)
+
+@app.route("/adminmgizeal/api/changes")
+def admin_changes_stream():
+    """Server-sent events for the admin page: new registrations, stats changes and resets
+    
+    Resumes after ?after=<id> (or the Last-Event-ID an EventSource sends on
+    reconnect). "reset" means the client fell too far behind and should reload.
+    """
+    after = request.headers.get("Last-Event-ID") or request.args.get("after")
+    try:
+        after_id = int(after) if after else None
+    except ValueError:
+        return jsonify(error="after must be a registration id"), 400
+    
+    subscription = change_feed.subscribe(after_id)
+    if subscription is None:
+        return reject(503, "change_feed", CHANGE_FEED_HEARTBEAT)
+    
+    def stream():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                message = subscription.get(CHANGE_FEED_HEARTBEAT)
+                # Comment lines keep proxies from timing out an idle stream
+                yield sse_frame(message) if message is not None else ": keepalive\n\n"
+        finally:
+            change_feed.unsubscribe(subscription)
+    
+    return Response(stream(), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
 # ---------------- EXPORT TO EXCEL ----------------
+EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '1000'))
+# Processes writing per-event roster workbooks; 0 writes them in the request thread.
+# The default leaves one core to the web process (so single-core hosts stay in-thread).
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', str(min(4, (os.cpu_count() or 1) - 1))))
+
+_export_pool = None
+_export_pool_lock = threading.Lock()
+
+def get_export_pool():
+    """Roster-writing process pool, started on first use; None when EXPORT_WORKERS is 0"""
+    global _export_pool
+    if EXPORT_WORKERS <= 0:
+        return None
+    with _export_pool_lock:
+        if _export_pool is None:
+            # spawn rather than fork: a forked child could inherit locks held by
+            # the pool, upload queue or logging threads of this process
+            _export_pool = ProcessPoolExecutor(
+                max_workers=EXPORT_WORKERS, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _export_pool
+
+def iter_event_rosters_zip(events):
+    """Zip of one roster workbook per event, streamed as the workers finish them"""
+    global _export_pool
+    directory = tempfile.mkdtemp(prefix='zeal_rosters_')
+    started = time.perf_counter()
+    try:
+        rosters = exports.iter_rosters(
+            events, get_event_participants, directory,
+            pool=get_export_pool(), max_pending=max(EXPORT_WORKERS, 1) * 2
+        )
+        entries = ((os.path.basename(path), path) for event, path, count in rosters)
+        yield from exports.iter_zip(entries)
+        logger.info("Event rosters exported", extra={
+            "events": len(events), "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+        })
+    except BrokenProcessPool:
+        # A worker died; start a fresh pool on the next export
+        with _export_pool_lock:
+            _export_pool = None
+        raise
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
 @app.route("/adminmgizeal/export")
 def export_excel():
+    """Stream all registrations as .xlsx (default) or ?format=csv in constant memory
+    
+    ?by=event returns a zip with one roster workbook per catalog event instead.
+    """
+    export_format = request.args.get("format", "xlsx").lower()
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    
     try:
-        data = get_all_registrations()
-        print(f"Exporting {len(data)} registrations")
-
-        if not data:
-            df = pd.DataFrame(columns=[
-                'id', 'student_name', 'roll_no', 'email', 'course', 'college', 
-                'college_id', 'other_college', 'events', 'group_members', 
-                'contact_numbers', 'total_amount', 'payment_screenshot_url', 
-                'payment_status', 'created_at'
-            ])
-        else:
-            df = pd.DataFrame(data)
+        if request.args.get("by") == "event":
+            filename = f"ZEAL_10_Event_Rosters_{timestamp}.zip"
+            events = list(pricing_engine.catalog().prices)
+            logger.info("Streaming event rosters: %s", filename, extra={"events": len(events)})
             
-            column_order = [
-                'id', 'student_name', 'roll_no', 'email', 'course', 'college', 
-                'college_id', 'other_college', 'events', 'group_members', 
-                'contact_numbers', 'total_amount', 'payment_status',
-                'payment_screenshot_url', 'created_at'
-            ]
+            return Response(
+                iter_event_rosters_zip(events),
+                mimetype='application/zip',
+                headers={"Content-Disposition": f"attachment; filename={filename}"}
+            )
+        
+        if export_format == "csv":
+            filename = f"ZEAL_10_Registrations_{timestamp}.csv"
+            logger.info("Streaming CSV export: %s", filename)
             
-            column_order = [col for col in column_order if col in df.columns]
-            df = df[column_order]
+            return Response(
+                stream_with_context(exports.iter_csv(iter_registrations(EXPORT_BATCH_SIZE))),
+                mimetype='text/csv; charset=utf-8',
+                headers={"Content-Disposition": f"attachment; filename={filename}"}
+            )
         
-            if 'created_at' in df.columns and not df.empty:
-                df['created_at'] = pd.to_datetime(df['created_at']).dt.strftime('%d-%m-%Y %H:%M:%S')
+        # openpyxl's write-only mode spills rows to disk as they are appended;
+        # the finished workbook is then streamed back in chunks.
+        path = exports.temp_export_path('.xlsx')
+        try:
+            count = exports.write_xlsx(iter_registrations(EXPORT_BATCH_SIZE), path)
+        except Exception:
+            os.remove(path)
+            raise
         
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Registrations')
-            
-            worksheet = writer.sheets['Registrations']
-            for idx, col in enumerate(df.columns):
-                if not df.empty:
-                    max_length = max(
-                        df[col].astype(str).apply(len).max(),
-                        len(str(col))
-                    ) + 2
-                else:
-                    max_length = len(str(col)) + 2
-                    
-                if idx < 26:
-                    col_letter = chr(65 + idx)
-                else:
-                    col_letter = chr(65 + idx // 26 - 1) + chr(65 + idx % 26)
-                    
-                worksheet.column_dimensions[col_letter].width = min(max_length, 50)
-        
-        output.seek(0)
-        
-        filename = f"ZEAL_10_Registrations_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        print(f"Excel exported: {filename}")
-        
-        return send_file(
-            output,
+        filename = f"ZEAL_10_Registrations_{timestamp}.xlsx"
+        logger.info("Excel exported: %s", filename, extra={"rows": count})
+        
+        return Response(
+            exports.iter_file_and_remove(path),
             mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            as_attachment=True,
-            download_name=filename
+            headers={
+                "Content-Disposition": f"attachment; filename={filename}",
+                "Content-Length": str(os.path.getsize(path))
+            }
         )
     
     except Exception as e:
-        print(f"Error exporting data: {e}")
-        traceback.print_exc()
+        logger.exception("Error exporting data: %s", e)
         return f"Error exporting data: {str(e)}", 500
 
 # ---------------- DEBUG ROUTE ----------------
 @app.route("/debug/db")
 def debug_db():
     """Debug route to check database status"""
+    connection = None
     try:
         connection = get_db_connection()
         if connection is None:
-            return {"error": "Cannot connect to database", "config": {k: v for k, v in DB_CONFIG.items() if k != 'password'}}, 500
+            return {"error": "Cannot connect to database", "config": {k: v for k, v in DB_CONFIG.items() if k != 'password'}, "pool": db_pool.stats()}, 500
         
         cursor = connection.cursor(dictionary=True)
         
@@ -660,7 +2274,6 @@ def debug_db():
         recent = cursor.fetchall()
         
         cursor.close()
-        connection.close()
         
         return {
             "status": "connected",
@@ -668,16 +2281,160 @@ def debug_db():
             "tables": tables,
             "total_registrations": count_result['count'],
             "recent_registrations": recent,
-            "cloudinary_configured": bool(os.getenv('CLOUDINARY_CLOUD_NAME'))
+            "cloudinary_configured": bool(os.getenv('CLOUDINARY_CLOUD_NAME')),
+            "pool": db_pool.stats()
         }
     except Exception as e:
         return {"error": str(e), "traceback": traceback.format_exc()}, 500
+    finally:
+        if connection is not None:
+            connection.close()
+
+@app.route("/debug/pool")
+def debug_pool():
+    """Connection pool usage: in-use, idle, waiters and checkout wait times"""
+    return db_pool.stats()
+
+@app.route("/debug/dedup")
+def debug_dedup():
+    """Duplicate-check bloom filter size and how many DB lookups it saved"""
+    return registration_filter.stats()
+
+@app.route("/debug/batching")
+def debug_batching():
+    """Write-behind insert batching counters"""
+    return {"enabled": REGISTRATION_BATCHING, **registration_writer.stats()}
+
+@app.route("/debug/admission")
+def debug_admission():
+    """Rate limiter and concurrency cap counters"""
+    return {
+        "enabled": RATE_LIMIT_ENABLED,
+        "rate_limits": {limiter.name: limiter.stats() for limiter in (ip_limiter, roll_limiter) if limiter is not None},
+        "concurrency": {step: limiter.stats() for step, limiter in step_limiters.items()},
+    }
+
+@app.route("/debug/sessions")
+def debug_sessions():
+    """Server-side session store size"""
+    if session_backend is None:
+        return {"backend": "cookie"}
+    return session_backend.stats()
+
+@app.route("/debug/changes")
+def debug_changes():
+    """Admin change feed: subscribers, polls and rows fanned out"""
+    return change_feed.stats()
+
+@app.route("/debug/idempotency")
+def debug_idempotency():
+    """Request keys held and finished"""
+    return idempotency_store.stats()
+
+@app.route("/debug/outbox")
+def debug_outbox():
+    """Confirmation email dispatcher counters and the outbox backlog"""
+    try:
+        backlog = get_outbox_backlog()
+    except Exception as e:
+        backlog = {"error": str(e)}
+    dispatcher = outbox_dispatcher.stats() if outbox_dispatcher is not None else {"running": False}
+    return {"enqueue": CONFIRMATION_EMAILS, "smtp_host": SMTP_HOST, **dispatcher, "backlog": backlog}
+
+@app.route("/debug/uploads")
+def debug_uploads():
+    """Background screenshot upload queue counters"""
+    return upload_queue.stats()
+
+# ---------------- METRICS ENDPOINT & PROFILING ----------------
+# Opt-in: PROFILE_SLOW_REQUEST_MS > 0 samples every request's stack every
+# PROFILE_INTERVAL_MS and writes folded stacks (flamegraph.pl / speedscope
+# input) to PROFILE_DIR for requests slower than the threshold.
+PROFILE_SLOW_REQUEST_MS = float(os.getenv('PROFILE_SLOW_REQUEST_MS', '0'))
+PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '5'))
+PROFILE_DIR = os.getenv('PROFILE_DIR', 'profiles')
+
+slow_request_profiler = None
+if PROFILE_SLOW_REQUEST_MS > 0:
+    slow_request_profiler = SlowRequestProfiler(
+        threshold=PROFILE_SLOW_REQUEST_MS / 1000,
+        interval=PROFILE_INTERVAL_MS / 1000,
+        output_dir=PROFILE_DIR
+    )
+    init_slow_request_profiler(app, slow_request_profiler)
+    REGISTRY.register_stats("zeal_profiler", slow_request_profiler.stats, "Slow-request profiler")
+
+REGISTRY.register_stats("zeal_db_pool", db_pool.stats, "MySQL connection pool")
+REGISTRY.register_stats("zeal_upload_queue", upload_queue.stats, "Screenshot upload queue")
+REGISTRY.register_stats("zeal_registration_writer", registration_writer.stats, "Insert batching")
+REGISTRY.register_stats("zeal_qr_cache", qr_cache.stats, "Payment QR cache")
+REGISTRY.register_stats("zeal_ticket_qr_cache", ticket_qr_cache.stats, "Entry ticket QR cache")
+REGISTRY.register_stats("zeal_dedup_filter", registration_filter.stats, "Duplicate-check filter")
+REGISTRY.register_stats("zeal_ratelimit_roll", roll_limiter.stats, "Per-roll-number registration rate limit")
+REGISTRY.register_stats("zeal_concurrency_final", step_limiters["final"].stats, "Concurrent final (upload) steps")
+REGISTRY.register_stats("zeal_concurrency_qr", step_limiters["qr"].stats, "Concurrent qr steps")
+REGISTRY.register_stats("zeal_request_keys", idempotency_store.stats, "Final-step request keys")
+REGISTRY.register_stats("zeal_change_feed", change_feed.stats, "Admin live change feed")
+REGISTRY.register_stats("zeal_outbox_backlog", outbox_backlog.stats, "Confirmation email outbox")
+if outbox_dispatcher is not None:
+    REGISTRY.register_stats("zeal_outbox", outbox_dispatcher.stats, "Confirmation email dispatcher")
+if ip_limiter is not None:
+    REGISTRY.register_stats("zeal_ratelimit_ip", ip_limiter.stats, "Per-IP registration rate limit")
+if session_backend is not None:
+    REGISTRY.register_stats("zeal_sessions", session_backend.stats, "Server-side session store")
+
+@app.route("/metrics")
+def metrics_endpoint():
+    """Prometheus text exposition of request, helper and component metrics"""
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+# ---------------- HEALTH ----------------
+# Readiness probes should not queue behind a saturated pool for long
+READINESS_DB_TIMEOUT = float(os.getenv('READINESS_DB_TIMEOUT', '1'))
+
+@app.route("/healthz")
+def healthz():
+    """Liveness: the process is up and serving; never touches the database"""
+    return {"status": "ok", "uptime_s": round(time.perf_counter() - _import_started, 1), **startup_timings}
+
+@app.route("/readyz")
+def readyz():
+    """Readiness: MySQL is reachable and the schema has been migrated to this code's version"""
+    checks = {"schema_expected": LATEST_VERSION, "warmed_up": startup_timings["warmup_ms"] is not None}
+    try:
+        connection = db_pool.acquire(timeout=READINESS_DB_TIMEOUT)
+    except Error as e:
+        return {"status": "unavailable", "database": str(e), **checks}, 503
+    
+    try:
+        checks["schema_version"] = schema_version(connection)
+    except Error as e:
+        return {"status": "unavailable", "database": str(e), **checks}, 503
+    finally:
+        connection.close()
+    
+    if checks["schema_version"] < LATEST_VERSION:
+        return {"status": "unavailable", "database": "ok", "hint": "run `flask migrate`", **checks}, 503
+    return {"status": "ready", "database": "ok", **checks}
+
+startup_timings["import_ms"] = round((time.perf_counter() - _import_started) * 1000, 1)
 
 # ---------------- START ----------------
 if __name__ == "__main__":
-    print(f"Starting ZEAL 10.0 Registration System")
-    print(f"MySQL Host: {DB_CONFIG['host']}")
-    print(f"MySQL Database: {DB_CONFIG['database']}")
-    print(f"QR directory: {os.path.abspath(QR_DIR)}")
-    print(f"Cloudinary configured: {bool(os.getenv('CLOUDINARY_CLOUD_NAME'))}")
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    logger.info("Starting ZEAL 10.0 Registration System", extra={
+        "mysql_host": DB_CONFIG['host'],
+        "mysql_database": DB_CONFIG['database'],
+        "mysql_pool_size": DB_POOL_SIZE,
+        "mysql_pool_timeout": DB_POOL_TIMEOUT,
+        "qr_cache_size": QR_CACHE_SIZE,
+        "qr_prewarm": QR_PREWARM,
+        "cloudinary_configured": bool(os.getenv('CLOUDINARY_CLOUD_NAME')),
+        "screenshot_uploader": SCREENSHOT_UPLOADER,
+        "upload_spool": os.path.abspath(UPLOAD_SPOOL_DIR),
+    })
+    # Local development keeps the old convenience of creating the schema on start
+    try:
+        run_migrations()
+    except (Error, MigrationError) as e:
+        logger.error("Database migration failed: %s", e)
+    app.run(host="0.0.0.0", port=5000, debug=True)
@@ -0,0 +1,96 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class BatchWriter:
+    """Write-behind queue that hands items to ``flush(items)`` in groups.
+
+    A single flusher thread waits for the first queued item, then keeps
+    collecting until it has ``max_batch`` items or ``max_wait`` seconds have
+    passed, and calls ``flush`` once for the whole group. ``flush`` returns
+    one result per item, in order; a result that is an exception is raised
+    to that item's caller only, and items it returns no result for fail
+    with RuntimeError. Callers block on the Future from ``submit()`` to get
+    their result.
+    """
+
+    def __init__(self, flush, max_batch=50, max_wait=0.01, name="batch-writer"):
+        self.flush = flush
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.name = name
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+
+        self._batches = 0
+        self._items = 0
+        self._largest = 0
+        self._flush_time = 0.0
+
+    def submit(self, item):
+        future = Future()
+        self._ensure_started()
+        self._queue.put((item, future))
+        return future
+
+    def _ensure_started(self):
+        # Started on first use so forked workers each get their own thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            started = time.monotonic()
+            try:
+                results = list(self.flush(items))
+            except Exception as e:
+                results = [e] * len(items)
+            elapsed = time.monotonic() - started
+            if len(results) < len(items):
+                # Never leave a caller waiting on a result that will not come
+                missing = RuntimeError(f"{self.name}: flush returned {len(results)} results for {len(items)} items")
+                results += [missing] * (len(items) - len(results))
+
+            for (_, future), result in zip(batch, results):
+                if isinstance(result, BaseException):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+            with self._lock:
+                self._batches += 1
+                self._items += len(items)
+                self._largest = max(self._largest, len(items))
+                self._flush_time += elapsed
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queued": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "largest_batch": self._largest,
+                "avg_batch": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "avg_flush_ms": round(self._flush_time / self._batches * 1000, 3) if self._batches else 0.0,
+            }
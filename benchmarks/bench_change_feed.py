@@ -0,0 +1,136 @@
+"""Fan-out cost and delivery latency of the admin live feed (``/adminmgizeal/api/changes``).
+
+    python benchmarks/bench_change_feed.py [--clients 1,10,40] [--rows 5000] [--rate 20] [--seconds 10]
+
+Seeds ``--rows`` registrations into a SQLite stand-in database, then for each
+client count opens that many SSE streams through the Flask test client
+(one thread each) while registrations are inserted at ``--rate`` per second
+for ``--seconds``. Each client checks it received every new id exactly once.
+
+Reported per run: delivery latency from commit to the client (p50 / p95 /
+max), database queries the feed issued, and what the same clients pressing
+refresh every ``--refresh`` seconds would have cost in page loads (each a
+stats read plus a 50-row page query). Latency is bounded below by
+CHANGE_FEED_INTERVAL (set to 0.5 s here).
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def read_stream(client, after_id, expected, deadline, received, errors):
+    """Consume one SSE stream until every expected id arrived or the deadline passed"""
+    response = client.get(f"/adminmgizeal/api/changes?after={after_id}", buffered=False)
+    if response.status_code != 200:
+        errors.append(f"status {response.status_code}")
+        return
+    buffer = ""
+    try:
+        for chunk in response.response:
+            buffer += chunk.decode() if isinstance(chunk, bytes) else chunk
+            while "\n\n" in buffer:
+                frame, buffer = buffer.split("\n\n", 1)
+                fields = dict(line.split(": ", 1) for line in frame.splitlines() if ": " in line and line[0] != ":")
+                if fields.get("event") == "registrations":
+                    now = time.monotonic()
+                    for row in json.loads(fields["data"])["rows"]:
+                        received.append((row["id"], now))
+                elif fields.get("event") == "reset":
+                    errors.append("reset")
+            if expected.issubset(row_id for row_id, _ in received) and expected or time.monotonic() > deadline:
+                break
+    finally:
+        response.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", default="1,10,40", help="Comma-separated numbers of open dashboards")
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=20, help="Registrations inserted per second")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--refresh", type=float, default=10, help="Refresh interval to compare against")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="zeal_bench_feed_")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("UPLOAD_SPOOL_DIR", os.path.join(workdir, "spool"))
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+    os.environ.setdefault("CHANGE_FEED_INTERVAL", "0.5")
+    os.environ.setdefault("CHANGE_FEED_HEARTBEAT", "1")
+    # Readers here are the bench's own threads, so no server thread cap applies
+    os.environ.setdefault("SERVER_THREADS", "0")
+
+    import app
+    import standins
+
+    standins.install_sqlite(app, os.path.join(workdir, "bench.sqlite3"))
+    catalog = app.pricing_engine.catalog()
+    counts = [int(value) for value in args.clients.split(",")]
+    per_run = int(args.rate * args.seconds)
+    rows = list(standins.seed_rows(catalog, args.rows + per_run * len(counts)))
+    for start in range(0, args.rows, 500):
+        app.insert_registrations(rows[start:min(start + 500, args.rows)])
+    pending = iter(rows[args.rows:])
+
+    client = app.app.test_client()
+    print(f"{'clients':>8}{'rows':>7}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'missing':>9}{'dupes':>7}"
+          f"{'feed queries':>14}{'refresh loads':>15}")
+
+    for clients in counts:
+        after_id = app.get_latest_registration_id()
+        queries_before = app.change_feed.stats()["polls"] * 2
+        committed = {}
+        expected = set()
+        deadline = time.monotonic() + args.seconds + 5
+        results = [([], []) for _ in range(clients)]
+        readers = [
+            threading.Thread(target=read_stream, args=(client, after_id, expected, deadline, *results[i]))
+            for i in range(clients)
+        ]
+        for reader in readers:
+            reader.start()
+        while app.change_feed.stats()["subscribers"] < clients:
+            time.sleep(0.01)
+
+        started = time.monotonic()
+        for i in range(per_run):
+            time.sleep(max(0.0, started + i / args.rate - time.monotonic()))
+            (row_id,) = app.insert_registrations([next(pending)])
+            committed[row_id] = time.monotonic()
+        expected.update(committed)
+        for reader in readers:
+            reader.join()
+
+        latencies, missing, dupes = [], 0, 0
+        for received, errors in results:
+            ids = [row_id for row_id, _ in received]
+            missing += len(expected - set(ids))
+            dupes += len(ids) - len(set(ids))
+            latencies.extend((at - committed[row_id]) * 1000 for row_id, at in received if row_id in committed)
+            if errors:
+                print(f"  client errors: {errors}")
+        latencies.sort()
+        # Stats read + first page per refresh, per client
+        refresh_loads = clients * int(args.seconds / args.refresh) * 2
+        feed_queries = app.change_feed.stats()["polls"] * 2 - queries_before + clients
+        p95 = latencies[int(len(latencies) * 0.95)] if latencies else 0
+        print(f"{clients:>8}{per_run:>7}{statistics.median(latencies) if latencies else 0:>9.0f}{p95:>9.0f}"
+              f"{(latencies[-1] if latencies else 0):>9.0f}{missing:>9}{dupes:>7}{feed_queries:>14}{refresh_loads:>15}")
+        while app.change_feed.stats()["subscribers"]:
+            time.sleep(0.05)
+
+    print(f"feed: {app.change_feed.stats()}")
+
+
+if __name__ == "__main__":
+    main()
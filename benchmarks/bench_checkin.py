@@ -0,0 +1,121 @@
+"""Gate check-in throughput: ticket verification, logged scans and log sync.
+
+    python benchmarks/bench_checkin.py [--tickets 20000] [--invalid 0.05] [--repeats 0.1]
+
+Issues ``--tickets`` signed tickets, then measures:
+
+- verify: ``TicketSigner.verify()`` alone, per ticket (no I/O)
+- scan: ``CheckInService.scan()`` including the append-only log write, with
+  and without an fsync per scan. The scan stream mixes in an ``--invalid``
+  share of tampered tickets and a ``--repeats`` share of second scans.
+- restart: rebuilding who is already in from the log
+- sync: pushing the log to ``/checkin/sync`` (Flask test client, SQLite
+  stand-in). A push that fails part-way is retried, and the rows stored
+  are checked to be exactly the scans logged, with nothing doubled.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def tamper(token, rng):
+    position = rng.randrange(3, len(token))
+    replacement = "A" if token[position] != "A" else "B"
+    return token[:position] + replacement + token[position + 1:]
+
+
+def rate(count, seconds):
+    return f"{count / seconds:>10,.0f}/s  {seconds / count * 1e6:>7.1f} us each"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tickets", type=int, default=20000)
+    parser.add_argument("--invalid", type=float, default=0.05, help="Share of tampered tickets in the scan stream")
+    parser.add_argument("--repeats", type=float, default=0.1, help="Share of tickets scanned a second time")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="zeal_bench_checkin_")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("UPLOAD_SPOOL_DIR", os.path.join(workdir, "spool"))
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+    os.environ.setdefault("TICKET_SECRETS", "bench-secret-new,bench-secret-old")
+    os.environ.setdefault("CHECKIN_SYNC_TOKEN", "bench-sync-token")
+
+    import app
+    import standins
+    from checkin import CheckInLog, CheckInService
+
+    rng = random.Random(24)
+    catalog = app.pricing_engine.catalog()
+    names = list(catalog.prices)
+    tokens = [
+        app.ticket_signer.issue(i, rng.sample(names, rng.randint(1, 4)), rng.choice(["Submitted", "Verified"]))
+        for i in range(1, args.tickets + 1)
+    ]
+    print(f"{len(tokens)} tickets, median {sorted(map(len, tokens))[len(tokens) // 2]} characters")
+
+    started = time.perf_counter()
+    for token in tokens:
+        app.ticket_signer.verify(token)
+    print(f"verify                {rate(len(tokens), time.perf_counter() - started)}")
+
+    stream = [tamper(token, rng) if rng.random() < args.invalid else token for token in tokens]
+    stream += rng.sample(tokens, int(len(tokens) * args.repeats))
+
+    for durable in (False, True):
+        log_path = os.path.join(workdir, f"scans_{'fsync' if durable else 'flush'}.jsonl")
+        service = CheckInService(app.ticket_signer, CheckInLog(log_path, durable=durable), device="bench")
+        started = time.perf_counter()
+        for token in stream:
+            service.scan(token)
+        label = "scan + log (fsync)" if durable else "scan + log (flush)"
+        print(f"{label:<22}{rate(len(stream), time.perf_counter() - started)}  {service.stats()}")
+        service.log.close()
+
+    started = time.perf_counter()
+    restarted = CheckInService(app.ticket_signer, CheckInLog(log_path), device="bench")
+    print(f"restart from log      {(time.perf_counter() - started) * 1000:.0f} ms for {len(stream)} scans, "
+          f"{restarted.stats()['admitted']} already in")
+
+    standins.install_sqlite(app, os.path.join(workdir, "bench.sqlite3"))
+    client = app.app.test_client()
+    headers = {"Authorization": f"Bearer {app.CHECKIN_SYNC_TOKEN}"}
+    pushed = {"batches": 0}
+
+    def push(scans, fail_at=None):
+        pushed["batches"] += 1
+        if pushed["batches"] == fail_at:
+            raise ConnectionError("venue network dropped")
+        response = client.post("/checkin/sync", json={"scans": scans}, headers=headers)
+        if response.status_code != 200:
+            raise RuntimeError(response.get_json())
+
+    log = restarted.log
+    try:
+        log.sync(lambda scans: push(scans, fail_at=5), batch_size=app.CHECKIN_SYNC_BATCH_SIZE)
+    except ConnectionError as e:
+        print(f"sync interrupted after {log.synced_offset} bytes: {e}")
+    started = time.perf_counter()
+    sent = log.sync(push, batch_size=app.CHECKIN_SYNC_BATCH_SIZE)
+    elapsed = time.perf_counter() - started
+    again = log.sync(push)
+
+    connection = app.get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute("SELECT COUNT(*), COUNT(DISTINCT scan_id) FROM checkins")
+    stored, distinct = cursor.fetchone()
+    connection.close()
+    print(f"sync                  {rate(sent, elapsed)} (the rest after the interruption)")
+    print(f"stored {stored} rows ({distinct} distinct) for {len(stream)} scans; a second sync sent {again}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Measure worker cold start: fresh interpreter -> app imported -> first responses.
+
+    python benchmarks/bench_cold_start.py [--runs 5] [--mysql-host 10.255.255.1]
+
+Each run starts a new Python process that imports ``app`` and issues GET
+/healthz and GET /readyz through the test client, reporting how long each
+stage took. Point ``--mysql-host`` at an unreachable address to confirm that
+import and /healthz do not wait on MySQL (only /readyz should, bounded by
+``--connect-timeout``).
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PROBE = r"""
+import json, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+health = client.get("/healthz")
+healthy = time.perf_counter()
+ready = client.get("/readyz")
+readied = time.perf_counter()
+json.dump({
+    "import_ms": (imported - started) * 1000,
+    "healthz_ms": (healthy - imported) * 1000,
+    "readyz_ms": (readied - healthy) * 1000,
+    "healthz_status": health.status_code,
+    "readyz_status": ready.status_code,
+}, sys.stderr)
+"""
+
+
+def run_once(env):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=ROOT, env=env, capture_output=True, text=True, timeout=300
+    )
+    total_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr)
+    # The probe writes its timings last on stderr; app logs go to stdout
+    timings = json.loads(result.stderr.strip().splitlines()[-1])
+    timings["process_ms"] = total_ms
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--mysql-host", default=os.getenv("MYSQL_HOST", "localhost"))
+    parser.add_argument("--connect-timeout", type=int, default=2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as spool:
+        env = dict(
+            os.environ,
+            MYSQL_HOST=args.mysql_host,
+            MYSQL_CONNECT_TIMEOUT=str(args.connect_timeout),
+            UPLOAD_SPOOL_DIR=spool,
+            LOG_LEVEL="WARNING",
+        )
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    print(f"{args.runs} cold starts, MYSQL_HOST={args.mysql_host}")
+    for key in ("process_ms", "import_ms", "healthz_ms", "readyz_ms"):
+        values = [run[key] for run in runs]
+        print(f"  {key:<11} median {statistics.median(values):8.1f}  max {max(values):8.1f}")
+    print(f"  status      /healthz {runs[-1]['healthz_status']}  /readyz {runs[-1]['readyz_status']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
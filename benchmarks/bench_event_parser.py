@@ -0,0 +1,168 @@
+"""Check the single-pass event parser against the original one and time both.
+
+    python benchmarks/bench_event_parser.py [--forms 5000] [--seed 10]
+
+Randomized forms mix plain events, category-bearing parents, category radios
+named after the template's radio groups, index-style ``category_<i>`` keys,
+empty categories and unknown events. Any mismatch is printed and the script
+exits non-zero.
+"""
+import argparse
+import contextlib
+import io
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from werkzeug.datastructures import MultiDict  # noqa: E402
+
+from events import parse_events_with_categories  # noqa: E402
+from pricing import load_catalog  # noqa: E402
+
+CATALOG = load_catalog()
+EVENT_PRICES = CATALOG.prices
+CATEGORY_PARENTS = CATALOG.category_parents
+
+
+def legacy_parse_events_with_categories(form_data):
+    """The parser as it shipped before the rewrite, kept verbatim as the reference"""
+    selected_events = form_data.getlist("events")
+    events_list = []
+    
+    print(f"Raw selected events: {selected_events}")
+    print(f"All form keys: {list(form_data.keys())}")
+    
+    category_map = {}
+    for key in form_data.keys():
+        if key.startswith('category_'):
+            event_idx = key.replace('category_', '')
+            category_map[event_idx] = form_data.get(key)
+            print(f"Found category: {key} = {form_data.get(key)}")
+    
+    for i, event in enumerate(selected_events):
+        category_found = False
+        for cat_idx, category in category_map.items():
+            checkbox_indices = [j for j, e in enumerate(selected_events) if e == event]
+            if str(cat_idx) in [str(idx) for idx in range(len(form_data.getlist("events")))]:
+                all_event_checkboxes = [(k, v) for k, v in form_data.items() if k == 'events']
+                test_key = f"category_{i}"
+                if test_key in category_map:
+                    event_with_category = f"{event} - {category_map[test_key]}"
+                    events_list.append(event_with_category)
+                    print(f"Event with category (matched by index): {event_with_category}")
+                    category_found = True
+                    break
+        
+        if not category_found:
+            if event in ["Dance Competition", "Fashion Show Competition", "Singing"]:
+                for cat_idx, category in category_map.items():
+                    if category:
+                        event_with_category = f"{event} - {category}"
+                        events_list.append(event_with_category)
+                        print(f"Event with category (fallback): {event_with_category}")
+                        category_found = True
+                        del category_map[cat_idx]
+                        break
+            
+            if not category_found:
+                events_list.append(event)
+                print(f"Event without category: {event}")
+    
+    print(f"Final parsed events: {events_list}")
+    return events_list
+
+
+def legacy_quiet(form):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return legacy_parse_events_with_categories(form)
+
+
+SIMPLE_EVENTS = [name for name in EVENT_PRICES if " - " not in name]
+CATEGORIES = sorted({name.split(" - ", 1)[1] for name in EVENT_PRICES if " - " in name})
+PARENTS = sorted(CATEGORY_PARENTS)
+
+PROFILE_FIELDS = [
+    ("step", "qr"), ("student_name", "Test"), ("roll_no", "R1"), ("email", "a@b.co"),
+    ("course", "BBA"), ("college", "Other"), ("contact_numbers", "99999"),
+]
+
+
+def random_form(rng, max_events=12):
+    """A form laid out the way the browser submits it: fields in DOM order"""
+    items = list(PROFILE_FIELDS)
+    chosen = rng.sample(SIMPLE_EVENTS + PARENTS + ["Unknown Event"], rng.randint(0, max_events))
+    if rng.random() < 0.2 and chosen:
+        chosen.append(rng.choice(chosen))  # duplicate checkbox values
+
+    for event in chosen:
+        items.append(("events", event))
+        if event in CATEGORY_PARENTS and rng.random() < 0.85:
+            group = "category_" + "".join(c if c.isalnum() else "_" for c in event)
+            items.append((group, rng.choice(CATEGORIES + [""])))
+
+    # Index-style keys and stray categories exercise the legacy matching rules
+    for _ in range(rng.randint(0, 3)):
+        suffix = rng.choice([str(rng.randint(0, max_events)), "x", "category_0", ""])
+        items.append((f"category_{suffix}", rng.choice(CATEGORIES + [""])))
+
+    if rng.random() < 0.3:
+        rng.shuffle(items)
+    return MultiDict(items)
+
+
+def scaled_form(rng, size):
+    """A large synthetic form for timing, with ``size`` selected events"""
+    items = list(PROFILE_FIELDS)
+    for i in range(size):
+        event = rng.choice(SIMPLE_EVENTS + PARENTS)
+        items.append(("events", event))
+        if event in CATEGORY_PARENTS:
+            items.append((f"category_{event.replace(' ', '_')}_{i}", rng.choice(CATEGORIES)))
+    return MultiDict(items)
+
+
+def check_equivalence(forms, seed):
+    rng = random.Random(seed)
+    mismatches = 0
+    for n in range(forms):
+        form = random_form(rng)
+        expected = legacy_quiet(form)
+        actual = parse_events_with_categories(form, CATEGORY_PARENTS)
+        if expected != actual:
+            mismatches += 1
+            if mismatches <= 5:
+                print(f"MISMATCH on form #{n}: {list(form.items(multi=True))}")
+                print(f"  legacy: {expected}")
+                print(f"  new:    {actual}")
+    return mismatches
+
+
+def time_parsers(seed):
+    rng = random.Random(seed)
+    print(f"{'events':>8} {'legacy (ms)':>12} {'new (ms)':>10} {'speedup':>9}")
+    for size in (4, 16, 64, 256):
+        form = scaled_form(rng, size)
+        assert legacy_quiet(form) == parse_events_with_categories(form, CATEGORY_PARENTS)
+        runs = max(3, 2000 // (size * size))
+        legacy = min(timeit.repeat(lambda: legacy_quiet(form), number=runs, repeat=3)) / runs
+        new = min(timeit.repeat(lambda: parse_events_with_categories(form, CATEGORY_PARENTS), number=runs, repeat=3)) / runs
+        print(f"{size:>8} {legacy * 1e3:>12.3f} {new * 1e3:>10.3f} {legacy / new:>8.1f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--forms", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=10)
+    args = parser.parse_args()
+
+    mismatches = check_equivalence(args.forms, args.seed)
+    print(f"Equivalence: {args.forms - mismatches}/{args.forms} randomized forms match")
+    time_parsers(args.seed)
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,331 @@
+"""Load-test the registration flow and compare against a stored baseline.
+
+    python benchmarks/bench_load.py [--requests 300] [--concurrency 8] [--rows 5000]
+                                    [--scenarios home,qr,final,...] [--mysql]
+                                    [--save-baseline PATH] [--baseline PATH]
+
+Every scenario runs in a fresh Python process so its peak RSS is its own.
+That process imports the app, serves it with a threaded werkzeug server on
+localhost and drives it with ``--concurrency`` client threads. MySQL is
+replaced by a SQLite file (``standins.install_sqlite``) unless ``--mysql``
+is given, in which case the MYSQL_* environment is used as-is. Cloudinary
+is always replaced by ``standins.FakeUploader``.
+
+Reported per scenario: requests/s, p50/p95/p99 latency in ms, errors and
+peak RSS in MB, plus how long the background upload queue took to drain
+afterwards (its work counts towards the scenario's RSS). With ``--baseline`` the run is compared to a file written
+earlier by ``--save-baseline``, and the script exits non-zero when p95 or
+RSS grew, or throughput fell, by more than ``--tolerance`` (default 25%).
+``baselines/load_sqlite.json`` holds a default-settings SQLite run; numbers
+are machine-specific, so regenerate it on the box you compare on.
+"""
+import argparse
+import http.client
+import io
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+# name -> (requests multiplier, concurrency cap, expected status)
+SCENARIOS = {
+    "home": (1.0, None, 200),
+    "qr": (1.0, None, 200),
+    "final": (1.0, None, 200),
+    "admin": (0.25, None, 200),
+    "admin_api": (1.0, None, 200),
+    "export_xlsx": (0.02, 2, 200),
+    "export_csv": (0.02, 2, 200),
+}
+
+
+# ---------------- REQUESTS ----------------
+def make_screenshot(size=(720, 1280), quality=85):
+    """A phone-sized JPEG with enough noise to be a realistic few hundred KB"""
+    from PIL import Image
+
+    rng = random.Random(10)
+    image = Image.new("RGB", size, (245, 245, 245))
+    noise = Image.frombytes("RGB", (size[0] // 4, size[1] // 4), rng.randbytes(size[0] * size[1] * 3 // 16))
+    image.paste(noise.resize(size), (0, 0))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality)
+    return buffer.getvalue()
+
+
+def multipart(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+        )
+    for name, filename, content_type, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{filename}"\r\n'
+            f"Content-Type: {content_type}\r\n\r\n".encode() + data + b"\r\n"
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    return b"".join(parts), f"multipart/form-data; boundary={boundary}"
+
+
+def registration_fields(step, catalog, rng):
+    plain = [item["name"] for item in json.loads(catalog.client_json)["menu"] if item["price"] is not None]
+    token = uuid.uuid4().hex[:10]
+    fields = [
+        ("step", step),
+        ("student_name", f"Load Test {token}"),
+        ("roll_no", f"LT{token}"),
+        ("email", f"lt{token}@example.com"),
+        ("course", "B.Tech CSE"),
+        ("college", rng.choice(["Bennett University", "Mangalmay Group of Institutions"])),
+        ("contact_numbers", "9999999999"),
+        ("group_members", ""),
+    ]
+    fields += [("events", name) for name in rng.sample(plain, 2)]
+    return fields
+
+
+def build_request(scenario, catalog, rng, screenshot):
+    """(method, path, body, headers) for one request of a scenario"""
+    if scenario == "home":
+        return "GET", "/", None, {}
+    if scenario == "qr":
+        body = urlencode(registration_fields("qr", catalog, rng)).encode()
+        return "POST", "/", body, {"Content-Type": "application/x-www-form-urlencoded"}
+    if scenario == "final":
+        body, content_type = multipart(
+            registration_fields("final", catalog, rng),
+            [("payment_screenshot", "payment.jpg", "image/jpeg", screenshot)]
+        )
+        return "POST", "/", body, {"Content-Type": content_type}
+    if scenario == "admin":
+        return "GET", "/adminmgizeal", None, {}
+    if scenario == "admin_api":
+        return "GET", "/adminmgizeal/api/registrations?limit=50", None, {}
+    if scenario == "export_xlsx":
+        return "GET", "/adminmgizeal/export", None, {}
+    if scenario == "export_csv":
+        return "GET", "/adminmgizeal/export?format=csv", None, {}
+    raise ValueError(scenario)
+
+
+# ---------------- CHILD: ONE SCENARIO ----------------
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(args):
+    import app
+    import standins
+    from werkzeug.serving import make_server
+
+    if not args.mysql:
+        standins.install_sqlite(app, os.path.join(args.workdir, "bench.sqlite3"))
+    else:
+        app.run_migrations()
+    app.upload_queue.uploader = standins.FakeUploader(args.upload_latency)
+
+    catalog = app.pricing_engine.catalog()
+    existing = (app.get_registration_stats() or {}).get("total_registrations", 0)
+    rows = list(standins.seed_rows(catalog, args.rows))[existing:]
+    for start in range(0, len(rows), 500):
+        app.insert_registrations(rows[start:start + 500])
+
+    server = make_server("127.0.0.1", 0, app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+
+    multiplier, cap, expected = SCENARIOS[args.scenario]
+    total = max(1, int(args.requests * multiplier))
+    concurrency = min(args.concurrency, cap or args.concurrency, total)
+    screenshot = make_screenshot() if args.scenario == "final" else None
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+    counter = iter(range(total + args.warmup))
+
+    def worker(seed):
+        rng = random.Random(seed)
+        while True:
+            with lock:
+                n = next(counter, None)
+            if n is None:
+                return
+            method, path, body, headers = build_request(args.scenario, catalog, rng, screenshot)
+            started = time.perf_counter()
+            try:
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+                connection.close()
+            except Exception as e:
+                status = repr(e)
+            elapsed = time.perf_counter() - started
+            if n < args.warmup:
+                continue
+            with lock:
+                latencies.append(elapsed)
+                if status != expected:
+                    errors.append(status)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    server.shutdown()
+
+    # Background uploads (and screenshot re-encoding) count towards this scenario
+    drain_started = time.perf_counter()
+    while time.perf_counter() - drain_started < 120:
+        queue_stats = app.upload_queue.stats()
+        if queue_stats["completed"] + queue_stats["failed"] >= queue_stats["submitted"]:
+            break
+        time.sleep(0.05)
+    drain = time.perf_counter() - drain_started
+
+    latencies.sort()
+    result = {
+        "scenario": args.scenario,
+        "requests": len(latencies),
+        "concurrency": concurrency,
+        "rps": len(latencies) / wall if wall else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "upload_drain_s": drain,
+        "errors": len(errors),
+        "error_sample": [str(e) for e in errors[:3]],
+        # ru_maxrss is in KiB on Linux
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "pool": app.db_pool.stats(),
+    }
+    with open(args.out, "w") as fh:
+        json.dump(result, fh)
+
+
+# ---------------- PARENT: ALL SCENARIOS ----------------
+def spawn(scenario, args, workdir):
+    # Each scenario gets its own spool so leftover uploads are never recovered by the next one
+    out = os.path.join(workdir, f"{scenario}.json")
+    command = [
+        sys.executable, os.path.abspath(__file__), "--child", scenario, "--out", out,
+        "--workdir", workdir, "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+        "--rows", str(args.rows), "--warmup", str(args.warmup), "--upload-latency", str(args.upload_latency),
+    ]
+    if args.mysql:
+        command.append("--mysql")
+    env = dict(
+        os.environ,
+        UPLOAD_SPOOL_DIR=os.path.join(workdir, f"spool-{scenario}"),
+        LOG_LEVEL=os.getenv("LOG_LEVEL", "WARNING"),
+        MYSQL_CONNECT_TIMEOUT=os.getenv("MYSQL_CONNECT_TIMEOUT", "2"),
+        # All traffic comes from one local IP; measure the app, not the limiter
+        RATE_LIMIT_ENABLED=os.getenv("RATE_LIMIT_ENABLED", "0"),
+    )
+    result = subprocess.run(command, cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"{scenario} failed:\n{result.stderr}")
+    with open(out) as fh:
+        return json.load(fh)
+
+
+def compare(results, baseline, tolerance):
+    """Human-readable regressions of ``results`` against ``baseline``"""
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {previous['p95_ms']:.1f} -> {current['p95_ms']:.1f} ms")
+        if current["rps"] < previous["rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {previous['rps']:.1f} -> {current['rps']:.1f} req/s")
+        if current["peak_rss_mb"] > previous["peak_rss_mb"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: peak RSS {previous['peak_rss_mb']:.0f} -> {current['peak_rss_mb']:.0f} MB"
+            )
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}: errors {previous['errors']} -> {current['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--requests", type=int, default=300, help="Requests per scenario (scaled down for exports)")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rows", type=int, default=5000, help="Registrations seeded before measuring")
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--upload-latency", type=float, default=0.05, help="Seconds per fake Cloudinary upload")
+    parser.add_argument("--mysql", action="store_true", help="Use the MySQL from MYSQL_* instead of SQLite")
+    parser.add_argument("--save-baseline", metavar="PATH")
+    parser.add_argument("--baseline", metavar="PATH")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--out", help=argparse.SUPPRESS)
+    parser.add_argument("--workdir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        args.scenario = args.child
+        run_scenario(args)
+        return 0
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"{'scenario':<12} {'reqs':>5} {'conc':>4} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} "
+              f"{'errors':>6} {'rss MB':>7} {'drain s':>7}")
+        for name in scenarios:
+            result = spawn(name, args, workdir)
+            results[name] = result
+            print(f"{name:<12} {result['requests']:>5} {result['concurrency']:>4} {result['rps']:>8.1f} "
+                  f"{result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+                  f"{result['errors']:>6} {result['peak_rss_mb']:>7.0f} {result['upload_drain_s']:>7.1f}")
+            if result["errors"]:
+                print(f"{'':<12} e.g. {result['error_sample']}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
+        print(f"baseline written to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            regressions = compare(results, json.load(fh), args.tolerance)
+        if regressions:
+            print("REGRESSIONS:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"no regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,187 @@
+"""Confirmation emails through the outbox: write-path cost, dispatcher throughput, retries and lag.
+
+    python benchmarks/bench_outbox.py [--rows 500] [--smtp-ms 20] [--connect-ms 80] [--rate 10] [--seconds 10]
+
+Runs against a SQLite stand-in database and ``standins.DebugSMTPServer``,
+which adds ``--smtp-ms`` per message and ``--connect-ms`` per connection
+(roughly a real provider's TLS handshake and login).
+
+- write path: ``add_registration()`` per row with and without the outbox
+  insert, next to what sending the email inline (connect + send) would add
+- drain: ``OutboxDispatcher.drain()`` over ``--rows`` emails, reusing one
+  SMTP connection vs opening one per message, with no rate cap
+- retries: the server answers 451 to ~10% of first attempts and 550 to ~2%
+  of recipients; every 451 must arrive exactly once, every 550 must fail
+- lag: registrations arrive at ``--rate`` per second for ``--seconds`` while
+  the background dispatcher runs under ``--cap`` emails per minute; reports
+  queue lag (commit to hand-off) and the backlog it left
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def reset_outbox(app):
+    """Mark every outbox row unsent again, so the next drain starts from the same backlog"""
+    connection = app.get_db_connection()
+    cursor = connection.cursor()
+    cursor.execute("UPDATE email_outbox SET status = 'pending', attempts = 0, sent_at = NULL, "
+                   "next_attempt_at = created_at, last_error = NULL")
+    connection.commit()
+    connection.close()
+
+
+def per_row_ms(seconds, count):
+    return f"{seconds / count * 1000:7.2f} ms/registration"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--smtp-ms", type=float, default=20, help="Server latency per message")
+    parser.add_argument("--connect-ms", type=float, default=80, help="Server latency per new connection")
+    parser.add_argument("--rate", type=float, default=10, help="Registrations per second in the lag run")
+    parser.add_argument("--seconds", type=float, default=10, help="Length of the lag run")
+    parser.add_argument("--cap", type=float, default=900, help="OUTBOX_RATE_PER_MIN in the lag run")
+    args = parser.parse_args()
+
+    import standins
+    first_attempts = set()
+
+    def seed_number(address):
+        return int(address[len("seed"):].split("@")[0])
+
+    def rcpt_reply(address):
+        if seed_number(address) % 50 == 7:
+            return "550 No such user here"
+        if seed_number(address) % 10 == 3 and address not in first_attempts:
+            first_attempts.add(address)
+            return "451 Greylisted, try again later"
+        return "250 OK"
+
+    server = standins.DebugSMTPServer(latency=args.smtp_ms / 1000, connect_latency=args.connect_ms / 1000).start()
+
+    workdir = tempfile.mkdtemp(prefix="zeal_bench_outbox_")
+    # The retry run logs every 451 and 550 on purpose
+    os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+    os.environ.setdefault("UPLOAD_SPOOL_DIR", os.path.join(workdir, "spool"))
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+    os.environ["SMTP_HOST"] = "127.0.0.1"
+    os.environ["SMTP_PORT"] = str(server.port)
+    os.environ["SMTP_STARTTLS"] = "0"
+    os.environ.setdefault("MAIL_FROM", "ZEAL 10.0 <no-reply@zeal.example>")
+    os.environ.setdefault("PUBLIC_BASE_URL", "https://zeal.example")
+    os.environ.setdefault("TICKET_SECRETS", "bench-ticket-secret")
+
+    import app
+    from outbox import OutboxDispatcher
+
+    standins.install_sqlite(app, os.path.join(workdir, "bench.sqlite3"))
+    catalog = app.pricing_engine.catalog()
+    lag_rows = int(args.rate * args.seconds)
+    rows = list(standins.seed_rows(catalog, args.rows * 2 + lag_rows))
+
+    # ---- write path ----
+    timings = {}
+    for label, enabled, batch in (("no email", False, rows[:args.rows]), ("outbox", True, rows[args.rows:args.rows * 2])):
+        app.CONFIRMATION_EMAILS = enabled
+        started = time.perf_counter()
+        for row in batch:
+            app.add_registration(row)
+        timings[label] = time.perf_counter() - started
+    sample = min(50, args.rows)
+    started = time.perf_counter()
+    for _ in range(sample):
+        smtp = app.connect_smtp()
+        smtp.sendmail("no-reply@zeal.example", ["inline@example.com"], b"Subject: inline\r\n\r\nhello\r\n")
+        smtp.quit()
+    inline = (time.perf_counter() - started) / sample
+    print("write path")
+    print(f"  add_registration, no email       {per_row_ms(timings['no email'], args.rows)}")
+    print(f"  add_registration + outbox row    {per_row_ms(timings['outbox'], args.rows)}")
+    print(f"  inline SMTP would add            {inline * 1000:7.2f} ms/registration")
+
+    # ---- drain throughput ----
+    print(f"drain {args.rows} emails ({args.smtp_ms:.0f} ms/message, {args.connect_ms:.0f} ms/connection, uncapped)")
+    for label, per_connection in (("reused connection", 100), ("connection per email", 1)):
+        reset_outbox(app)
+        server.messages.clear()
+        connections_before = server.connections
+        dispatcher = OutboxDispatcher(app.get_db_connection, app.connect_smtp, app.render_outbox_email,
+                                      batch_size=app.OUTBOX_BATCH_SIZE, rate=0, max_per_connection=per_connection)
+        started = time.perf_counter()
+        dispatcher.drain()
+        elapsed = time.perf_counter() - started
+        stats = dispatcher.stats()
+        print(f"  {label:<22} {stats['sent'] / elapsed:8.1f} emails/s  {server.connections - connections_before:5d} "
+              f"connections  avg send {stats['avg_send_ms']:.1f} ms  batches {stats['batches']}")
+        if label == "reused connection" and args.rows:
+            sample_message = server.messages[0][2].decode()
+            body = sample_message.split("\r\n\r\n", 1)[1]
+            print(f"  sample body: {len(body)} bytes, ticket link: {'/ticket/' in body}")
+
+    # ---- retries ----
+    reset_outbox(app)
+    server.messages.clear()
+    server.latency = 0
+    server.rcpt_reply = rcpt_reply
+    dispatcher = OutboxDispatcher(app.get_db_connection, app.connect_smtp, app.render_outbox_email,
+                                  batch_size=app.OUTBOX_BATCH_SIZE, rate=0, backoff_base=0.05, backoff_max=0.2)
+    rounds = 0
+    while True:
+        rounds += 1
+        dispatcher.drain()
+        backlog = app.get_outbox_backlog()
+        if not backlog["pending"]:
+            break
+        time.sleep(0.25)
+    stats = dispatcher.stats()
+    delivered = [recipients[0] for _, recipients, _ in server.messages]
+    greylisted = sorted(first_attempts)
+    refused = [row["email"] for row in rows[args.rows:args.rows * 2] if seed_number(row["email"]) % 50 == 7]
+    print("retries")
+    print(f"  sent {stats['sent']}, retried {stats['retried']}, failed {stats['failed']} in {rounds} drain rounds; "
+          f"backlog {backlog}")
+    print(f"  451s delivered exactly once: {all(delivered.count(address) == 1 for address in greylisted)} "
+          f"({len(greylisted)}); 550s failed: {backlog['failed'] == len(refused)} ({len(refused)}); "
+          f"duplicates: {len(delivered) - len(set(delivered))}")
+
+    # ---- lag under a rate cap ----
+    server.rcpt_reply = lambda address: "250 OK"
+    server.latency = args.smtp_ms / 1000
+    app.CONFIRMATION_EMAILS = True
+    dispatcher = OutboxDispatcher(app.get_db_connection, app.connect_smtp, app.render_outbox_email,
+                                  batch_size=app.OUTBOX_BATCH_SIZE, interval=0.2, rate=args.cap / 60)
+    backlog_samples = []
+    dispatcher.start()
+    started = time.monotonic()
+    for index, row in enumerate(rows[args.rows * 2:]):
+        delay = started + index / args.rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        app.add_registration(row)
+        if index % max(1, int(args.rate)) == 0:
+            backlog_samples.append(app.get_outbox_backlog()["pending"])
+    deadline = time.monotonic() + 60
+    while app.get_outbox_backlog()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.1)
+    dispatcher.stop()
+    stats = dispatcher.stats()
+    elapsed = time.monotonic() - started
+    print(f"lag: {lag_rows} registrations at {args.rate:.0f}/s, cap {args.cap:.0f}/min")
+    print(f"  sent {stats['sent']} in {elapsed:.1f}s ({stats['sent'] / elapsed * 60:.0f}/min), "
+          f"avg lag {stats['avg_lag_s']:.2f}s, max lag {stats['max_lag_s']:.2f}s, "
+          f"peak backlog {max(backlog_samples, default=0)}, median backlog "
+          f"{statistics.median(backlog_samples) if backlog_samples else 0}, connections {stats['smtp_connections']}")
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+"""Time payment reconciliation of a bank statement against registrations.
+
+    python benchmarks/bench_reconcile.py [--registrations 50000] [--lines 100000] [--paid 0.9]
+                                         [--with-roll 0.3] [--days 3]
+
+Seeds ``--registrations`` unverified registrations into a SQLite stand-in
+database, spread over ``--days``, and writes a statement CSV of ``--lines``
+lines: one credit for a ``--paid`` share of the registrations, 1-30 minutes
+before the registration, with the roll number in the narration for a
+``--with-roll`` share of them. The rest of the lines are unrelated credits
+and debits. Then runs ``reconcile_payments()`` (the code behind ``flask
+reconcile-payments``) and reports per-stage timings and match quality
+against the generated ground truth:
+
+- pair exact: the match names the very credit that registration paid with
+- verified correct: the verified registration did pay (with some credit)
+
+Only roll-number matches are verified by the run; amount/time pairs go to
+the review CSV, which is then confirmed as-is with ``confirm_payments()``
+(the code behind ``flask confirm-payments``), as if a reviewer accepted
+every row, and a second confirm must find every credit already used.
+Amount/time pairing only accepts a credit and a registration that are each
+other's only candidate, so how much it finds depends on density: with the
+defaults (a registration every ~5 s) nearly every window is ambiguous; try
+``--registrations 3000 --lines 4000 --days 14`` for a quieter period. After
+the run the incremental stats are compared with a full rebuild.
+"""
+import argparse
+import csv
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+START = datetime(2026, 10, 1, 9, 0)
+
+
+def write_statement(path, registrations, lines, paid_share, roll_share, days, seed=10):
+    """Statement CSV for ``registrations`` [(id, roll_no, amount, created_at)]; returns {id: utr} of payers"""
+    rng = random.Random(seed)
+    truth = {}
+    entries = []
+    utr = 400000000000
+    amounts = sorted({amount for _, _, amount, _ in registrations})
+    for registration_id, roll_no, amount, created_at in registrations:
+        if rng.random() >= paid_share:
+            continue
+        utr += rng.randint(1, 50)
+        truth[registration_id] = str(utr)
+        payer = f"STUDENT {registration_id}"
+        note = f"/{roll_no}" if rng.random() < roll_share else ""
+        when = created_at - timedelta(seconds=rng.randint(60, 1800))
+        entries.append((when, str(utr), f"UPI/CR/{utr}/{payer}/HDFC/payer{registration_id}@okaxis{note}", amount, "CR"))
+    while len(entries) < lines:
+        utr += rng.randint(1, 50)
+        when = START + timedelta(seconds=rng.randint(0, days * 86400))
+        direction = "DR" if rng.random() < 0.2 else "CR"
+        amount = rng.choice(amounts) if rng.random() < 0.5 else rng.randint(1, 5000)
+        entries.append((when, str(utr), f"UPI/{direction}/{utr}/SOMEONE ELSE/SBIN", amount, direction))
+    rng.shuffle(entries)
+
+    with open(path, "w", newline="") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(["Txn Date", "Narration", "UTR No", "Amount", "Dr/Cr"])
+        for when, reference, narration, amount, direction in entries:
+            writer.writerow([when.strftime("%d/%m/%Y %H:%M:%S"), narration, reference, f"{amount:.2f}", direction])
+    return truth
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--registrations", type=int, default=50000)
+    parser.add_argument("--lines", type=int, default=100000)
+    parser.add_argument("--paid", type=float, default=0.9, help="Share of registrations with a credit")
+    parser.add_argument("--with-roll", type=float, default=0.3, help="Share of credits naming the roll number")
+    parser.add_argument("--days", type=int, default=3, help="Registration period the rows are spread over")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="zeal_bench_reconcile_")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("UPLOAD_SPOOL_DIR", os.path.join(workdir, "spool"))
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+
+    import app
+    import registration_stats
+    import standins
+
+    database = os.path.join(workdir, "bench.sqlite3")
+    standins.install_sqlite(app, database)
+    catalog = app.pricing_engine.catalog()
+    rows = [dict(row, payment_status="Submitted") for row in standins.seed_rows(catalog, args.registrations)]
+    for start in range(0, len(rows), 500):
+        app.insert_registrations(rows[start:start + 500])
+
+    # Spread the registrations over the registration period, in id order
+    step = args.days * 86400 / max(args.registrations, 1)
+    connection = sqlite3.connect(database)
+    connection.create_function("spread", 1, lambda row_id: (START + timedelta(seconds=row_id * step)).isoformat(" "))
+    connection.execute("UPDATE registrations SET created_at = spread(id)")
+    connection.commit()
+    registrations = [
+        (row_id, roll_no, float(amount), datetime.fromisoformat(created_at))
+        for row_id, roll_no, amount, created_at in connection.execute(
+            "SELECT id, roll_no, total_amount, created_at FROM registrations"
+        )
+    ]
+    connection.close()
+
+    statement_path = os.path.join(workdir, "statement.csv")
+    report_path = os.path.join(workdir, "matches.csv")
+    review_path = os.path.join(workdir, "review.csv")
+    truth = write_statement(statement_path, registrations, args.lines, args.paid, args.with_roll, args.days)
+    print(f"{len(registrations)} unverified registrations, {args.lines} statement lines, {len(truth)} real payments")
+
+    started = time.perf_counter()
+    summary = app.reconcile_payments(statement_path, report_path=report_path, review_path=review_path)
+    total = time.perf_counter() - started
+    started = time.perf_counter()
+    confirmed = app.confirm_payments(review_path)
+    confirm_ms = (time.perf_counter() - started) * 1000
+    again = app.confirm_payments(review_path)
+
+    with open(report_path, newline="") as fh:
+        matches = [(int(row["registration_id"]), row["reference"], row["method"]) for row in csv.DictReader(fh)]
+    exact = sum(1 for registration_id, reference, _ in matches if truth.get(registration_id) == reference)
+    paid = sum(1 for registration_id, _, _ in matches if registration_id in truth)
+
+    print(f"stages ms: load {summary['load_ms']}, fetch {summary['fetch_ms']}, match {summary['match_ms']}, "
+          f"apply {summary.get('apply_ms', 0)}; total {total:.2f}s")
+    print(f"matched {summary['matched']} ({summary['by_reference']} by roll number), "
+          f"verified {summary['verified']}, skipped {summary['skipped']}, needs review {summary['needs_review']}")
+    print(f"confirmed after review: verified {confirmed['verified']} in {confirm_ms:.1f} ms; "
+          f"second confirm already used {again['already_used']}/{again['reviewed']}, verified {again['verified']}")
+    for method in ("reference", "amount_time"):
+        subset = [match for match in matches if match[2] == method]
+        if subset:
+            exact_share = sum(1 for r, ref, _ in subset if truth.get(r) == ref) / len(subset)
+            paid_share = sum(1 for r, _, _ in subset if r in truth) / len(subset)
+            print(f"  {method:<12} {len(subset):>7}  pair exact {exact_share:.1%}  verified correct {paid_share:.1%}")
+    print(f"recall {paid / max(len(truth), 1):.1%} of real payments verified; "
+          f"overall pair exact {exact / max(len(matches), 1):.1%}")
+
+    stats_before = app.get_registration_stats()
+    connection = app.get_db_connection()
+    cursor = connection.cursor()
+    registration_stats.rebuild(cursor)
+    connection.commit()
+    connection.close()
+    print(f"stats consistent with a rebuild: {stats_before == app.get_registration_stats()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Time the per-event roster export (``/adminmgizeal/export?by=event``).
+
+    python benchmarks/bench_roster_export.py [--rows 50000] [--workers 0,1,2,4] [--repeat 2]
+
+Seeds ``--rows`` registrations into a SQLite stand-in database, then streams
+the roster zip through the Flask test client once per worker count and
+repetition. ``--workers 0`` writes the workbooks in the request thread;
+other values use a spawned process pool of that size. The first run of each
+pool size includes starting its worker processes. The single-sheet
+``/adminmgizeal/export`` is timed too, for reference.
+
+Reported per run: time to the first byte and to the last, zip size and
+number of rosters; the zip is checked with ``testzip()``. Parallel speed-up
+needs as many free cores as workers; on a single-core machine only the
+streaming (first byte long before the last) shows.
+"""
+import argparse
+import io
+import os
+import resource
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+
+def stream(client, url):
+    """GET ``url`` and read the body as it streams; returns (first_byte_s, total_s, body)"""
+    started = time.perf_counter()
+    response = client.get(url, buffered=False)
+    first_byte = None
+    body = io.BytesIO()
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        body.write(chunk)
+    response.close()
+    if response.status_code != 200:
+        raise RuntimeError(f"{url} returned {response.status_code}")
+    return first_byte or 0.0, time.perf_counter() - started, body.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--workers", default="0,1,2,4", help="Comma-separated EXPORT_WORKERS values to try")
+    parser.add_argument("--repeat", type=int, default=2)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="zeal_bench_rosters_")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    os.environ.setdefault("UPLOAD_SPOOL_DIR", os.path.join(workdir, "spool"))
+    os.environ.setdefault("SESSION_BACKEND", "memory")
+
+    import app
+    import standins
+
+    standins.install_sqlite(app, os.path.join(workdir, "bench.sqlite3"))
+    catalog = app.pricing_engine.catalog()
+    started = time.perf_counter()
+    rows = list(standins.seed_rows(catalog, args.rows))
+    for start in range(0, len(rows), 500):
+        app.insert_registrations(rows[start:start + 500])
+    largest = max((entry["registrations"] for entry in app.get_registration_stats()["events"]), default=0)
+    print(f"seeded {args.rows} registrations in {time.perf_counter() - started:.1f}s "
+          f"({len(catalog.prices)} events, largest roster {largest}, {os.cpu_count()} CPUs)")
+
+    client = app.app.test_client()
+    print(f"{'mode':<22}{'run':>4}{'first byte s':>14}{'total s':>10}{'size MB':>10}{'rosters':>9}")
+
+    for run in range(1, args.repeat + 1):
+        first_byte, total, body = stream(client, "/adminmgizeal/export")
+        print(f"{'single sheet':<22}{run:>4}{first_byte:>14.2f}{total:>10.2f}{len(body) / 2**20:>10.1f}{'-':>9}")
+
+    for workers in (int(value) for value in args.workers.split(",")):
+        app.EXPORT_WORKERS = workers
+        for run in range(1, args.repeat + 1):
+            first_byte, total, body = stream(client, "/adminmgizeal/export?by=event")
+            archive = zipfile.ZipFile(io.BytesIO(body))
+            bad = archive.testzip()
+            if bad:
+                raise RuntimeError(f"corrupt member {bad}")
+            label = "in-thread" if workers == 0 else f"process pool x{workers}"
+            print(f"{label:<22}{run:>4}{first_byte:>14.2f}{total:>10.2f}{len(body) / 2**20:>10.1f}"
+                  f"{len(archive.namelist()):>9}")
+        if app._export_pool is not None:
+            app._export_pool.shutdown()
+            app._export_pool = None
+
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    print(f"peak RSS of the app process: {peak_mb:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
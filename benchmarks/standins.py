@@ -0,0 +1,364 @@
+"""Local stand-ins for MySQL and Cloudinary, for benchmarks and tests.
+
+``install_sqlite(app, path)`` points the app's connection pool at a SQLite
+file through ``SQLiteConnection``, a thin adapter that speaks the subset of
+the mysql-connector API the app uses (``%s`` parameters, dictionary cursors,
+``lastrowid``, ``fetchmany``, ``ping``, ``ON DUPLICATE KEY UPDATE``, ``INSERT
+IGNORE``; row locks via ``FOR UPDATE [SKIP LOCKED]`` are dropped) and reports unique-key violations as
+``mysql.connector.IntegrityError`` with ``ER_DUP_ENTRY``, as MySQL would.
+The real ``ConnectionPool`` stays in place, so pool behaviour is measured too.
+
+``FakeUploader`` replaces ``cloudinary.uploader.upload`` with a fixed delay.
+
+``DebugSMTPServer`` is a local SMTP sink (plain SMTP, no TLS or auth) that
+keeps what it receives and can add latency or refuse recipients.
+"""
+import random
+import re
+import socketserver
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from decimal import Decimal
+
+import mysql.connector
+from mysql.connector import errorcode
+
+from migrations import MIGRATIONS
+
+# Explicit converters; the implicit datetime ones are deprecated in Python 3.12
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_adapter(Decimal, str)
+
+# Mirrors migrations.MIGRATIONS for the tables the app queries
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS registrations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_name VARCHAR(255) NOT NULL,
+    roll_no VARCHAR(100) NOT NULL COLLATE NOCASE UNIQUE,
+    email VARCHAR(255) NOT NULL COLLATE NOCASE UNIQUE,
+    course VARCHAR(255) NOT NULL,
+    college VARCHAR(255) NOT NULL,
+    college_id VARCHAR(100),
+    other_college VARCHAR(255),
+    events TEXT NOT NULL,
+    group_members TEXT,
+    contact_numbers VARCHAR(255) NOT NULL,
+    total_amount DECIMAL(10, 2) NOT NULL,
+    payment_screenshot_url TEXT NOT NULL,
+    payment_status VARCHAR(50) DEFAULT 'Submitted',
+    payment_reference VARCHAR(100) UNIQUE,
+    payment_credit CHAR(40) UNIQUE,
+    payment_match VARCHAR(20),
+    paid_at TIMESTAMP,
+    screenshot_status VARCHAR(20) DEFAULT 'Uploaded',
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_student_name ON registrations (student_name);
+CREATE INDEX IF NOT EXISTS idx_college ON registrations (college);
+CREATE INDEX IF NOT EXISTS idx_created_id ON registrations (created_at, id);
+CREATE TABLE IF NOT EXISTS registration_events (
+    registration_id INTEGER NOT NULL REFERENCES registrations (id) ON DELETE CASCADE,
+    event VARCHAR(255) NOT NULL,
+    PRIMARY KEY (registration_id, event)
+);
+CREATE INDEX IF NOT EXISTS idx_event_registration ON registration_events (event, registration_id);
+CREATE INDEX IF NOT EXISTS idx_college_created ON registrations (college, created_at, id);
+CREATE TABLE IF NOT EXISTS registration_stats (
+    dimension VARCHAR(20) NOT NULL,
+    name VARCHAR(255) NOT NULL,
+    shard INTEGER NOT NULL DEFAULT 0,
+    registrations INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+    submitted INTEGER NOT NULL DEFAULT 0,
+    verified INTEGER NOT NULL DEFAULT 0,
+    event_entries INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (dimension, name, shard)
+);
+CREATE TABLE IF NOT EXISTS checkins (
+    scan_id CHAR(32) PRIMARY KEY,
+    registration_id INTEGER,
+    gate VARCHAR(255) NOT NULL DEFAULT '',
+    device VARCHAR(100) NOT NULL,
+    result VARCHAR(30) NOT NULL,
+    payment_status VARCHAR(50),
+    scanned_at TIMESTAMP NOT NULL,
+    received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_checkins_registration ON checkins (registration_id, gate);
+CREATE TABLE IF NOT EXISTS email_outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind VARCHAR(30) NOT NULL,
+    registration_id INTEGER,
+    recipient VARCHAR(255) NOT NULL,
+    payload TEXT NOT NULL,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL,
+    last_error VARCHAR(500),
+    created_at TIMESTAMP NOT NULL,
+    sent_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_due ON email_outbox (status, next_attempt_at);
+CREATE INDEX IF NOT EXISTS idx_outbox_registration ON email_outbox (registration_id);
+CREATE INDEX IF NOT EXISTS idx_outbox_status_id ON email_outbox (status, id);
+CREATE TABLE IF NOT EXISTS schema_migrations (
+    version INTEGER PRIMARY KEY,
+    description VARCHAR(255) NOT NULL,
+    applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    duration_ms INTEGER NOT NULL
+);
+"""
+
+
+def _translate(query):
+    # MySQL upserts become SQLite's ON CONFLICT form
+    query = query.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT DO UPDATE SET")
+    query = re.sub(r"\bVALUES\((\w+)\)", r"excluded.\1", query)
+    query = query.replace(" FOR UPDATE SKIP LOCKED", "").replace(" FOR UPDATE", "")
+    query = query.replace("INSERT IGNORE", "INSERT OR IGNORE")
+    return query.replace("%s", "?")
+
+
+def _dict_row(cursor, row):
+    return {column[0]: value for column, value in zip(cursor.description, row)}
+
+
+class SQLiteCursor:
+    def __init__(self, connection, dictionary=False):
+        self._cursor = connection.cursor()
+        if dictionary:
+            self._cursor.row_factory = _dict_row
+
+    @property
+    def lastrowid(self):
+        return self._cursor.lastrowid
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def _run(self, method, query, params):
+        try:
+            return method(_translate(query), params)
+        except sqlite3.IntegrityError as e:
+            raise mysql.connector.IntegrityError(msg=str(e), errno=errorcode.ER_DUP_ENTRY)
+
+    def execute(self, query, params=()):
+        self._run(self._cursor.execute, query, tuple(params or ()))
+
+    def executemany(self, query, seq_params):
+        seq_params = [tuple(params) for params in seq_params]
+        if len(seq_params) == 1:
+            # sqlite3's executemany leaves lastrowid unset; mysql-connector's does not
+            self._run(self._cursor.execute, query, seq_params[0])
+        else:
+            self._run(self._cursor.executemany, query, seq_params)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def fetchmany(self, size):
+        return self._cursor.fetchmany(size)
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """The slice of a mysql-connector connection the app relies on, backed by SQLite"""
+
+    def __init__(self, path):
+        self._connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, detect_types=sqlite3.PARSE_DECLTYPES
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+
+    @property
+    def in_transaction(self):
+        return self._connection.in_transaction
+
+    def cursor(self, dictionary=False, buffered=None):
+        return SQLiteCursor(self._connection, dictionary=dictionary)
+
+    def commit(self):
+        self._connection.commit()
+
+    def rollback(self):
+        self._connection.rollback()
+
+    def ping(self, reconnect=False):
+        self._connection.execute("SELECT 1")
+
+    def is_connected(self):
+        return True
+
+    def close(self):
+        self._connection.close()
+
+
+def create_schema(path):
+    connection = sqlite3.connect(path)
+    connection.executescript(SCHEMA)
+    connection.executemany(
+        "INSERT OR IGNORE INTO schema_migrations (version, description, duration_ms) VALUES (?, ?, 0)",
+        [(version, description) for version, description, _ in MIGRATIONS]
+    )
+    connection.commit()
+    connection.close()
+
+
+def install_sqlite(app_module, path):
+    """Create the schema in ``path`` and make the app's pool open SQLite connections"""
+    create_schema(path)
+    pool = app_module.db_pool
+
+    def connect():
+        connection = SQLiteConnection(path)
+        with pool._lock:
+            pool._created += 1
+        return connection
+
+    pool.close_all()
+    pool._connect = connect
+
+
+class FakeUploader:
+    """Stands in for cloudinary.uploader.upload: sleeps ``latency`` seconds and returns a URL"""
+
+    def __init__(self, latency=0.05):
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, file, roll_no):
+        time.sleep(self.latency)
+        with self._lock:
+            self.calls += 1
+        return f"https://res.cloudinary.invalid/zeal10/payments/{roll_no}_{uuid.uuid4().hex[:8]}.png"
+
+
+class _SMTPSession(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(line.encode() + b"\r\n")
+
+    def handle(self):
+        server = self.server.owner
+        time.sleep(server.connect_latency)
+        self.reply("220 debug-smtp ready")
+        mail_from, recipients = None, []
+        for raw in self.rfile:
+            command = raw.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+            if verb == "EHLO":
+                self.reply("250-debug-smtp")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 debug-smtp")
+            elif verb == "MAIL":
+                mail_from, recipients = command[10:].strip(), []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command[8:].strip().strip("<>")
+                reply = server.rcpt_reply(address)
+                if reply.startswith("250"):
+                    recipients.append(address)
+                self.reply(reply)
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                lines = []
+                for line in self.rfile:
+                    if line in (b".\r\n", b".\n"):
+                        break
+                    lines.append(line[1:] if line.startswith(b"..") else line)
+                time.sleep(server.latency)
+                server.received(mail_from, recipients, b"".join(lines))
+                self.reply("250 OK queued")
+            elif verb == "RSET":
+                mail_from, recipients = None, []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class DebugSMTPServer:
+    """Local SMTP sink on 127.0.0.1 for benchmarks; ``messages`` holds (from, recipients, data)
+
+    ``latency`` is added per message and ``connect_latency`` per connection
+    (a stand-in for a real server's TLS handshake and login).
+    ``rcpt_reply(address)`` returns the reply line for each recipient.
+    """
+
+    def __init__(self, latency=0.0, connect_latency=0.0, rcpt_reply=None):
+        self.latency = latency
+        self.connect_latency = connect_latency
+        self.rcpt_reply = rcpt_reply or (lambda address: "250 OK")
+        self.messages = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), _SMTPSession)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self.port = self._server.server_address[1]
+        self._server.verify_request = self._count_connection
+
+    def _count_connection(self, request, client_address):
+        with self._lock:
+            self.connections += 1
+        return True
+
+    def received(self, mail_from, recipients, data):
+        with self._lock:
+            self.messages.append((mail_from, recipients, data))
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, name="debug-smtp", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+COLLEGES = [
+    "Mangalmay Group of Institutions",
+    "Bennett University",
+    "Sharda University",
+    "Gautam Buddha University",
+    "IIMT College",
+    "Other",
+]
+
+
+def seed_rows(catalog, count, seed=10):
+    """``count`` plausible registration dicts, in the shape add_registration() takes"""
+    rng = random.Random(seed)
+    names = list(catalog.prices)
+    for i in range(count):
+        college = rng.choice(COLLEGES)
+        events = sorted(set(rng.sample(names, rng.randint(1, 4))))
+        total, _ = catalog.quote(events, college)
+        yield {
+            "student_name": f"Seed Student {i}",
+            "roll_no": f"SEED{i:06d}",
+            "email": f"seed{i}@example.com",
+            "course": "B.Tech CSE",
+            "college": college,
+            "events": ", ".join(events),
+            "contact_numbers": "9999999999",
+            "total_amount": total,
+            "payment_screenshot_url": f"https://res.cloudinary.invalid/seed/{i}.png",
+            "payment_status": rng.choice(["Submitted", "Verified"]),
+        }
@@ -0,0 +1,246 @@
+import json
+import logging
+import threading
+import time
+from collections import deque, namedtuple
+
+logger = logging.getLogger(__name__)
+
+# ``payload`` is what the client receives as JSON; ``ids`` are the registration
+# ids it carries (empty for stats / reset) and ``event_id`` the SSE id field
+Message = namedtuple("Message", "event payload ids event_id")
+
+RESET = Message("reset", {}, (), None)
+
+
+def sse_frame(message):
+    """A Message as one text/event-stream frame"""
+    lines = [f"event: {message.event}"]
+    if message.event_id is not None:
+        lines.append(f"id: {message.event_id}")
+    lines.append(f"data: {json.dumps(message.payload, default=str, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class Subscription:
+    """Pending messages for one connected client.
+
+    Bounded at ``maxlen``: a client that falls that far behind has its
+    backlog replaced by a single reset, telling it to reload rather than
+    replay. Rows the client got from its catch-up query (see prime()) are
+    dropped when the same ids come through the shared poll.
+    """
+
+    def __init__(self, maxlen):
+        self.maxlen = maxlen
+        self.skip = set()
+        self.overflowed = 0
+        self._catch_up = None
+        self._messages = deque()
+        self._ready = threading.Condition()
+
+    def put(self, message):
+        with self._ready:
+            if len(self._messages) >= self.maxlen:
+                self._messages.clear()
+                self.overflowed += 1
+                message = RESET
+            self._messages.append(message)
+            self._ready.notify()
+
+    def prime(self, message):
+        """Queue a catch-up message ahead of anything already published"""
+        with self._ready:
+            self._catch_up = message
+            self.skip.update(message.ids)
+            self._messages.appendleft(message)
+            self._ready.notify()
+
+    def get(self, timeout):
+        """The next message to send, or None after ``timeout`` seconds with nothing new"""
+        with self._ready:
+            if not self._messages:
+                self._ready.wait(timeout)
+            if not self._messages:
+                return None
+            message = self._messages.popleft()
+        if message is not self._catch_up and self.skip.intersection(message.ids):
+            rows = [row for row in message.payload["rows"] if row["id"] not in self.skip]
+            self.skip.difference_update(message.ids)
+            if not rows:
+                return self.get(0)
+            message = message._replace(payload={**message.payload, "rows": rows},
+                                       ids=tuple(row["id"] for row in rows))
+        return message
+
+
+class ChangeFeed:
+    """One poller per process that fans new rows out to every subscriber.
+
+    While anyone is subscribed a single thread calls ``fetch_rows(after_id,
+    gap_ids, limit)`` every ``interval`` seconds, so N open dashboards cost
+    one query per interval instead of N. Rows come back in id order; the
+    cursor is the highest id seen. Ids skipped below the cursor are
+    remembered for ``gap_timeout`` seconds and asked for again, because an
+    insert that took its id first can commit after a later one. ``read_stats``
+    (optional) is polled alongside and published only when it changes. The
+    thread stops when the last subscriber leaves.
+    """
+
+    def __init__(self, fetch_rows, latest_id, read_stats=None, serialize=dict, interval=2.0,
+                 batch_size=200, queue_size=100, max_subscribers=50, gap_timeout=30.0,
+                 max_gaps=1000, name="change-feed"):
+        self.fetch_rows = fetch_rows
+        self.latest_id = latest_id
+        self.read_stats = read_stats
+        self.serialize = serialize
+        self.interval = interval
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.gap_timeout = gap_timeout
+        self.max_gaps = max_gaps
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._thread = None
+        self._cursor = None
+        self._gaps = {}  # id -> monotonic time first missed
+        self._last_stats = None
+
+        self._peak = 0
+        self._refused = 0
+        self._polls = 0
+        self._poll_errors = 0
+        self._poll_time = 0.0
+        self._rows_published = 0
+        self._late_rows = 0
+        self._messages = 0
+        self._overflows = 0
+
+    def subscribe(self, after_id=None):
+        """A Subscription primed with what the client missed, or None when the feed is full
+
+        With ``after_id`` the rows above it are read straight away (one
+        query, this client only); more than ``batch_size`` of them queue a
+        reset instead. The latest stats, if any, are queued too.
+        """
+        subscription = Subscription(self.queue_size)
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                self._refused += 1
+                return None
+            # Registered before the catch-up query so nothing committed in between is lost
+            self._subscribers.add(subscription)
+            self._peak = max(self._peak, len(self._subscribers))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+                self._thread.start()
+            last_stats = self._last_stats
+
+        if after_id is not None:
+            try:
+                rows = self.fetch_rows(after_id, (), self.batch_size + 1)
+            except Exception as e:
+                logger.error("Change feed catch-up failed: %s", e)
+                rows = None
+            if rows is None or len(rows) > self.batch_size:
+                subscription.put(RESET)
+            elif rows:
+                subscription.prime(self._rows_message(rows, max(row["id"] for row in rows)))
+        if last_stats is not None:
+            subscription.put(last_stats)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+            self._overflows += subscription.overflowed
+
+    def _rows_message(self, rows, cursor):
+        payload = {"rows": [self.serialize(row) for row in rows], "cursor": cursor}
+        return Message("registrations", payload, tuple(row["id"] for row in rows), cursor)
+
+    def _publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._messages += 1
+        for subscription in subscribers:
+            subscription.put(message)
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    # Next subscriber starts a fresh thread from the then-latest id
+                    self._thread = None
+                    self._cursor = None
+                    self._gaps.clear()
+                    return
+            started = time.monotonic()
+            try:
+                self.poll()
+            except Exception as e:
+                with self._lock:
+                    self._poll_errors += 1
+                logger.error("Change feed poll failed: %s", e)
+            with self._lock:
+                self._polls += 1
+                self._poll_time += time.monotonic() - started
+            time.sleep(self.interval)
+
+    def poll(self):
+        """Publish rows committed since the last poll, and the stats if they changed"""
+        if self._cursor is None:
+            self._cursor = self.latest_id()
+        now = time.monotonic()
+        for row_id, missed_at in list(self._gaps.items()):
+            if now - missed_at > self.gap_timeout:
+                # Rolled back or never used (auto-increment ids are not reused)
+                del self._gaps[row_id]
+
+        rows = self.fetch_rows(self._cursor, tuple(sorted(self._gaps)), self.batch_size)
+        if rows:
+            fetched = {row["id"] for row in rows}
+            late = fetched.intersection(self._gaps)
+            for row_id in late:
+                del self._gaps[row_id]
+            newest = max(fetched)
+            if newest > self._cursor:
+                for row_id in range(self._cursor + 1, newest):
+                    if len(self._gaps) >= self.max_gaps:
+                        break
+                    if row_id not in fetched:
+                        self._gaps[row_id] = now
+                self._cursor = newest
+            self._publish(self._rows_message(rows, self._cursor))
+            with self._lock:
+                self._rows_published += len(rows)
+                self._late_rows += len(late)
+
+        if self.read_stats is not None:
+            stats = self.read_stats()
+            if stats and (self._last_stats is None or stats != self._last_stats.payload):
+                message = Message("stats", stats, (), None)
+                with self._lock:
+                    self._last_stats = message
+                self._publish(message)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "subscribers": len(self._subscribers),
+                "peak_subscribers": self._peak,
+                "refused": self._refused,
+                "running": self._thread is not None,
+                "cursor": self._cursor or 0,
+                "pending_gaps": len(self._gaps),
+                "polls": self._polls,
+                "poll_errors": self._poll_errors,
+                "avg_poll_ms": round(self._poll_time / self._polls * 1000, 3) if self._polls else 0.0,
+                "rows_published": self._rows_published,
+                "late_rows": self._late_rows,
+                "messages": self._messages,
+                "overflows": self._overflows + sum(s.overflowed for s in self._subscribers),
+            }
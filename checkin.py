@@ -0,0 +1,168 @@
+import json
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime, timezone
+
+from tickets import InvalidTicket
+
+logger = logging.getLogger(__name__)
+
+# Scan results
+ADMITTED = "admitted"
+ALREADY_CHECKED_IN = "already_checked_in"
+WRONG_EVENT = "wrong_event"
+PAYMENT_UNVERIFIED = "payment_unverified"
+INVALID = "invalid"
+
+
+class CheckInLog:
+    """Append-only JSON-lines log of gate scans, with a sync cursor beside it.
+
+    Each scan is written and flushed (and fsync'd when ``durable``) before
+    its verdict is returned, so a scan the volunteer saw is never lost to a
+    crash or a flat battery. ``<path>.synced`` holds the byte offset up to
+    which the server has accepted the log; it is replaced atomically, and
+    the server ignores scan ids it already has, so re-sending after a crash
+    is harmless.
+    """
+
+    def __init__(self, path, durable=True):
+        self.path = path
+        self.durable = durable
+        self._lock = threading.Lock()
+        self._file = open(path, "ab")
+        if self._file.tell() and not self._ends_with_newline():
+            # A torn last line from a crash; close it off so later lines parse
+            self._file.write(b"\n")
+            self._file.flush()
+
+    def _ends_with_newline(self):
+        with open(self.path, "rb") as fh:
+            fh.seek(-1, os.SEEK_END)
+            return fh.read(1) == b"\n"
+
+    def append(self, record):
+        line = json.dumps(record, separators=(",", ":")).encode() + b"\n"
+        with self._lock:
+            self._file.write(line)
+            self._file.flush()
+            if self.durable:
+                os.fsync(self._file.fileno())
+
+    def records(self, offset=0):
+        """(end offset, record) for every complete line from ``offset``; unreadable lines are skipped"""
+        with open(self.path, "rb") as fh:
+            fh.seek(offset)
+            for line in fh:
+                offset += len(line)
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    yield offset, json.loads(line)
+                except ValueError:
+                    logger.warning("Skipping unreadable check-in log line at offset %d", offset - len(line))
+
+    @property
+    def synced_offset(self):
+        try:
+            with open(self.path + ".synced") as fh:
+                return int(fh.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _mark_synced(self, offset):
+        temporary = self.path + ".synced.tmp"
+        with open(temporary, "w") as fh:
+            fh.write(str(offset))
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(temporary, self.path + ".synced")
+
+    def sync(self, push, batch_size=500):
+        """Hand unsynced scans to ``push(records)`` in batches; returns how many were accepted
+
+        ``push`` raises if the server did not take the batch; the cursor
+        then stays where it was and the same scans go out next time.
+        """
+        sent = 0
+        batch, end = [], self.synced_offset
+        for offset, record in self.records(end):
+            batch.append(record)
+            end = offset
+            if len(batch) >= batch_size:
+                push(batch)
+                self._mark_synced(end)
+                sent += len(batch)
+                batch = []
+        if batch:
+            push(batch)
+            self._mark_synced(end)
+            sent += len(batch)
+        return sent
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def attends(events, gate):
+    """Whether a ticket's events include ``gate`` (an event, or an event's category)"""
+    return any(event == gate or event.split(" - ", 1)[0] == gate for event in events)
+
+
+class CheckInService:
+    """Verifies ticket QRs for one gate and records every scan, with no database.
+
+    ``gate`` is the event being checked in to (None for the venue entrance).
+    A registration is admitted once per gate; who is already in is rebuilt
+    from the log on start. With ``require_verified`` only tickets issued
+    after payment verification are admitted.
+    """
+
+    def __init__(self, signer, log, gate=None, device="gate", require_verified=False):
+        self.signer = signer
+        self.log = log
+        self.gate = gate or ""
+        self.device = device
+        self.require_verified = require_verified
+        self._lock = threading.Lock()
+        self._admitted = set()
+        self._counts = {}
+        for _, record in log.records():
+            if record.get("result") == ADMITTED and record.get("gate") == self.gate:
+                self._admitted.add(record["registration_id"])
+
+    def scan(self, token):
+        """Check one scanned ticket; returns the logged record (``result`` says what to do)"""
+        record = {"scan_id": uuid.uuid4().hex, "device": self.device, "gate": self.gate,
+                  "registration_id": None, "payment_status": None, "result": INVALID, "reason": ""}
+        try:
+            ticket = self.signer.verify(token)
+        except InvalidTicket as e:
+            ticket = None
+            record["reason"] = str(e)
+
+        with self._lock:
+            if ticket is not None:
+                record["registration_id"] = ticket.registration_id
+                record["payment_status"] = ticket.payment_status
+                if self.gate and not attends(ticket.events, self.gate):
+                    record["result"] = WRONG_EVENT
+                elif self.require_verified and ticket.payment_status != "Verified":
+                    record["result"] = PAYMENT_UNVERIFIED
+                elif ticket.registration_id in self._admitted:
+                    record["result"] = ALREADY_CHECKED_IN
+                else:
+                    record["result"] = ADMITTED
+                    self._admitted.add(ticket.registration_id)
+            record["scanned_at"] = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")
+            # Logged inside the lock so the log order matches the admission order
+            self.log.append(record)
+            self._counts[record["result"]] = self._counts.get(record["result"], 0) + 1
+        return record
+
+    def stats(self):
+        with self._lock:
+            return {"gate": self.gate, "admitted": len(self._admitted), **self._counts}
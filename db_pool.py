@@ -0,0 +1,198 @@
+import threading
+import time
+from collections import deque
+
+import mysql.connector
+from mysql.connector import Error
+
+
+class PoolTimeout(Error):
+    """Raised when no pooled connection frees up within the checkout timeout"""
+
+
+class PooledConnection:
+    """Thin proxy around a MySQL connection whose close() hands it back to the pool"""
+
+    def __init__(self, pool, connection, generation):
+        self._pool = pool
+        self._connection = connection
+        self._generation = generation
+        self._released = False
+
+    def __getattr__(self, name):
+        return getattr(self._connection, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        if self._released:
+            return
+        self._released = True
+        self._pool.release(self._connection, self._generation)
+
+
+class ConnectionPool:
+    """Bounded, thread-safe MySQL connection pool.
+
+    Connections are opened lazily up to ``size``. Callers that find the pool
+    exhausted wait up to ``timeout`` seconds for one to be returned. Idle
+    connections older than ``ping_interval`` seconds are pinged before being
+    handed out and replaced if the server dropped them. ``close_all()``
+    starts a new generation: connections checked out before it are closed
+    when they are returned instead of going back into the pool.
+    """
+
+    def __init__(self, config, size=10, timeout=5.0, ping_interval=30.0):
+        self.config = dict(config)
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (connection, returned_at)
+        self._open = 0
+        self._in_use = 0
+        self._waiters = 0
+        self._generation = 0
+
+        self._checkouts = 0
+        self._timeouts = 0
+        self._created = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    # ---------------- CHECKOUT ----------------
+    def acquire(self, timeout=None):
+        """Check a connection out of the pool, opening one if there is room"""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+
+        with self._lock:
+            if not self._idle and self._open >= self.size:
+                self._waiters += 1
+                try:
+                    while not self._idle and self._open >= self.size:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(
+                                msg=f"No database connection available after {timeout:.1f}s "
+                                    f"(pool size {self.size})"
+                            )
+                        self._lock.wait(remaining)
+                finally:
+                    self._waiters -= 1
+
+            if self._idle:
+                connection, returned_at = self._idle.pop()
+            else:
+                connection, returned_at = None, None
+                self._open += 1
+            self._in_use += 1
+            generation = self._generation
+
+            waited = time.monotonic() - started
+            self._checkouts += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+        try:
+            if connection is None or not self._healthy(connection, returned_at):
+                connection = self._connect()
+        except Exception:
+            self._forget()
+            raise
+
+        return PooledConnection(self, connection, generation)
+
+    def release(self, connection, generation=None):
+        """Return a connection to the pool, discarding it if it is unusable or predates close_all()"""
+        if generation is not None and generation != self._generation:
+            self._discard(connection)
+            return
+        try:
+            if connection.in_transaction:
+                # End any implicit read snapshot so the next borrower sees fresh data
+                connection.rollback()
+        except Exception:
+            self._discard(connection)
+            return
+
+        with self._lock:
+            self._in_use -= 1
+            self._idle.append((connection, time.monotonic()))
+            self._lock.notify()
+
+    # ---------------- INTERNALS ----------------
+    def _connect(self):
+        connection = mysql.connector.connect(**self.config)
+        with self._lock:
+            self._created += 1
+        return connection
+
+    def _healthy(self, connection, returned_at):
+        if time.monotonic() - returned_at < self.ping_interval:
+            return True
+        try:
+            connection.ping(reconnect=False)
+            return True
+        except Exception:
+            self._close_quietly(connection)
+            with self._lock:
+                self._discarded += 1
+            return False
+
+    def _discard(self, connection):
+        self._close_quietly(connection)
+        with self._lock:
+            self._discarded += 1
+        self._forget()
+
+    def _forget(self):
+        with self._lock:
+            self._in_use -= 1
+            self._open -= 1
+            self._lock.notify()
+
+    @staticmethod
+    def _close_quietly(connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    # ---------------- MAINTENANCE ----------------
+    def close_all(self):
+        """Close every idle connection; checked-out ones are closed as they return"""
+        with self._lock:
+            self._generation += 1
+            idle = list(self._idle)
+            self._idle.clear()
+            self._open -= len(idle)
+            self._lock.notify_all()
+        for connection, _ in idle:
+            self._close_quietly(connection)
+
+    def stats(self):
+        """Snapshot of pool usage, for sizing the pool under load"""
+        with self._lock:
+            return {
+                "size": self.size,
+                "open": self._open,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+                "waiters": self._waiters,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "created": self._created,
+                "discarded": self._discarded,
+                "wait_time_total": round(self._wait_total, 6),
+                "wait_time_max": round(self._wait_max, 6),
+                "wait_time_avg": round(self._wait_total / self._checkouts, 6) if self._checkouts else 0.0,
+            }
@@ -0,0 +1,110 @@
+import hashlib
+import math
+import threading
+
+
+def normalize_identity(value):
+    """Key form of a roll number or email; MySQL compares them case-insensitively"""
+    return (value or "").strip().lower()
+
+
+class BloomFilter:
+    """Fixed-size bloom filter over strings (no false negatives, tunable false positives)"""
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(int(capacity), 1)
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def add(self, item):
+        for pos in self._positions(item):
+            self._bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self._bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class RegistrationFilter:
+    """In-process negative cache for the duplicate check.
+
+    Holds every roll number and email known to this process. A miss means
+    the identity has definitely not been seen here, so the caller can skip
+    the database round trip. Registrations made by other workers are picked
+    up by ``add_since()``. The unique constraints in MySQL remain the source
+    of truth.
+    """
+
+    def __init__(self, capacity=100000, error_rate=0.001):
+        self._lock = threading.Lock()
+        self._filter = BloomFilter(capacity, error_rate)
+        self.ready = False
+        self.last_id = 0
+        self.skipped = 0
+        self.checked = 0
+
+    def rebuild(self, rows, expected=0):
+        """Replace the filter with one built from (id, roll_no, email) rows"""
+        # Two identities per registration, with room to double before saturating
+        capacity = max(100000, expected * 4)
+        fresh = BloomFilter(capacity, self._filter.error_rate)
+        last_id = 0
+        for row_id, roll_no, email in rows:
+            fresh.add("roll:" + normalize_identity(roll_no))
+            fresh.add("email:" + normalize_identity(email))
+            last_id = max(last_id, row_id)
+        with self._lock:
+            self._filter = fresh
+            self.last_id = last_id
+            self.ready = True
+
+    def add(self, roll_no, email, row_id=None):
+        with self._lock:
+            self._filter.add("roll:" + normalize_identity(roll_no))
+            self._filter.add("email:" + normalize_identity(email))
+            if row_id is not None and row_id > self.last_id:
+                self.last_id = row_id
+
+    def add_since(self, rows):
+        """Fold in (id, roll_no, email) rows inserted since ``last_id``"""
+        for row_id, roll_no, email in rows:
+            self.add(roll_no, email, row_id)
+
+    def might_exist(self, roll_no, email):
+        with self._lock:
+            if not self.ready:
+                return True
+            found = ("roll:" + normalize_identity(roll_no) in self._filter
+                     or "email:" + normalize_identity(email) in self._filter)
+            if found:
+                self.checked += 1
+            else:
+                self.skipped += 1
+            return found
+
+    def is_saturated(self):
+        """True once more entries were added than the filter was sized for"""
+        with self._lock:
+            return self._filter.count > self._filter.capacity
+
+    def stats(self):
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "entries": self._filter.count,
+                "capacity": self._filter.capacity,
+                "bits": self._filter.num_bits,
+                "last_id": self.last_id,
+                "skipped_db_checks": self.skipped,
+                "db_checks": self.checked,
+            }
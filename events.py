@@ -0,0 +1,48 @@
+# ---------------- FORM PARSING ----------------
+def parse_events_with_categories(form_data, category_parents):
+    """Parse events and their categories from form data
+
+    ``category_parents`` is the set of events offered in categories
+    (``Catalog.category_parents``). Single pass over the form. Each selected
+    parent event takes the next non-empty ``category_*`` value in form order
+    (the template names its radio groups ``category_<event name>``); other
+    events are kept as they are.
+
+    The original parser also looked for a ``category_<i>`` match by event
+    index, but in ``category_map`` whose keys have the ``category_`` prefix
+    already stripped, so no form the template builds ever matches it. That
+    lookup is reproduced as it was on purpose: the output stays identical to
+    the original parser's (see benchmarks/bench_event_parser.py).
+    """
+    selected_events = form_data.getlist("events")
+    index_keys = {str(idx) for idx in range(len(selected_events))}
+
+    category_map = {}
+    for key, value in form_data.items():
+        if key.startswith('category_'):
+            category_map[key.replace('category_', '')] = value
+
+    # Categories handed out in form order to parent events without an index match
+    fallback = [key for key, value in category_map.items() if value]
+    next_fallback = 0
+    index_keys_left = sum(1 for key in category_map if key in index_keys)
+
+    events_list = []
+    for i, event in enumerate(selected_events):
+        # Kept from the original parser; keys in category_map have lost the prefix
+        test_key = f"category_{i}"
+        if index_keys_left and test_key in category_map:
+            events_list.append(f"{event} - {category_map[test_key]}")
+            continue
+
+        if event in category_parents and next_fallback < len(fallback):
+            key = fallback[next_fallback]
+            next_fallback += 1
+            events_list.append(f"{event} - {category_map.pop(key)}")
+            if key in index_keys:
+                index_keys_left -= 1
+            continue
+
+        events_list.append(event)
+
+    return events_list
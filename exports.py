@@ -0,0 +1,213 @@
+import csv
+import io
+import os
+import re
+import tempfile
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import datetime
+from itertools import islice
+
+from openpyxl import Workbook
+from openpyxl.utils import get_column_letter
+
+EXPORT_COLUMNS = [
+    'id', 'student_name', 'roll_no', 'email', 'course', 'college',
+    'college_id', 'other_college', 'events', 'group_members',
+    'contact_numbers', 'total_amount', 'payment_status',
+    'payment_screenshot_url', 'created_at'
+]
+
+# Per-event rosters: what a coordinator needs, in the order they read it
+ROSTER_COLUMNS = [
+    'student_name', 'roll_no', 'email', 'course', 'college',
+    'group_members', 'contact_numbers', 'payment_status', 'id', 'created_at'
+]
+
+# Rows inspected to size spreadsheet columns; widths are capped at MAX_COLUMN_WIDTH
+WIDTH_SAMPLE_ROWS = 500
+MAX_COLUMN_WIDTH = 50
+CHUNK_SIZE = 64 * 1024
+
+
+def format_cell(value):
+    """Spreadsheet-friendly representation of a database value"""
+    if isinstance(value, datetime):
+        return value.strftime('%d-%m-%Y %H:%M:%S')
+    return value
+
+
+def row_values(row, columns=EXPORT_COLUMNS):
+    return [format_cell(row.get(col)) for col in columns]
+
+
+def column_widths(sample, columns=EXPORT_COLUMNS):
+    """Column widths from the header and a bounded sample of rows"""
+    widths = [len(str(col)) for col in columns]
+    for values in sample:
+        for idx, value in enumerate(values):
+            if value is not None:
+                widths[idx] = max(widths[idx], len(str(value)))
+    return [min(width + 2, MAX_COLUMN_WIDTH) for width in widths]
+
+
+def iter_csv(rows, columns=EXPORT_COLUMNS):
+    """Yield CSV text in chunks as rows arrive, never holding the full export"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    # BOM so Excel opens non-ASCII names correctly
+    buffer.write('\ufeff')
+    writer.writerow(columns)
+
+    for row in rows:
+        writer.writerow(row_values(row, columns))
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def write_xlsx(rows, path, sheet_name='Registrations', columns=EXPORT_COLUMNS):
+    """Write rows to an .xlsx file with openpyxl's write-only (streaming) mode
+
+    Returns the number of data rows written.
+    """
+    rows = iter(rows)
+    sample = [row_values(row, columns) for row in islice(rows, WIDTH_SAMPLE_ROWS)]
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title=sheet_name)
+
+    # Write-only sheets only accept column dimensions before the first row
+    for idx, width in enumerate(column_widths(sample, columns), start=1):
+        worksheet.column_dimensions[get_column_letter(idx)].width = width
+
+    worksheet.append(columns)
+    count = 0
+    for values in sample:
+        worksheet.append(values)
+        count += 1
+    for row in rows:
+        worksheet.append(row_values(row, columns))
+        count += 1
+
+    workbook.save(path)
+    return count
+
+
+def iter_file_and_remove(path):
+    """Stream a finished export file to the client, then delete it"""
+    try:
+        with open(path, 'rb') as fh:
+            while True:
+                chunk = fh.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+    finally:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def temp_export_path(suffix):
+    fd, path = tempfile.mkstemp(prefix='zeal_export_', suffix=suffix)
+    os.close(fd)
+    return path
+
+
+# ---------------- PER-EVENT ROSTERS ----------------
+def roster_name(event):
+    """File- and sheet-safe form of an event name (sheet titles allow 31 chars, no []:*?/\\)"""
+    name = re.sub(r'[\[\]:*?/\\]+', '-', event)
+    name = re.sub(r'\s+', ' ', name).strip(' -.')
+    return name or 'event'
+
+
+def write_roster(event, rows, directory):
+    """Write one event's roster to ``<directory>/<event>.xlsx``; returns (event, path, count)
+
+    Runs in an export worker process, so everything it needs comes in as
+    arguments and the result is only a path.
+    """
+    path = os.path.join(directory, f"{roster_name(event)}.xlsx")
+    count = write_xlsx(rows, path, sheet_name=roster_name(event)[:31], columns=ROSTER_COLUMNS)
+    return event, path, count
+
+
+def iter_rosters(events, fetch_rows, directory, pool=None, max_pending=8):
+    """Yield (event, path, count) as each event's roster file is finished
+
+    ``fetch_rows(event)`` runs here, one event at a time, while ``pool``
+    (a ProcessPoolExecutor) writes the workbooks of events already
+    fetched; results come back in completion order. At most
+    ``max_pending`` rosters are in flight, which bounds the rows held in
+    memory. Without a pool the rosters are written in this thread.
+    """
+    if pool is None:
+        for event in events:
+            yield write_roster(event, fetch_rows(event), directory)
+        return
+
+    pending = set()
+    for event in events:
+        pending.add(pool.submit(write_roster, event, fetch_rows(event), directory))
+        done = {future for future in pending if future.done()}
+        if len(pending) - len(done) >= max_pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            pending.discard(future)
+            yield future.result()
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+class _ZipStream:
+    """Write-only sink that zipfile can write to; the bytes are collected with drain()"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        chunks, self._chunks = self._chunks, []
+        return chunks
+
+
+def iter_zip(entries):
+    """Stream a zip of the files from ``entries`` ((arcname, path) pairs) as they arrive
+
+    Members are STORED: .xlsx files are already deflate-compressed. Each
+    file is deleted once it has been copied into the archive.
+    """
+    stream = _ZipStream()
+    with zipfile.ZipFile(stream, 'w', compression=zipfile.ZIP_STORED) as archive:
+        for arcname, path in entries:
+            try:
+                with open(path, 'rb') as fh, archive.open(arcname, 'w', force_zip64=True) as member:
+                    while True:
+                        chunk = fh.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        member.write(chunk)
+                        yield from stream.drain()
+            finally:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+            yield from stream.drain()
+    yield from stream.drain()
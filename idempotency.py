@@ -0,0 +1,155 @@
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from sqlite_store import SQLiteStore
+
+# States of a request key
+CLAIMED = "claimed"      # this caller owns the key now and must complete() or release() it
+PENDING = "pending"      # another request holds the key and has not finished
+DONE = "done"            # finished earlier; ``result`` is what it returned
+CONFLICT = "conflict"    # the key was used for a different submission
+
+Claim = namedtuple("Claim", "state result")
+
+_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]{16,64}$")
+
+
+def valid_key(key):
+    """Request keys are the url-safe tokens we issue; anything else is ignored"""
+    return bool(key) and bool(_KEY_PATTERN.match(key))
+
+
+class MemoryIdempotencyStore:
+    """Request keys in an in-process LRU; for a single worker process.
+
+    A claim is a lease: if its holder dies without completing or releasing
+    it, the key can be claimed again after ``lease`` seconds. Completed keys
+    keep their result for ``ttl`` seconds.
+    """
+
+    def __init__(self, ttl=86400, lease=120, maxsize=100_000):
+        self.ttl = ttl
+        self.lease = lease
+        self.maxsize = maxsize
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> [fingerprint, state, result, expires_at]
+        self._evicted = 0
+
+    def claim(self, key, fingerprint):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[3] <= now:
+                self._entries[key] = [fingerprint, PENDING, None, now + self.lease]
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.maxsize:
+                    self._entries.popitem(last=False)
+                    self._evicted += 1
+                return Claim(CLAIMED, None)
+            if entry[0] != fingerprint:
+                return Claim(CONFLICT, None)
+            return Claim(entry[1], entry[2])
+
+    def complete(self, key, result):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                entry[1:] = [DONE, result, time.time() + self.ttl]
+
+    def release(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == PENDING:
+                del self._entries[key]
+
+    def stats(self):
+        now = time.time()
+        with self._lock:
+            live = [entry[1] for entry in self._entries.values() if entry[3] > now]
+            return {
+                "backend": "memory",
+                "pending": live.count(PENDING),
+                "done": live.count(DONE),
+                "maxsize": self.maxsize,
+                "evicted": self._evicted,
+            }
+
+
+class SQLiteIdempotencyStore(SQLiteStore):
+    """Request keys in a local SQLite file, shared by every worker process on the host.
+
+    Claiming is a single upsert that only takes over a missing or expired
+    row, so two workers racing on one key cannot both win. Expired rows are
+    purged in bulk at most every ``purge_interval`` seconds.
+    """
+
+    table = "request_keys"
+
+    def __init__(self, path, ttl=86400, lease=120, purge_interval=60):
+        super().__init__(path, purge_interval)
+        self.ttl = ttl
+        self.lease = lease
+        self._connection().execute(
+            """
+            CREATE TABLE IF NOT EXISTS request_keys (
+                request_key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                state TEXT NOT NULL,
+                result TEXT,
+                expires_at REAL NOT NULL
+            )
+            """
+        )
+        self._connection().execute("CREATE INDEX IF NOT EXISTS idx_request_keys_expires ON request_keys (expires_at)")
+
+    def claim(self, key, fingerprint):
+        now = time.time()
+        connection = self._connection()
+        self._maybe_purge(connection, now)
+        taken = connection.execute(
+            """
+            INSERT INTO request_keys (request_key, fingerprint, state, result, expires_at)
+            VALUES (?, ?, ?, NULL, ?)
+            ON CONFLICT (request_key) DO UPDATE SET
+                fingerprint = excluded.fingerprint, state = excluded.state,
+                result = NULL, expires_at = excluded.expires_at
+            WHERE request_keys.expires_at <= ?
+            """,
+            (key, fingerprint, PENDING, now + self.lease, now)
+        ).rowcount
+        if taken:
+            return Claim(CLAIMED, None)
+        row = connection.execute(
+            "SELECT fingerprint, state, result FROM request_keys WHERE request_key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            # Released between the two statements; try once more
+            return self.claim(key, fingerprint)
+        if row[0] != fingerprint:
+            return Claim(CONFLICT, None)
+        return Claim(row[1], json.loads(row[2]) if row[2] else None)
+
+    def complete(self, key, result):
+        self._connection().execute(
+            "UPDATE request_keys SET state = ?, result = ?, expires_at = ? WHERE request_key = ?",
+            (DONE, json.dumps(result), time.time() + self.ttl, key)
+        )
+
+    def release(self, key):
+        self._connection().execute(
+            "DELETE FROM request_keys WHERE request_key = ? AND state = ?", (key, PENDING)
+        )
+
+    def stats(self):
+        counts = dict(self._connection().execute(
+            "SELECT state, COUNT(*) FROM request_keys WHERE expires_at > ? GROUP BY state", (time.time(),)
+        ).fetchall())
+        return {
+            "backend": "sqlite",
+            "pending": counts.get(PENDING, 0),
+            "done": counts.get(DONE, 0),
+            "expired_purged": self.purged,
+        }
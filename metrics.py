@@ -0,0 +1,254 @@
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; spans a pool checkout (sub-ms) up to a slow Cloudinary upload
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        (key, str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in labels.items()
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        if self.labelnames:
+            raise ValueError(f"{self.name} needs labels {self.labelnames}")
+        return self.labels()
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for key, child in sorted(self._children.items()):
+            labels = dict(zip(self.labelnames, key))
+            for suffix, extra, value in child.samples():
+                lines.append(f"{self.name}{suffix}{_format_labels({**labels, **extra})} {_format_value(value)}")
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def samples(self):
+        yield "", {}, self.value
+
+
+class Counter(_Metric):
+    """Monotonic count; the name always ends in ``_total``"""
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        if not name.endswith("_total"):
+            name += "_total"
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount=1):
+        self._default().inc(amount)
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def samples(self):
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            yield "_bucket", {"le": _format_value(bound)}, cumulative
+        yield "_bucket", {"le": "+Inf"}, count
+        yield "_sum", {}, total
+        yield "_count", {}, count
+
+
+class Histogram(_Metric):
+    """Latency distribution in seconds with cumulative ``le`` buckets"""
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class Registry:
+    """Holds metrics and renders them in the Prometheus text exposition format.
+
+    Besides counters and histograms, ``register_stats()`` turns an existing
+    ``stats()`` method (pool, upload queue, caches) into gauges read at
+    scrape time, so nothing has to be double-counted.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self._stats = []
+
+    def _add(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._add(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def register_stats(self, prefix, stats, documentation=""):
+        """Expose every numeric field of ``stats()`` as a gauge named ``<prefix>_<field>``"""
+        with self._lock:
+            self._stats.append((prefix, stats, documentation))
+
+    def render(self):
+        lines = []
+        with self._lock:
+            metrics = list(self._metrics.values())
+            stats_sources = list(self._stats)
+        for metric in metrics:
+            lines.extend(metric.render())
+        for prefix, stats, documentation in stats_sources:
+            try:
+                values = stats()
+            except Exception:
+                continue
+            for field, value in values.items():
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{field}"
+                lines.append(f"# HELP {name} {documentation or prefix} ({field})")
+                lines.append(f"# TYPE {name} gauge")
+                lines.append(f"{name} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+FUNCTION_SECONDS = REGISTRY.histogram(
+    "zeal_function_duration_seconds", "Time spent in instrumented helpers", ("function",)
+)
+FUNCTION_CALLS = REGISTRY.counter(
+    "zeal_function_calls", "Calls to instrumented helpers by outcome (ok or exception class)",
+    ("function", "outcome")
+)
+
+
+def timed(name):
+    """Record a helper's duration and its outcome (ok, or the exception class raised)"""
+    def decorator(func):
+        histogram = FUNCTION_SECONDS.labels(function=name)
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "ok"
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                outcome = type(e).__name__
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started)
+                FUNCTION_CALLS.labels(function=name, outcome=outcome).inc()
+        return wrapper
+    return decorator
+
+
+def init_request_metrics(app, registry=REGISTRY):
+    """Count requests and time them per endpoint (route name, so label sets stay bounded)"""
+    from flask import g, request
+
+    durations = registry.histogram(
+        "zeal_http_request_duration_seconds", "Request latency by endpoint", ("method", "endpoint")
+    )
+    requests_total = registry.counter(
+        "zeal_http_requests", "Requests by endpoint and status", ("method", "endpoint", "status")
+    )
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _record(response):
+        started = g.get("metrics_started")
+        if started is not None:
+            endpoint = request.endpoint or "unmatched"
+            durations.labels(method=request.method, endpoint=endpoint).observe(time.perf_counter() - started)
+            requests_total.labels(method=request.method, endpoint=endpoint, status=response.status_code).inc()
+        return response
@@ -0,0 +1,380 @@
+import logging
+import time
+
+import mysql.connector
+from mysql.connector import Error, errorcode
+
+import registration_stats
+
+logger = logging.getLogger(__name__)
+
+# Serialises concurrent `flask migrate` runs (e.g. several deploy hooks at once)
+MIGRATION_LOCK_NAME = "zeal10_schema_migrations"
+MIGRATION_LOCK_TIMEOUT = 60
+
+
+class MigrationError(Exception):
+    """The schema could not be brought up to date"""
+
+
+# ---------------- SCHEMA HELPERS ----------------
+def ensure_column(cursor, table, column, definition):
+    """Add a column to an existing table if it is missing"""
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND COLUMN_NAME = %s
+        """,
+        (table, column)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info("Added column '%s' to '%s'", column, table)
+
+
+def ensure_index(cursor, table, index, columns, unique=False):
+    """Create an index on an existing table if it is missing
+
+    A unique index that existing duplicates prevent raises MigrationError
+    naming a few of them, so the migration stays unapplied (and is retried
+    on the next run) until the duplicates are cleaned up.
+    """
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s
+        """,
+        (table, index)
+    )
+    if cursor.fetchone()[0] == 0:
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        try:
+            cursor.execute(f"CREATE {kind} {index} ON {table} {columns}")
+            logger.info("Added index '%s' on '%s'", index, table)
+        except Error as e:
+            if e.errno != errorcode.ER_DUP_ENTRY:
+                raise
+            key = columns.strip("()")
+            cursor.execute(
+                f"SELECT {key}, COUNT(*) FROM {table} WHERE {key} IS NOT NULL "
+                f"GROUP BY {key} HAVING COUNT(*) > 1 LIMIT 5"
+            )
+            examples = ", ".join(f"{value!r} x{count}" for value, count in cursor.fetchall())
+            raise MigrationError(
+                f"Cannot add unique index '{index}' on '{table}': existing rows repeat {key} "
+                f"(e.g. {examples}); remove or merge the duplicates and run the migration again"
+            ) from e
+
+
+# ---------------- MIGRATIONS ----------------
+# Every step is idempotent, so databases created by the old init_db() (which
+# already have some or all of these) can be adopted by simply running them.
+def _create_registrations(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS registrations (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            student_name VARCHAR(255) NOT NULL,
+            roll_no VARCHAR(100) NOT NULL,
+            email VARCHAR(255) NOT NULL,
+            course VARCHAR(255) NOT NULL,
+            college VARCHAR(255) NOT NULL,
+            college_id VARCHAR(100),
+            other_college VARCHAR(255),
+            events TEXT NOT NULL,
+            group_members TEXT,
+            contact_numbers VARCHAR(255) NOT NULL,
+            total_amount DECIMAL(10, 2) NOT NULL,
+            payment_screenshot_url TEXT NOT NULL,
+            payment_status VARCHAR(50) DEFAULT 'Submitted',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_student_name (student_name),
+            INDEX idx_roll_no (roll_no),
+            INDEX idx_college (college),
+            INDEX idx_created_at (created_at)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+    )
+
+
+def _add_screenshot_status(cursor):
+    # Background uploads record whether the screenshot has landed yet
+    ensure_column(cursor, 'registrations', 'screenshot_status',
+                  "VARCHAR(20) DEFAULT 'Uploaded' AFTER payment_status")
+
+
+def _add_created_id_index(cursor):
+    # Keyset pagination for the admin listing walks (created_at, id)
+    ensure_index(cursor, 'registrations', 'idx_created_id', '(created_at, id)')
+
+
+def _add_unique_identities(cursor):
+    # Duplicate registrations are rejected by the database itself
+    ensure_index(cursor, 'registrations', 'uq_roll_no', '(roll_no)', unique=True)
+    ensure_index(cursor, 'registrations', 'uq_email', '(email)', unique=True)
+
+
+def _add_registration_events_and_stats(cursor):
+    # One row per (registration, event), written in the same transaction as the registration
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS registration_events (
+            registration_id INT NOT NULL,
+            event VARCHAR(255) NOT NULL,
+            PRIMARY KEY (registration_id, event),
+            CONSTRAINT fk_registration_events_registration
+                FOREIGN KEY (registration_id) REFERENCES registrations (id) ON DELETE CASCADE
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+    )
+    # Admin counters, maintained incrementally on insert (see registration_stats).
+    # Created sharded (migration 10's layout) because rebuild() below writes
+    # through the current upsert, which names the shard column.
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS registration_stats (
+            dimension VARCHAR(20) NOT NULL,
+            name VARCHAR(255) NOT NULL,
+            shard SMALLINT NOT NULL DEFAULT 0,
+            registrations INT NOT NULL DEFAULT 0,
+            revenue DECIMAL(12, 2) NOT NULL DEFAULT 0,
+            submitted INT NOT NULL DEFAULT 0,
+            verified INT NOT NULL DEFAULT 0,
+            event_entries INT NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, name, shard)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+    )
+    # A table left by an earlier, failed run of this step may predate the shard column
+    _shard_registration_stats(cursor)
+    registration_stats.rebuild(cursor)
+
+
+def _backfill_registration_events(cursor, batch_size=1000):
+    # Rows inserted before migration 5 only have the comma-joined events column
+    last_id = 0
+    backfilled = 0
+    while True:
+        cursor.execute(
+            """
+            SELECT r.id, r.events FROM registrations r
+            WHERE r.id > %s
+              AND NOT EXISTS (SELECT 1 FROM registration_events e WHERE e.registration_id = r.id)
+            ORDER BY r.id
+            LIMIT %s
+            """,
+            (last_id, batch_size)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        event_rows = [
+            (registration_id, event)
+            for registration_id, events in rows
+            for event in registration_stats.split_events(events)
+        ]
+        if event_rows:
+            cursor.executemany(
+                "INSERT IGNORE INTO registration_events (registration_id, event) VALUES (%s, %s)", event_rows
+            )
+        last_id = rows[-1][0]
+        backfilled += len(rows)
+    logger.info("Backfilled registration_events", extra={"registrations": backfilled})
+    # "Who registered for X" walks this index instead of LIKE-scanning registrations.events
+    ensure_index(cursor, 'registration_events', 'idx_event_registration', '(event, registration_id)')
+    # Per-college lists in listing order
+    ensure_index(cursor, 'registrations', 'idx_college_created', '(college, created_at, id)')
+
+
+def _add_payment_reconciliation(cursor):
+    # Filled when a bank statement credit is matched to the registration
+    ensure_column(cursor, 'registrations', 'payment_reference', "VARCHAR(100) NULL AFTER payment_status")
+    ensure_column(cursor, 'registrations', 'payment_match', "VARCHAR(20) NULL AFTER payment_reference")
+    ensure_column(cursor, 'registrations', 'paid_at', "DATETIME NULL AFTER payment_match")
+    # One credit can verify only one registration (NULLs do not collide)
+    ensure_index(cursor, 'registrations', 'uq_payment_reference', '(payment_reference)', unique=True)
+
+
+def _create_checkins(cursor):
+    # Gate scans synced from the offline check-in devices; scan_id makes re-sends harmless
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS checkins (
+            scan_id CHAR(32) PRIMARY KEY,
+            registration_id INT NULL,
+            gate VARCHAR(255) NOT NULL DEFAULT '',
+            device VARCHAR(100) NOT NULL,
+            result VARCHAR(30) NOT NULL,
+            payment_status VARCHAR(50) NULL,
+            scanned_at DATETIME(6) NOT NULL,
+            received_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_checkins_registration (registration_id, gate)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+    )
+
+
+def _create_email_outbox(cursor):
+    # Emails written in the registration's own transaction and sent later by
+    # outbox.OutboxDispatcher; (status, next_attempt_at) is its claim query
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            kind VARCHAR(30) NOT NULL,
+            registration_id INT NULL,
+            recipient VARCHAR(255) NOT NULL,
+            payload TEXT NOT NULL,
+            status VARCHAR(10) NOT NULL DEFAULT 'pending',
+            attempts INT NOT NULL DEFAULT 0,
+            next_attempt_at DATETIME(6) NOT NULL,
+            last_error VARCHAR(500) NULL,
+            created_at DATETIME(6) NOT NULL,
+            sent_at DATETIME(6) NULL,
+            INDEX idx_outbox_due (status, next_attempt_at),
+            INDEX idx_outbox_registration (registration_id)
+        ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+        """
+    )
+
+
+def _shard_registration_stats(cursor):
+    # Counters are spread over registration_stats.SHARDS rows per summary row,
+    # so concurrent inserts stop serialising on the single ('total', '') row.
+    # Only tables created by migration 5 before it was sharded need this.
+    ensure_column(cursor, 'registration_stats', 'shard', "SMALLINT NOT NULL DEFAULT 0 AFTER name")
+    cursor.execute(
+        """
+        SELECT COUNT(*) FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'registration_stats'
+          AND INDEX_NAME = 'PRIMARY' AND COLUMN_NAME = 'shard'
+        """
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute("ALTER TABLE registration_stats DROP PRIMARY KEY, ADD PRIMARY KEY (dimension, name, shard)")
+        logger.info("registration_stats primary key now includes shard")
+
+
+def _add_payment_credit(cursor):
+    # Fingerprint of the statement credit that verified the registration; covers
+    # credits without a bank reference, which uq_payment_reference cannot
+    ensure_column(cursor, 'registrations', 'payment_credit', "CHAR(40) NULL AFTER payment_reference")
+    ensure_index(cursor, 'registrations', 'uq_payment_credit', '(payment_credit)', unique=True)
+
+
+def _add_outbox_status_index(cursor):
+    # outbox.backlog() finds the oldest unsent row by (status, id); the claim
+    # query already has idx_outbox_due on (status, next_attempt_at)
+    ensure_index(cursor, 'email_outbox', 'idx_outbox_status_id', '(status, id)')
+
+
+# (version, description, step); append only, never renumber
+MIGRATIONS = [
+    (1, "create registrations", _create_registrations),
+    (2, "add registrations.screenshot_status", _add_screenshot_status),
+    (3, "index registrations (created_at, id)", _add_created_id_index),
+    (4, "unique roll_no and email", _add_unique_identities),
+    (5, "registration_events and materialized registration_stats", _add_registration_events_and_stats),
+    (6, "backfill registration_events, index by event and college", _backfill_registration_events),
+    (7, "payment reference, match method and paid_at", _add_payment_reconciliation),
+    (8, "checkins synced from gate devices", _create_checkins),
+    (9, "email_outbox for confirmation emails", _create_email_outbox),
+    (10, "shard registration_stats counter rows", _shard_registration_stats),
+    (11, "statement credit fingerprint on registrations", _add_payment_credit),
+    (12, "index email_outbox (status, id)", _add_outbox_status_index),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# ---------------- RUNNER ----------------
+def create_database(config):
+    """CREATE DATABASE IF NOT EXISTS for config['database'], connecting without it"""
+    server_config = dict(config)
+    database_name = server_config.pop('database')
+    connection = mysql.connector.connect(**server_config)
+    try:
+        cursor = connection.cursor()
+        cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{database_name}`")
+        cursor.close()
+        logger.info("Database '%s' checked/created", database_name)
+    finally:
+        connection.close()
+
+
+def _ensure_version_table(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INT PRIMARY KEY,
+            description VARCHAR(255) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INT NOT NULL
+        ) ENGINE=InnoDB
+        """
+    )
+
+
+def applied_versions(connection):
+    """Versions recorded in schema_migrations; empty if the table does not exist yet"""
+    cursor = connection.cursor()
+    try:
+        cursor.execute("SELECT version FROM schema_migrations")
+        return {row[0] for row in cursor.fetchall()}
+    except Error as e:
+        if e.errno == errorcode.ER_NO_SUCH_TABLE:
+            return set()
+        raise
+    finally:
+        cursor.close()
+
+
+def schema_version(connection):
+    """Highest applied migration, or 0 for an unmigrated database"""
+    return max(applied_versions(connection), default=0)
+
+
+def pending_migrations(connection):
+    done = applied_versions(connection)
+    return [migration for migration in MIGRATIONS if migration[0] not in done]
+
+
+def migrate(connection, target=None):
+    """Apply pending migrations up to ``target`` (default: latest), in order
+
+    MySQL commits DDL implicitly, so each step is recorded as soon as it has
+    run; a failure leaves the earlier steps applied, the failed one and
+    everything after it unrecorded, and is raised as MigrationError.
+    Returns the list of versions applied.
+    """
+    target = LATEST_VERSION if target is None else target
+    cursor = connection.cursor()
+    cursor.execute("SELECT GET_LOCK(%s, %s)", (MIGRATION_LOCK_NAME, MIGRATION_LOCK_TIMEOUT))
+    if cursor.fetchone()[0] != 1:
+        cursor.close()
+        raise MigrationError("Another migration is running; timed out waiting for its lock")
+
+    applied = []
+    try:
+        _ensure_version_table(cursor)
+        for version, description, step in pending_migrations(connection):
+            if version > target:
+                break
+            started = time.perf_counter()
+            try:
+                step(cursor)
+            except (Error, MigrationError) as e:
+                raise MigrationError(f"Migration {version} ({description}) failed: {e}") from e
+            duration_ms = int((time.perf_counter() - started) * 1000)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description, duration_ms) VALUES (%s, %s, %s)",
+                (version, description, duration_ms)
+            )
+            connection.commit()
+            applied.append(version)
+            logger.info("Applied migration %d: %s", version, description, extra={"duration_ms": duration_ms})
+    finally:
+        cursor.execute("SELECT RELEASE_LOCK(%s)", (MIGRATION_LOCK_NAME,))
+        cursor.fetchall()
+        cursor.close()
+    return applied
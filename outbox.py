@@ -0,0 +1,469 @@
+import json
+import logging
+import random
+import smtplib
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from email.utils import parseaddr
+
+from registration_stats import split_events
+
+logger = logging.getLogger(__name__)
+
+# Message kinds
+CONFIRMATION = "confirmation"
+PAYMENT_VERIFIED = "payment_verified"
+
+# Row states
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+
+# Registration fields copied into a confirmation's payload, so the email
+# shows what was submitted even if the row is edited before it goes out
+CONFIRMATION_FIELDS = ("student_name", "roll_no", "college", "events", "group_members",
+                       "total_amount", "payment_status")
+
+ENQUEUE_QUERY = """
+INSERT INTO email_outbox
+(kind, registration_id, recipient, payload, status, attempts, next_attempt_at, created_at)
+VALUES (%s, %s, %s, %s, %s, 0, %s, %s)
+"""
+
+# next_attempt_at doubles as the claim lease: a claimed row is pushed into the
+# future, so other dispatchers skip it and it comes back if its claimer dies
+CLAIM_QUERY = """
+SELECT id, kind, registration_id, recipient, payload, attempts, created_at
+FROM email_outbox
+WHERE status = %s AND next_attempt_at <= %s
+ORDER BY next_attempt_at, id
+LIMIT %s FOR UPDATE SKIP LOCKED
+"""
+
+
+def confirmation(registration_id, registration):
+    """Outbox message confirming one registration, for enqueue()"""
+    return {
+        "kind": CONFIRMATION,
+        "registration_id": registration_id,
+        "recipient": registration["email"],
+        "payload": {field: registration.get(field) for field in CONFIRMATION_FIELDS},
+    }
+
+
+def payment_verified(registration_id, registration):
+    """Outbox message telling a registration its payment was verified, with the reissued ticket"""
+    message = confirmation(registration_id, {**registration, "payment_status": "Verified"})
+    message["kind"] = PAYMENT_VERIFIED
+    return message
+
+
+def enqueue(cursor, messages):
+    """Queue messages on the caller's cursor; they commit (or roll back) with its transaction"""
+    if not messages:
+        return
+    now = datetime.now()
+    cursor.executemany(ENQUEUE_QUERY, [
+        (message["kind"], message["registration_id"], message["recipient"],
+         json.dumps(message["payload"], default=str), PENDING, now, now)
+        for message in messages
+    ])
+
+
+def confirmation_email(row, sender, ticket_url=None):
+    """The EmailMessage for a claimed confirmation or payment-verified row"""
+    data = json.loads(row["payload"])
+    domain = parseaddr(sender)[1].rpartition("@")[2] or "localhost"
+    message = EmailMessage()
+    message["From"] = sender
+    message["To"] = row["recipient"]
+    verified = row["kind"] == PAYMENT_VERIFIED
+    if verified:
+        message["Subject"] = f"ZEAL 10.0 payment verified for registration #{row['registration_id']}"
+    else:
+        message["Subject"] = f"ZEAL 10.0 registration #{row['registration_id']} received"
+    # Stable per outbox row, so a rare resend after a crash reads as the same message
+    message["Message-ID"] = f"<zeal10-outbox-{row['id']}@{domain}>"
+
+    lines = [
+        f"Hi {data['student_name']},",
+        "",
+        "Your payment has been verified. Use the ticket in this email at the gate; it replaces any earlier one."
+        if verified else "Thank you for registering for ZEAL 10.0. These are the details we received:",
+        "",
+        f"Registration ID: {row['registration_id']}",
+        f"Roll number: {data['roll_no']}",
+        f"College: {data['college']}",
+        "Events:",
+    ]
+    lines += [f"  - {event}" for event in split_events(data["events"])]
+    if data.get("group_members"):
+        lines.append(f"Group members: {data['group_members']}")
+    lines += [
+        f"Amount: ₹{data['total_amount']}",
+        f"Payment status: {data.get('payment_status') or 'Submitted'}",
+    ]
+    if ticket_url:
+        lines += ["", "Your entry ticket (show this QR code at the gate):", ticket_url]
+    lines += ["", "See you at ZEAL 10.0!"]
+    message.set_content("\n".join(lines))
+    return message
+
+
+def _permanent(error):
+    """Whether an SMTP refusal is final (5xx) rather than worth retrying (4xx)"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPSenderRefused):
+        # A refused From address is our misconfiguration, not the message's fault
+        return False
+    return error.smtp_code >= 500
+
+
+class OutboxDispatcher:
+    """Background sender that drains the email_outbox table in batches.
+
+    One thread claims up to ``batch_size`` due rows per transaction, renders
+    each with ``render(row)`` and sends it over one SMTP connection from
+    ``connect_smtp()``, which is kept open across batches (and replaced after
+    ``max_per_connection`` messages, an error, or ``idle_timeout`` seconds
+    idle). Sends are spaced to at most ``rate`` per second. A 4xx refusal or
+    a connection failure is retried with exponential backoff up to
+    ``max_attempts``; a 5xx refusal fails the row at once. A row claimed by a
+    dispatcher that died becomes due again after ``lease`` seconds, so a
+    message may rarely go out twice but is never dropped. An optional
+    ``backlog`` BacklogCache is refreshed from the dispatch loop.
+    """
+
+    def __init__(self, get_connection, connect_smtp, render, batch_size=50, interval=2.0, rate=5.0,
+                 max_attempts=8, backoff_base=60.0, backoff_max=3600.0, lease=300.0,
+                 max_per_connection=100, idle_timeout=30.0, backlog=None, name="outbox-dispatcher"):
+        self.get_connection = get_connection
+        self.connect_smtp = connect_smtp
+        self.render = render
+        self.batch_size = batch_size
+        self.interval = interval
+        self.rate = rate
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.lease = lease
+        self.max_per_connection = max_per_connection
+        self.idle_timeout = idle_timeout
+        self.backlog = backlog
+        self.name = name
+
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+        self._smtp = None
+        self._smtp_sent = 0
+        self._smtp_used_at = 0.0
+        self._next_send_at = 0.0
+
+        self._batches = 0
+        self._claimed = 0
+        self._sent = 0
+        self._retried = 0
+        self._failed = 0
+        self._released = 0
+        self._errors = 0
+        self._connections = 0
+        self._send_time = 0.0
+        self._lag_total = 0.0
+        self._lag_max = 0.0
+        self._last_lag = 0.0
+        self._recent = deque()  # monotonic times of sends in the last minute
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.join(timeout)
+        self._close()
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                claimed = self.run_once()
+            except Exception as e:
+                claimed = 0
+                with self._lock:
+                    self._errors += 1
+                logger.error("Outbox dispatch failed: %s", e)
+            if self.backlog is not None:
+                self.backlog.refresh()
+            if not claimed:
+                self._close_idle()
+                self._stopping.wait(self.interval)
+
+    def drain(self):
+        """Send everything due now, in the calling thread; returns how many rows were claimed"""
+        total = 0
+        while True:
+            claimed = self.run_once()
+            if not claimed:
+                self._close()
+                return total
+            total += claimed
+
+    def run_once(self):
+        """Claim one batch of due rows, send them and record the outcome; returns the batch size"""
+        rows = self._claim()
+        if not rows:
+            return 0
+        sent, retry, failed, released = self._deliver(rows)
+        self._record(sent, retry, failed, released)
+        with self._lock:
+            self._batches += 1
+            self._claimed += len(rows)
+        return len(rows)
+
+    # ---------------- DATABASE ----------------
+    def _claim(self):
+        now = datetime.now()
+        connection = self.get_connection()
+        if connection is None:
+            raise Exception("Database connection failed")
+        try:
+            cursor = connection.cursor(dictionary=True)
+            cursor.execute(CLAIM_QUERY, (PENDING, now, self.batch_size))
+            rows = cursor.fetchall()
+            if rows:
+                cursor.execute(
+                    f"UPDATE email_outbox SET next_attempt_at = %s WHERE id IN ({', '.join(['%s'] * len(rows))})",
+                    [now + timedelta(seconds=self.lease)] + [row["id"] for row in rows]
+                )
+            connection.commit()
+            cursor.close()
+            return rows
+        finally:
+            connection.close()
+
+    def _record(self, sent, retry, failed, released):
+        now = datetime.now()
+        connection = self.get_connection()
+        if connection is None:
+            raise Exception("Database connection failed")
+        try:
+            cursor = connection.cursor()
+            if sent:
+                cursor.execute(
+                    f"UPDATE email_outbox SET status = %s, attempts = attempts + 1, sent_at = %s, last_error = NULL "
+                    f"WHERE id IN ({', '.join(['%s'] * len(sent))})",
+                    [SENT, now] + [row["id"] for row in sent]
+                )
+            if retry:
+                cursor.executemany(
+                    "UPDATE email_outbox SET attempts = %s, next_attempt_at = %s, last_error = %s WHERE id = %s",
+                    [(attempts, now + timedelta(seconds=delay), error[:500], row["id"])
+                     for row, attempts, delay, error in retry]
+                )
+            if failed:
+                cursor.executemany(
+                    "UPDATE email_outbox SET status = %s, attempts = %s, last_error = %s WHERE id = %s",
+                    [(FAILED, attempts, error[:500], row["id"]) for row, attempts, error in failed]
+                )
+            if released:
+                cursor.execute(
+                    f"UPDATE email_outbox SET next_attempt_at = %s WHERE id IN ({', '.join(['%s'] * len(released))})",
+                    [now] + [row["id"] for row in released]
+                )
+            connection.commit()
+            cursor.close()
+        finally:
+            connection.close()
+
+    # ---------------- SENDING ----------------
+    def _deliver(self, rows):
+        sent, retry, failed, released = [], [], [], []
+        for index, row in enumerate(rows):
+            attempts = row["attempts"] + 1
+            try:
+                message = self.render(row)
+                self._pace()
+                self._send(message)
+            except smtplib.SMTPResponseException as e:
+                self._fail_or_retry(row, attempts, f"{e.smtp_code} {e.smtp_error!r}", _permanent(e), retry, failed)
+                continue
+            except smtplib.SMTPRecipientsRefused as e:
+                self._fail_or_retry(row, attempts, f"refused {e.recipients}", _permanent(e), retry, failed)
+                continue
+            except (smtplib.SMTPException, OSError) as e:
+                # The server is unreachable: retry this row later and hand the
+                # rest of the batch back untouched instead of failing each one
+                self._close()
+                self._fail_or_retry(row, attempts, f"{type(e).__name__}: {e}", False, retry, failed)
+                released = rows[index + 1:]
+                break
+            except Exception as e:
+                # The row could not be rendered or encoded; retrying will not help
+                self._fail_or_retry(row, attempts, f"{type(e).__name__}: {e}", True, retry, failed)
+                continue
+
+            lag = (datetime.now() - row["created_at"]).total_seconds()
+            sent.append(row)
+            with self._lock:
+                self._sent += 1
+                self._recent.append(time.monotonic())
+                self._last_lag = lag
+                self._lag_total += lag
+                self._lag_max = max(self._lag_max, lag)
+        with self._lock:
+            self._released += len(released)
+        return sent, retry, failed, released
+
+    def _fail_or_retry(self, row, attempts, error, permanent, retry, failed):
+        if permanent or attempts >= self.max_attempts:
+            logger.error("Giving up on outbox email after %d attempt(s): %s", attempts, error,
+                         extra={"registration_id": row["registration_id"]})
+            failed.append((row, attempts, error))
+            with self._lock:
+                self._failed += 1
+            return
+        delay = min(self.backoff_base * (2 ** (attempts - 1)), self.backoff_max)
+        logger.warning("Outbox email failed (attempt %d/%d): %s", attempts, self.max_attempts, error,
+                       extra={"registration_id": row["registration_id"]})
+        retry.append((row, attempts, delay * random.uniform(0.8, 1.2), error))
+        with self._lock:
+            self._retried += 1
+
+    def _pace(self):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        if self._next_send_at > now:
+            time.sleep(self._next_send_at - now)
+            now = self._next_send_at
+        self._next_send_at = now + 1.0 / self.rate
+
+    def _send(self, message):
+        started = time.monotonic()
+        try:
+            self._connection().send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # Servers drop connections they consider idle; reconnect once
+            self._close()
+            self._connection().send_message(message)
+        self._smtp_sent += 1
+        self._smtp_used_at = time.monotonic()
+        with self._lock:
+            self._send_time += self._smtp_used_at - started
+
+    def _connection(self):
+        if self._smtp is not None and self._smtp_sent >= self.max_per_connection:
+            self._close()
+        if self._smtp is None:
+            try:
+                self._smtp = self.connect_smtp()
+            except smtplib.SMTPResponseException as e:
+                # Refused at greeting or login: the server or our credentials, not the message
+                raise ConnectionError(f"SMTP connect refused: {e.smtp_code} {e.smtp_error!r}") from e
+            self._smtp_sent = 0
+            self._smtp_used_at = time.monotonic()
+            with self._lock:
+                self._connections += 1
+        return self._smtp
+
+    def _close(self):
+        smtp, self._smtp = self._smtp, None
+        if smtp is None:
+            return
+        try:
+            smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            smtp.close()
+
+    def _close_idle(self):
+        if self._smtp is not None and time.monotonic() - self._smtp_used_at > self.idle_timeout:
+            self._close()
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            while self._recent and now - self._recent[0] > 60:
+                self._recent.popleft()
+            return {
+                "running": self._thread is not None,
+                "batches": self._batches,
+                "claimed": self._claimed,
+                "sent": self._sent,
+                "retried": self._retried,
+                "failed": self._failed,
+                "released": self._released,
+                "errors": self._errors,
+                "smtp_connections": self._connections,
+                "sent_last_minute": len(self._recent),
+                "avg_send_ms": round(self._send_time / self._sent * 1000, 3) if self._sent else 0.0,
+                "last_lag_s": round(self._last_lag, 3),
+                "avg_lag_s": round(self._lag_total / self._sent, 3) if self._sent else 0.0,
+                "max_lag_s": round(self._lag_max, 3),
+            }
+
+
+def backlog(connection):
+    """Unsent and failed row counts, and the age in seconds of the oldest unsent row"""
+    cursor = connection.cursor()
+    cursor.execute(
+        "SELECT status, COUNT(*) FROM email_outbox WHERE status IN (%s, %s) GROUP BY status", (PENDING, FAILED)
+    )
+    counts = dict(cursor.fetchall())
+    cursor.execute("SELECT created_at FROM email_outbox WHERE status = %s ORDER BY id LIMIT 1", (PENDING,))
+    oldest = cursor.fetchone()
+    cursor.close()
+    return {
+        "pending": counts.get(PENDING, 0),
+        "failed": counts.get(FAILED, 0),
+        "oldest_pending_s": round((datetime.now() - oldest[0]).total_seconds(), 3) if oldest else 0.0,
+    }
+
+
+class BacklogCache:
+    """Last ``fetch()`` result (e.g. backlog() over a pooled connection), refreshed at most every ``ttl`` seconds
+
+    Lets /metrics scrapes read the backlog without a query each; the
+    dispatcher thread refreshes it between batches so scrapes rarely have
+    to. A failed refresh is logged and counted, and the previous figures
+    are kept (``age_s`` shows how old they are).
+    """
+
+    def __init__(self, fetch, ttl=30.0):
+        self.fetch = fetch
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._value = {}
+        self._fetched_at = None
+        self._errors = 0
+
+    def refresh(self, force=False):
+        with self._lock:
+            if not force and self._fetched_at is not None and time.monotonic() - self._fetched_at < self.ttl:
+                return
+            try:
+                self._value = self.fetch()
+            except Exception as e:
+                self._errors += 1
+                logger.warning("Could not read the outbox backlog: %s", e)
+                return
+            self._fetched_at = time.monotonic()
+
+    def stats(self):
+        self.refresh()
+        with self._lock:
+            return {
+                **self._value,
+                "age_s": round(time.monotonic() - self._fetched_at, 3) if self._fetched_at is not None else -1,
+                "refresh_errors": self._errors,
+            }
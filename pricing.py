@@ -0,0 +1,195 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from functools import cached_property
+from types import MappingProxyType
+
+from jinja2.utils import htmlsafe_json_dumps
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "event_catalog.json")
+
+
+class CatalogError(ValueError):
+    """Raised when the event catalog file is missing or malformed"""
+
+
+def count_group_members(group_members):
+    """Number of names in the comma-separated group members field"""
+    return sum(1 for name in (group_members or "").split(",") if name.strip())
+
+
+@dataclass(frozen=True)
+class Catalog:
+    """Compiled, read-only view of the event catalog and discount rules.
+
+    Discounts are whole percentages applied per event and rounded down, the
+    way the Mangalmay half-price rule has always worked. When several rules
+    apply (a college rule and a group-size rule) the largest one wins.
+    """
+
+    version: str
+    prices: MappingProxyType
+    college_discounts: MappingProxyType
+    group_discounts: tuple  # ((min_members, percent), ...) largest threshold first
+    category_parents: frozenset
+    event_names: tuple
+    client_json: str
+
+    def discount_percent(self, college, group_size=0):
+        percent = self.college_discounts.get(college, 0)
+        for min_members, group_percent in self.group_discounts:
+            if group_size >= min_members:
+                percent = max(percent, group_percent)
+                break
+        return percent
+
+    def quote(self, events_list, college, group_size=0):
+        """Total for the selected events; returns (total, unknown_events)"""
+        percent = self.discount_percent(college, group_size)
+        total = 0
+        unknown = []
+        for event in events_list:
+            price = self.prices.get(event)
+            if price is None:
+                unknown.append(event)
+                continue
+            total += price * (100 - percent) // 100
+        return total, unknown
+
+    @cached_property
+    def achievable_totals(self):
+        """Every total a registration can come to under any discount rule
+
+        Each plain event is picked at most once and each category event in
+        at most one category, which keeps the set to a few dozen amounts.
+        """
+        choices = {}
+        for name, price in self.prices.items():
+            choices.setdefault(name.split(" - ", 1)[0], []).append(price)
+
+        percents = {0, *self.college_discounts.values(), *(pct for _, pct in self.group_discounts)}
+        totals = set()
+        for percent in percents:
+            sums = {0}
+            for options in choices.values():
+                discounted = [price * (100 - percent) // 100 for price in options]
+                sums |= {total + price for total in sums for price in discounted}
+            totals |= sums
+        totals.discard(0)
+        return frozenset(totals)
+
+
+def compile_catalog(raw, version):
+    """Validate a parsed catalog document and freeze it into a Catalog"""
+    try:
+        events = raw["events"]
+        discounts = raw.get("discounts", {})
+        prices = {str(name): int(price) for name, price in events.items()}
+        colleges = {str(name): int(pct) for name, pct in discounts.get("colleges", {}).items()}
+        groups = sorted(
+            ((int(rule["min_members"]), int(rule["percent"])) for rule in discounts.get("group_size", [])),
+            reverse=True
+        )
+    except (KeyError, TypeError, ValueError, AttributeError) as e:
+        raise CatalogError(f"Malformed event catalog: {e}")
+
+    for percent in list(colleges.values()) + [pct for _, pct in groups]:
+        if not 0 <= percent <= 100:
+            raise CatalogError(f"Discount percent out of range: {percent}")
+
+    category_parents = frozenset(name.split(" - ", 1)[0] for name in prices if " - " in name)
+    event_names = tuple(dict.fromkeys(name.split(" - ", 1)[0] for name in prices))
+
+    # Event cards in form order: plain events first, then one card per
+    # category parent listing its categories (what the page used to regroup)
+    simple = [{"name": name, "price": price} for name, price in prices.items() if " - " not in name]
+    grouped = {}
+    for name, price in prices.items():
+        if " - " in name:
+            parent, category = name.split(" - ", 1)
+            grouped.setdefault(parent, []).append({"name": category, "price": price})
+    menu = simple + [{"name": parent, "price": None, "categories": categories}
+                     for parent, categories in grouped.items()]
+
+    # Serialized once here so every page render can inline it as-is
+    client_json = htmlsafe_json_dumps({
+        "version": version,
+        "events": prices,
+        "menu": menu,
+        "discounts": {
+            "colleges": colleges,
+            "group_size": [{"min_members": m, "percent": p} for m, p in groups],
+        },
+    })
+
+    return Catalog(
+        version=version,
+        prices=MappingProxyType(prices),
+        college_discounts=MappingProxyType(colleges),
+        group_discounts=tuple(groups),
+        category_parents=category_parents,
+        event_names=event_names,
+        client_json=client_json,
+    )
+
+
+def load_catalog(path=DEFAULT_CATALOG_PATH):
+    try:
+        with open(path, "rb") as fh:
+            content = fh.read()
+        raw = json.loads(content)
+    except (OSError, ValueError) as e:
+        raise CatalogError(f"Cannot read event catalog {path}: {e}")
+    return compile_catalog(raw, hashlib.sha1(content).hexdigest()[:12])
+
+
+class PricingEngine:
+    """Serves the compiled catalog and recompiles it when the file changes.
+
+    The file's mtime is checked at most every ``check_interval`` seconds, so
+    edits go live without a restart. A bad edit is reported and the previous
+    catalog stays in service.
+    """
+
+    def __init__(self, path=DEFAULT_CATALOG_PATH, check_interval=2.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._catalog = load_catalog(path)
+        self._mtime = os.path.getmtime(path)
+        self._next_check = time.monotonic() + check_interval
+
+    def catalog(self):
+        if time.monotonic() >= self._next_check:
+            self._maybe_reload()
+        return self._catalog
+
+    def _maybe_reload(self):
+        if not self._lock.acquire(blocking=False):
+            return  # another thread is already checking
+        try:
+            self._next_check = time.monotonic() + self.check_interval
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError as e:
+                logger.error("Event catalog unavailable, keeping version %s: %s", self._catalog.version, e)
+                return
+            if mtime == self._mtime:
+                return
+            self._mtime = mtime
+            try:
+                catalog = load_catalog(self.path)
+            except CatalogError as e:
+                logger.error("Event catalog reload failed, keeping version %s: %s", self._catalog.version, e)
+                return
+            if catalog.version != self._catalog.version:
+                logger.info("Event catalog reloaded: version %s -> %s", self._catalog.version, catalog.version)
+                self._catalog = catalog
+        finally:
+            self._lock.release()
@@ -0,0 +1,129 @@
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def collapse_stack(frame):
+    """Root-first ``a;b;c`` stack of a frame, the format flamegraph.pl and speedscope read"""
+    labels = []
+    while frame is not None:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class SlowRequestProfiler:
+    """Sampling profiler that keeps stacks only for requests slower than a threshold.
+
+    While enabled, one background thread wakes every ``interval`` seconds and
+    samples the stack of every thread currently serving a request (via
+    ``sys._current_frames()``). When a request finishes above ``threshold``
+    seconds its samples are written to ``output_dir`` as a folded-stacks file
+    (``<stack> <count>`` per line); faster requests are simply dropped.
+    """
+
+    def __init__(self, threshold, interval=0.005, output_dir="profiles", max_files=200):
+        self.threshold = threshold
+        self.interval = interval
+        self.output_dir = output_dir
+        self.max_files = max_files
+
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> Counter of collapsed stacks
+        self._thread = None
+        self._written = 0
+        self._sampled = 0
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            os.makedirs(self.output_dir, exist_ok=True)
+            self._thread = threading.Thread(target=self._run, name="slow-request-profiler", daemon=True)
+            self._thread.start()
+
+    def begin(self):
+        """Start collecting samples for the calling (request) thread"""
+        with self._lock:
+            self._active[threading.get_ident()] = Counter()
+
+    def end(self, duration, label):
+        """Stop sampling this thread; dump its stacks if the request was slow"""
+        with self._lock:
+            samples = self._active.pop(threading.get_ident(), None)
+        if samples is None or duration < self.threshold or not samples:
+            return None
+        return self._dump(samples, duration, label)
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for thread_id, samples in active:
+                frame = frames.get(thread_id)
+                if frame is None or thread_id == own_id:
+                    continue
+                stack = collapse_stack(frame)
+                with self._lock:
+                    samples[stack] += 1
+                    self._sampled += 1
+
+    def _dump(self, samples, duration, label):
+        with self._lock:
+            if self._written >= self.max_files:
+                return None
+            self._written += 1
+        safe_label = re.sub(r"[^A-Za-z0-9_.-]+", "_", label)[:80]
+        filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}_{int(duration * 1000)}ms_{safe_label}.folded"
+        path = os.path.join(self.output_dir, filename)
+        with open(path, "w") as fh:
+            for stack, count in samples.most_common():
+                fh.write(f"{stack} {count}\n")
+        logger.warning("Slow request profiled: %s", path,
+                       extra={"duration_ms": round(duration * 1000, 1), "samples": sum(samples.values())})
+        return path
+
+    def stats(self):
+        with self._lock:
+            return {
+                "threshold_ms": self.threshold * 1000,
+                "interval_ms": self.interval * 1000,
+                "in_flight": len(self._active),
+                "samples": self._sampled,
+                "profiles_written": self._written,
+            }
+
+
+def init_slow_request_profiler(app, profiler):
+    """Sample every request and keep the stacks of the slow ones"""
+    from flask import g, request
+
+    @app.before_request
+    def _begin_profile():
+        profiler.start()
+        g.profile_started = time.perf_counter()
+        profiler.begin()
+
+    @app.teardown_request
+    def _end_profile(exc):
+        started = g.get("profile_started")
+        if started is not None:
+            label = f"{request.method}_{request.endpoint or 'unmatched'}_{g.get('request_id', '')}"
+            profiler.end(time.perf_counter() - started, label)
@@ -0,0 +1,75 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from io import BytesIO
+
+import qrcode
+
+
+def render_qr_png(payload):
+    """Render a payload to PNG bytes with the same settings the form has always used"""
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size=10,
+        border=4,
+    )
+    qr.add_data(payload)
+    qr.make(fit=True)
+    img = qr.make_image(fill_color="black", back_color="white")
+
+    buffer = BytesIO()
+    img.save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+class QRCodeCache:
+    """Thread-safe LRU cache of rendered QR PNGs keyed by payload.
+
+    ``get()`` returns ``(png_bytes, etag)``. Concurrent misses for the same
+    payload may both render; the result is identical so either copy wins.
+    """
+
+    def __init__(self, maxsize=256, renderer=render_qr_png):
+        self.maxsize = maxsize
+        self.renderer = renderer
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, payload):
+        with self._lock:
+            entry = self._entries.get(payload)
+            if entry is not None:
+                self._entries.move_to_end(payload)
+                self._hits += 1
+                return entry
+            self._misses += 1
+
+        png = self.renderer(payload)
+        entry = (png, hashlib.sha1(png).hexdigest())
+
+        with self._lock:
+            self._entries[payload] = entry
+            self._entries.move_to_end(payload)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    def prewarm(self, payloads):
+        """Render every payload up front so the first scans are cache hits"""
+        count = 0
+        for payload in payloads:
+            self.get(payload)
+            count += 1
+        return count
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
@@ -0,0 +1,200 @@
+import hashlib
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Header spellings seen in bank / UPI statement exports, per field we need
+STATEMENT_COLUMNS = {
+    "txn_time": ("txn_time", "transaction date", "txn date", "date", "value date", "timestamp", "date/time"),
+    "amount": ("credit", "credit amount", "deposit", "deposit amt.", "amount", "cr amount"),
+    "reference": ("reference", "utr", "utr no", "upi ref", "upi ref no", "ref no", "ref no./cheque no.",
+                  "transaction id", "txn id", "rrn"),
+    "narration": ("narration", "description", "remarks", "particulars", "details"),
+    "direction": ("type", "dr/cr", "cr/dr", "transaction type"),
+}
+
+# Narration tokens shorter than this are never taken for a roll number
+MIN_REFERENCE_TOKEN = 4
+
+# Folds amount (paise) and epoch seconds into one int64 sort key: amount * span + seconds
+AMOUNT_KEY_SPAN = 10 ** 10
+
+MATCH_REFERENCE = "reference"
+MATCH_AMOUNT_TIME = "amount_time"
+
+
+class StatementError(ValueError):
+    """The statement file is missing a column we cannot do without"""
+
+
+def _pick_column(columns, aliases):
+    normalized = {re.sub(r"\s+", " ", str(column)).strip().lower(): column for column in columns}
+    for alias in aliases:
+        if alias in normalized:
+            return normalized[alias]
+    return None
+
+
+def to_paise(values):
+    """Amounts as integer paise, so equality joins are exact"""
+    cleaned = pd.to_numeric(values.astype(str).str.replace(r"[^\d.\-]", "", regex=True), errors="coerce")
+    return (cleaned * 100).round().astype("Int64")
+
+
+def credit_fingerprints(statement):
+    """SHA-1 of time, amount and narration per credit: its identity across statement exports
+
+    Stored with the registration a credit verified, so the same credit
+    cannot be used again by a later run even when it has no bank reference.
+    """
+    keys = (
+        statement["txn_time"].dt.strftime("%Y-%m-%d %H:%M:%S") + "|" + statement["amount"].astype(str) + "|"
+        + statement["narration"].astype(str).str.upper().str.replace(r"\s+", " ", regex=True).str.strip()
+    )
+    return keys.map(lambda key: hashlib.sha1(key.encode()).hexdigest())
+
+
+def load_statement(source, dayfirst=True):
+    """Credits from a statement CSV as a DataFrame: credit_id, txn_time, amount, reference, narration, fingerprint
+
+    ``amount`` is in paise. Debit rows, blank amounts and unparseable
+    dates are dropped. Each credit keeps a stable ``credit_id`` (its row
+    position in the file) so it can be used at most once, and a
+    ``fingerprint`` (see credit_fingerprints) that identifies it across files.
+    """
+    raw = pd.read_csv(source, dtype=str, keep_default_na=False, skipinitialspace=True)
+    picked = {field: _pick_column(raw.columns, aliases) for field, aliases in STATEMENT_COLUMNS.items()}
+    missing = [field for field in ("txn_time", "amount") if picked[field] is None]
+    if missing:
+        raise StatementError(f"Statement has no {' / '.join(missing)} column (found: {', '.join(raw.columns)})")
+
+    statement = pd.DataFrame({
+        "credit_id": range(len(raw)),
+        "txn_time": pd.to_datetime(raw[picked["txn_time"]], dayfirst=dayfirst, errors="coerce"),
+        "amount": to_paise(raw[picked["amount"]]),
+        "reference": raw[picked["reference"]].str.strip() if picked["reference"] else "",
+        "narration": raw[picked["narration"]] if picked["narration"] else "",
+    })
+    if picked["direction"]:
+        direction = raw[picked["direction"]].str.strip().str.upper()
+        statement = statement[~direction.isin(["DR", "DEBIT", "D"])]
+    statement = statement.dropna(subset=["txn_time", "amount"])
+    statement = statement[statement["amount"] > 0]
+    # Overlapping exports repeat lines; a bank reference identifies one credit
+    has_reference = statement["reference"] != ""
+    statement = statement[~(has_reference & statement["reference"].duplicated())]
+    statement["amount"] = statement["amount"].astype("int64")
+    statement["fingerprint"] = credit_fingerprints(statement)
+    statement = statement[~statement["fingerprint"].duplicated()]
+    return statement.reset_index(drop=True)
+
+
+def registrations_frame(rows):
+    """DataFrame of (id, roll_no, total_amount, created_at) rows in the shape match_payments() takes"""
+    registrations = pd.DataFrame.from_records(
+        rows, columns=["registration_id", "roll_no", "total_amount", "created_at"]
+    )
+    registrations["amount"] = to_paise(registrations["total_amount"]).fillna(0).astype("int64")
+    registrations["created_at"] = pd.to_datetime(registrations["created_at"])
+    registrations["roll_no"] = registrations["roll_no"].astype(str)
+    return registrations.drop(columns="total_amount")
+
+
+def without_used_credits(statement, used_references, used_fingerprints):
+    """Drop credits whose bank reference or fingerprint is already recorded against a registration"""
+    if not used_references and not used_fingerprints:
+        return statement
+    used = statement["reference"].isin(used_references) | statement["fingerprint"].isin(used_fingerprints)
+    return statement[~used].reset_index(drop=True)
+
+
+def _match_by_reference(statement, registrations):
+    """Credits whose narration carries a registration's roll number, at the same amount"""
+    tokens = statement[["credit_id", "amount", "narration"]].copy()
+    tokens["token"] = tokens["narration"].str.upper().str.findall(rf"[A-Z0-9]{{{MIN_REFERENCE_TOKEN},}}")
+    tokens = tokens.explode("token").dropna(subset=["token"])
+
+    roll_keys = registrations[["registration_id", "amount", "roll_no"]].copy()
+    roll_keys["token"] = roll_keys["roll_no"].str.upper().str.replace(r"\s+", "", regex=True)
+
+    matched = tokens.merge(roll_keys, on=["token", "amount"])[["registration_id", "credit_id"]]
+    # A credit names one student; a student who paid twice keeps the first credit
+    matched = matched.drop_duplicates("credit_id").sort_values("credit_id").drop_duplicates("registration_id")
+    return matched
+
+
+def _epoch_seconds(values):
+    return values.to_numpy(dtype="datetime64[s]").astype("int64")
+
+
+def _window(sorted_keys, low, high):
+    """Position of the first key in [low, high] and how many keys fall there"""
+    first = np.searchsorted(sorted_keys, low, side="left")
+    return first, np.searchsorted(sorted_keys, high, side="right") - first
+
+
+def _match_by_amount_time(statement, registrations, before, after):
+    """Pair credits and registrations that are each other's only candidate
+
+    A registration's candidates are the credits of the same amount from
+    ``before`` ahead of it to ``after`` behind it. Pairs are accepted only
+    when the registration has exactly one candidate and that credit has
+    exactly one registration in reach; anything ambiguous is left for a
+    human. Amount and time are folded into one sortable key so both window
+    counts are plain searchsorted calls.
+    """
+    before, after = int(before.total_seconds()), int(after.total_seconds())
+    credit_keys = statement["amount"].to_numpy() * AMOUNT_KEY_SPAN + _epoch_seconds(statement["txn_time"])
+    reg_keys = registrations["amount"].to_numpy() * AMOUNT_KEY_SPAN + _epoch_seconds(registrations["created_at"])
+
+    credit_order = np.argsort(credit_keys, kind="stable")
+    first_credit, credits_in_reach = _window(credit_keys[credit_order], reg_keys - before, reg_keys + after)
+    _, regs_in_reach = _window(np.sort(reg_keys), credit_keys - after, credit_keys + before)
+
+    single = credits_in_reach == 1
+    candidate = credit_order[first_credit[single]]
+    mutual = regs_in_reach[candidate] == 1
+    pairs = pd.DataFrame({
+        "registration_id": registrations["registration_id"].to_numpy()[single][mutual],
+        "credit_id": statement["credit_id"].to_numpy()[candidate[mutual]],
+    })
+    logger.info("Amount/time candidates", extra={
+        "unique": len(pairs), "ambiguous": int((credits_in_reach > 1).sum()), "none": int((credits_in_reach == 0).sum())
+    })
+    return pairs
+
+
+def match_payments(statement, registrations, window_before=pd.Timedelta(minutes=60),
+                   window_after=pd.Timedelta(minutes=10), reference_only=False):
+    """Match statement credits to unverified registrations
+
+    ``registrations`` needs registration_id, roll_no, amount (paise) and
+    created_at. Roll numbers found in the narration win first; the rest
+    is paired on amount and time where that is unambiguous (see
+    _match_by_amount_time) unless ``reference_only``. Returns one row per
+    match: registration_id, credit_id, reference, txn_time, amount,
+    fingerprint and method.
+    """
+    by_reference = _match_by_reference(statement, registrations)
+    by_reference["method"] = MATCH_REFERENCE
+    matches = [by_reference]
+
+    if not reference_only:
+        remaining_credits = statement[~statement["credit_id"].isin(by_reference["credit_id"])]
+        remaining_regs = registrations[~registrations["registration_id"].isin(by_reference["registration_id"])]
+        by_time = _match_by_amount_time(remaining_credits, remaining_regs, window_before, window_after)
+        by_time["method"] = MATCH_AMOUNT_TIME
+        matches.append(by_time)
+
+    matched = pd.concat(matches, ignore_index=True).merge(
+        statement[["credit_id", "reference", "txn_time", "amount", "fingerprint"]], on="credit_id"
+    )
+    logger.info("Payments matched", extra={
+        "credits": len(statement), "registrations": len(registrations),
+        "by_reference": len(by_reference), "by_amount_time": len(matched) - len(by_reference),
+    })
+    return matched.sort_values("registration_id").reset_index(drop=True)
@@ -0,0 +1,166 @@
+import logging
+import random
+from collections import defaultdict
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+# Dimensions of the registration_stats summary table
+TOTAL = "total"
+EVENT = "event"
+COLLEGE = "college"
+
+COUNTERS = ("registrations", "revenue", "submitted", "verified", "event_entries")
+
+# Every summary row is split over SHARDS counter rows, summed when read. A
+# transaction adds its delta to one random shard, so concurrent inserts
+# only wait on each other's row locks when they pick the same shard,
+# instead of all queueing on ('total', '') until the other commits.
+SHARDS = 16
+
+UPSERT_QUERY = """
+INSERT INTO registration_stats
+(dimension, name, shard, registrations, revenue, submitted, verified, event_entries)
+VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+ON DUPLICATE KEY UPDATE
+    registrations = registrations + VALUES(registrations),
+    revenue = revenue + VALUES(revenue),
+    submitted = submitted + VALUES(submitted),
+    verified = verified + VALUES(verified),
+    event_entries = event_entries + VALUES(event_entries)
+"""
+
+EVENTS_INSERT_QUERY = "INSERT INTO registration_events (registration_id, event) VALUES (%s, %s)"
+
+
+def split_events(events):
+    """Event names of a registration's ``events`` column (joined with ", ")"""
+    seen = []
+    for event in (events or "").split(", "):
+        event = event.strip()
+        if event and event not in seen:
+            seen.append(event)
+    return seen
+
+
+class StatsDelta:
+    """Counter changes for a group of registrations, summed per summary row.
+
+    A registration counts once towards the overall row, its college's row
+    and each of its events' rows. Revenue is tracked overall and per
+    college only; a registration's amount is not split across its events.
+    """
+
+    def __init__(self):
+        self._rows = defaultdict(lambda: [0, Decimal(0), 0, 0, 0])
+
+    def _bump(self, key, values):
+        row = self._rows[key]
+        for i, value in enumerate(values):
+            row[i] += value
+
+    def add(self, registration):
+        events = split_events(registration["events"])
+        amount = Decimal(str(registration.get("total_amount") or 0))
+        status = registration.get("payment_status") or "Submitted"
+        submitted = int(status == "Submitted")
+        verified = int(status == "Verified")
+
+        self._bump((TOTAL, ""), (1, amount, submitted, verified, len(events)))
+        self._bump((COLLEGE, registration["college"]), (1, amount, submitted, verified, len(events)))
+        for event in events:
+            self._bump((EVENT, event), (1, 0, submitted, verified, 1))
+
+    def change_status(self, registration, old_status, new_status):
+        """Move a registration's submitted/verified counts from one payment status to another"""
+        submitted = int(new_status == "Submitted") - int(old_status == "Submitted")
+        verified = int(new_status == "Verified") - int(old_status == "Verified")
+        if not submitted and not verified:
+            return
+        keys = [(TOTAL, ""), (COLLEGE, registration["college"])]
+        keys.extend((EVENT, event) for event in split_events(registration["events"]))
+        for key in keys:
+            self._bump(key, (0, 0, submitted, verified, 0))
+
+    def rows(self, shard=0):
+        # Sorted so concurrent transactions lock the summary rows in the same order
+        return [(dimension, name, shard, *values) for (dimension, name), values in sorted(self._rows.items())]
+
+    def __bool__(self):
+        return bool(self._rows)
+
+
+def apply_delta(cursor, delta, shard=None):
+    """Add a StatsDelta to one shard of the summary rows (random by default), on the caller's transaction"""
+    if delta:
+        cursor.executemany(UPSERT_QUERY, delta.rows(random.randrange(SHARDS) if shard is None else shard))
+
+
+def record_registrations(cursor, inserted):
+    """Write the event rows and summary updates for freshly inserted registrations
+
+    ``inserted`` is a list of ``(registration_id, registration_data)``. Runs
+    on the caller's cursor so it commits (or rolls back) together with the
+    INSERT into registrations.
+    """
+    delta = StatsDelta()
+    event_rows = []
+    for registration_id, registration in inserted:
+        delta.add(registration)
+        event_rows.extend((registration_id, event) for event in split_events(registration["events"]))
+    if event_rows:
+        cursor.executemany(EVENTS_INSERT_QUERY, event_rows)
+    apply_delta(cursor, delta)
+
+
+def rebuild(cursor, batch_size=1000):
+    """Recompute the whole summary from the registrations table; returns the row count
+
+    Meant for the migration that introduces the table and for repairing
+    drift, with registrations quiet: inserts committed while it runs may be
+    counted twice or not at all.
+    """
+    delta = StatsDelta()
+    cursor.execute("SELECT college, events, total_amount, payment_status FROM registrations")
+    count = 0
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for college, events, total_amount, payment_status in rows:
+            delta.add({"college": college, "events": events,
+                       "total_amount": total_amount, "payment_status": payment_status})
+        count += len(rows)
+
+    cursor.execute("DELETE FROM registration_stats")
+    apply_delta(cursor, delta, shard=0)
+    logger.info("Registration stats rebuilt", extra={"registrations": count})
+    return count
+
+
+def read(cursor):
+    """The summary as ``{"totals": {...}, "events": [...], "colleges": [...]}``
+
+    Reads O((events + colleges) * SHARDS) rows, however many registrations
+    there are. Events and colleges are sorted by registrations, most first.
+    """
+    cursor.execute(
+        f"SELECT dimension, name, {', '.join(f'SUM({counter})' for counter in COUNTERS)} "
+        f"FROM registration_stats GROUP BY dimension, name"
+    )
+    summary = {"totals": dict.fromkeys(COUNTERS, 0), "events": [], "colleges": []}
+    for dimension, name, *values in cursor.fetchall():
+        entry = dict(zip(COUNTERS, values))
+        entry["revenue"] = Decimal(str(entry["revenue"]))
+        for counter in COUNTERS:
+            if counter != "revenue":
+                entry[counter] = int(entry[counter])
+        if dimension == TOTAL:
+            summary["totals"] = entry
+        elif dimension == EVENT:
+            summary["events"].append({"name": name, **entry})
+        elif dimension == COLLEGE:
+            summary["colleges"].append({"name": name, **entry})
+    for key in ("events", "colleges"):
+        summary[key].sort(key=lambda entry: (-entry["registrations"], entry["name"]))
+    return summary
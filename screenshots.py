@@ -0,0 +1,104 @@
+import io
+import os
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Formats a payment screenshot may arrive in, as identified by Pillow from the bytes
+ACCEPTED_FORMATS = {"PNG", "JPEG"}
+
+# Refuse anything that would decode to more than this many pixels (~4x a phone screenshot)
+MAX_PIXELS = 40_000_000
+
+
+class InvalidScreenshot(ValueError):
+    """The upload is not a usable PNG/JPEG image"""
+
+
+def validate_screenshot(stream):
+    """Check the real image type and size of an uploaded file; returns the Pillow format name
+
+    Only the header and chunk structure are read (``Image.verify()``), not
+    the pixels, so this is cheap enough for the request path. The stream is
+    rewound afterwards so it can still be saved.
+    """
+    position = stream.tell()
+    try:
+        with Image.open(stream) as img:
+            image_format = img.format
+            width, height = img.size
+            if image_format not in ACCEPTED_FORMATS:
+                raise InvalidScreenshot(f"Unsupported image type: {image_format or 'unknown'}")
+            if width * height > MAX_PIXELS:
+                raise InvalidScreenshot(f"Image is too large ({width}x{height})")
+            img.verify()
+    except InvalidScreenshot:
+        raise
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError) as e:
+        raise InvalidScreenshot(f"Not a valid image: {e}")
+    finally:
+        stream.seek(position)
+    return image_format
+
+
+class ScreenshotNormalizer:
+    """Downscale and re-encode a screenshot so every upload is small and uniform.
+
+    Files already within ``max_bytes`` and ``max_side`` are left untouched.
+    Anything else is rotated per its EXIF orientation, flattened onto white,
+    shrunk so its longest side is at most ``max_side`` and encoded as JPEG
+    (or WebP: smaller, but several times slower to encode). If the result is
+    still over ``max_bytes`` the quality is stepped down, then the image is
+    shrunk further. Called as ``normalizer(path)``; the file is rewritten in
+    place. Returns the resulting size in bytes.
+    """
+
+    def __init__(self, max_side=1920, max_bytes=400 * 1024, quality=82, min_quality=50, image_format="JPEG"):
+        self.max_side = max_side
+        self.max_bytes = max_bytes
+        self.quality = quality
+        self.min_quality = min_quality
+        self.image_format = (image_format or "JPEG").upper()
+        self._save_options = {"method": 4} if self.image_format == "WEBP" else {"optimize": True}
+
+    def encode(self, img):
+        """Encoded bytes of ``img`` within max_bytes where possible"""
+        side = self.max_side
+        while True:
+            scaled = img.copy()
+            scaled.thumbnail((side, side), Image.LANCZOS)
+            quality = self.quality
+            while True:
+                buffer = io.BytesIO()
+                scaled.save(buffer, format=self.image_format, quality=quality, **self._save_options)
+                data = buffer.getvalue()
+                if len(data) <= self.max_bytes or quality <= self.min_quality:
+                    break
+                quality -= 10
+            # Text in a screenshot stops being legible below ~800px on the long side
+            if len(data) <= self.max_bytes or side <= 800:
+                return data
+            side = int(side * 0.75)
+
+    def __call__(self, path):
+        size = os.path.getsize(path)
+        try:
+            with Image.open(path) as img:
+                if size <= self.max_bytes and max(img.size) <= self.max_side:
+                    return size
+                img = ImageOps.exif_transpose(img)
+                if img.mode in ("RGBA", "LA", "P"):
+                    img = img.convert("RGBA")
+                    background = Image.new("RGB", img.size, (255, 255, 255))
+                    background.paste(img, mask=img.getchannel("A"))
+                    img = background
+                elif img.mode != "RGB":
+                    img = img.convert("RGB")
+                data = self.encode(img)
+        except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError, ValueError) as e:
+            raise InvalidScreenshot(f"Cannot decode screenshot: {e}")
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp_path, path)
+        return len(data)
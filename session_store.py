@@ -0,0 +1,195 @@
+import json
+import logging
+import re
+import secrets
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+from flask.sessions import SessionInterface, SessionMixin
+from werkzeug.datastructures import CallbackDict
+
+from sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+_SID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{43}$")
+
+# Payloads above this many bytes are stored zlib-compressed
+COMPRESS_ABOVE = 256
+
+
+def dumps(data):
+    """Compact session encoding: minified JSON, zlib-compressed when that pays off"""
+    raw = json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(raw) > COMPRESS_ABOVE:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return b"z" + packed
+    return b"j" + raw
+
+
+def loads(blob):
+    blob = bytes(blob)
+    if blob[:1] == b"z":
+        return json.loads(zlib.decompress(blob[1:]))
+    return json.loads(blob[1:])
+
+
+# ---------------- BACKENDS ----------------
+class MemorySessionBackend:
+    """In-process LRU of encoded sessions with a TTL; for a single worker process"""
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # sid -> (expires_at, blob)
+        self._evicted = 0
+        self._expired = 0
+
+    def get(self, sid):
+        with self._lock:
+            entry = self._entries.get(sid)
+            if entry is None:
+                return None
+            expires_at, blob = entry
+            if expires_at <= time.time():
+                del self._entries[sid]
+                self._expired += 1
+                return None
+            self._entries.move_to_end(sid)
+            return blob
+
+    def set(self, sid, blob):
+        with self._lock:
+            self._entries[sid] = (time.time() + self.ttl, blob)
+            self._entries.move_to_end(sid)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self._evicted += 1
+
+    def delete(self, sid):
+        with self._lock:
+            self._entries.pop(sid, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._entries),
+                "bytes": sum(len(blob) for _, blob in self._entries.values()),
+                "maxsize": self.maxsize,
+                "evicted": self._evicted,
+                "expired": self._expired,
+            }
+
+
+class SQLiteSessionBackend(SQLiteStore):
+    """Sessions in a local SQLite file, shared by every worker process on the host.
+
+    Each thread keeps its own connection. Expired rows are skipped on read
+    and purged in bulk at most every ``purge_interval`` seconds.
+    """
+
+    table = "sessions"
+
+    def __init__(self, path, ttl=3600, purge_interval=60):
+        super().__init__(path, purge_interval)
+        self.ttl = ttl
+        with self._connection() as connection:
+            connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sessions (
+                    sid TEXT PRIMARY KEY,
+                    data BLOB NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+                """
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_sessions_expires ON sessions (expires_at)")
+
+    def get(self, sid):
+        row = self._connection().execute(
+            "SELECT data FROM sessions WHERE sid = ? AND expires_at > ?", (sid, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, sid, blob):
+        now = time.time()
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO sessions (sid, data, expires_at) VALUES (?, ?, ?)",
+            (sid, blob, now + self.ttl)
+        )
+        self._maybe_purge(connection, now)
+
+    def delete(self, sid):
+        self._connection().execute("DELETE FROM sessions WHERE sid = ?", (sid,))
+
+    def stats(self):
+        count, size = self._connection().execute(
+            "SELECT COUNT(*), COALESCE(SUM(LENGTH(data)), 0) FROM sessions WHERE expires_at > ?", (time.time(),)
+        ).fetchone()
+        return {"backend": "sqlite", "sessions": count, "bytes": size, "expired_purged": self.purged}
+
+
+# ---------------- FLASK INTERFACE ----------------
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps session data in a backend; the cookie only carries a random session id.
+
+    A cookie is issued only once something is written to the session, so
+    anonymous visitors stay cookie-less (and cacheable). Emptying the
+    session deletes it from the backend and clears the cookie.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if sid and _SID_PATTERN.match(sid):
+            blob = self.backend.get(sid)
+            if blob is not None:
+                try:
+                    return ServerSideSession(loads(blob), sid=sid)
+                except (ValueError, zlib.error) as e:
+                    logger.warning("Discarding unreadable session: %s", e)
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        cookie_name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if not session:
+            if session.modified and not session.new:
+                self.backend.delete(session.sid)
+                response.delete_cookie(cookie_name, domain=domain, path=path)
+            return
+        if not session.modified:
+            return
+
+        self.backend.set(session.sid, dumps(dict(session)))
+        response.set_cookie(
+            cookie_name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
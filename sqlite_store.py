@@ -0,0 +1,45 @@
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """Base for key/value tables in a local SQLite file shared by the worker processes on a host.
+
+    Each thread keeps its own autocommit connection (WAL, synchronous=NORMAL).
+    Subclasses set ``table``, which needs an ``expires_at`` column, and call
+    ``_maybe_purge()`` from a write path; expired rows are then deleted in
+    bulk at most every ``purge_interval`` seconds, counted in ``purged``.
+    """
+
+    table = None
+
+    def __init__(self, path, purge_interval=60):
+        self.path = path
+        self.purge_interval = purge_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._next_purge = 0.0
+        self._purged = 0
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _maybe_purge(self, connection, now):
+        with self._lock:
+            if now < self._next_purge:
+                return
+            self._next_purge = now + self.purge_interval
+        purged = connection.execute(f"DELETE FROM {self.table} WHERE expires_at <= ?", (now,)).rowcount
+        with self._lock:
+            self._purged += purged
+
+    @property
+    def purged(self):
+        with self._lock:
+            return self._purged
@@ -0,0 +1,83 @@
+import io
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+from PIL import Image
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+# app reads its configuration at import time
+WORKDIR = tempfile.mkdtemp(prefix="zeal_tests_")
+os.environ.setdefault("LOG_LEVEL", "CRITICAL")
+os.environ.setdefault("UPLOAD_SPOOL_DIR", os.path.join(WORKDIR, "spool"))
+os.environ.setdefault("SESSION_BACKEND", "memory")
+os.environ.setdefault("RATE_LIMIT_ENABLED", "0")
+os.environ.setdefault("SCREENSHOT_UPLOADER", "local")
+os.environ.setdefault("IDEMPOTENCY_BACKEND", "sqlite")
+os.environ.setdefault("IDEMPOTENCY_SQLITE_PATH", os.path.join(WORKDIR, "idempotency.sqlite3"))
+os.environ.setdefault("IDEMPOTENCY_WAIT_MS", "0")
+os.environ.setdefault("TICKET_SECRETS", "test-ticket-secret")
+
+
+@pytest.fixture(scope="session")
+def app_module():
+    """The app module on a SQLite stand-in database, with uploads kept in memory"""
+    import app
+    import standins
+
+    standins.install_sqlite(app, os.path.join(WORKDIR, "app.sqlite3"))
+    app.upload_queue.uploader = lambda path, roll_no: f"/uploads/{roll_no}.img"
+    return app
+
+
+@pytest.fixture
+def client(app_module):
+    return app_module.app.test_client()
+
+
+@pytest.fixture(scope="session")
+def screenshot():
+    buffer = io.BytesIO()
+    Image.new("RGB", (64, 64), (200, 200, 200)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture
+def final_form(app_module, screenshot):
+    """Factory for a fresh student's final-step form carrying ``request_key``"""
+    def make(request_key=""):
+        token = uuid.uuid4().hex[:10]
+        event = next(name for name in app_module.pricing_engine.catalog().prices if " - " not in name)
+        return {
+            "step": "final",
+            "request_key": request_key,
+            "student_name": f"Test {token}",
+            "roll_no": f"T{token}",
+            "email": f"t{token}@example.com",
+            "course": "B.Tech CSE",
+            "college": "Bennett University",
+            "contact_numbers": "9999999999",
+            "group_members": "",
+            "events": event,
+            "payment_screenshot": (io.BytesIO(screenshot), "payment.png"),
+        }
+    return make
+
+
+@pytest.fixture
+def count_rows(app_module):
+    """Registrations stored under a roll number"""
+    def count(roll_no):
+        connection = app_module.get_db_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT COUNT(*) FROM registrations WHERE roll_no = %s", (roll_no,))
+            return cursor.fetchone()[0]
+        finally:
+            connection.close()
+    return count
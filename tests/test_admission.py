@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+
+import admission
+from admission import ConcurrencyLimiter, RateLimiter, retry_after_header
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(admission.time, "monotonic", clock)
+    return clock
+
+
+def test_bucket_allows_a_burst_then_refills_at_the_rate(clock):
+    limiter = RateLimiter("roll", rate=0.5, burst=3)
+    assert [limiter.hit("R1") for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert limiter.hit("R1") == pytest.approx(2.0)
+    assert limiter.hit("R2") == 0.0
+
+    clock.now += 2
+    assert limiter.hit("R1") == 0.0
+    assert limiter.hit("R1") > 0
+
+    clock.now += 3600
+    assert [limiter.hit("R1") for _ in range(4)][-1] > 0  # refill stops at the burst
+    stats = limiter.stats()
+    assert (stats["allowed"], stats["rejected"], stats["keys"]) == (8, 3, 2)
+
+
+def test_least_recently_used_keys_are_evicted(clock):
+    limiter = RateLimiter("ip", rate=1, burst=1, maxsize=2)
+    limiter.hit("a")
+    limiter.hit("b")
+    limiter.hit("a")
+    limiter.hit("c")  # evicts "b"
+    assert limiter.hit("b") == 0.0  # back with a full bucket
+    assert limiter.stats()["evicted"] == 2
+
+
+def test_concurrency_limiter_turns_away_once_full():
+    limiter = ConcurrencyLimiter("final", limit=2, wait=0)
+    assert limiter.acquire() and limiter.acquire()
+    assert not limiter.acquire()
+    limiter.release()
+    assert limiter.acquire()
+    assert limiter.stats() == {"limit": 2, "in_flight": 2, "peak": 2, "admitted": 3, "rejected": 1}
+
+
+def test_concurrency_limiter_waits_briefly_for_a_slot():
+    limiter = ConcurrencyLimiter("qr", limit=1, wait=5)
+    limiter.acquire()
+    threading.Timer(0.05, limiter.release).start()
+    assert limiter.acquire()
+
+
+def test_retry_after_is_whole_seconds():
+    assert retry_after_header(0.01) == "1"
+    assert retry_after_header(2.2) == "3"
+
+
+def test_registration_steps_are_rate_limited_and_capped(app_module, monkeypatch):
+    monkeypatch.setattr(app_module, "RATE_LIMIT_ENABLED", True)
+    monkeypatch.setattr(app_module, "roll_limiter", RateLimiter("roll", rate=0.1, burst=1))
+    monkeypatch.setattr(app_module, "step_limiters", {"final": ConcurrencyLimiter("final", limit=1, wait=0)})
+
+    with app_module.app.test_request_context():
+        assert app_module.admit_step("final", "R1") is None
+        busy = app_module.admit_step("final", "R2")
+        assert busy.status_code == 503
+        assert busy.headers["Retry-After"] == "1"
+
+        limited = app_module.admit_step("details", " r1 ")
+        assert limited.status_code == 429
+        assert limited.headers["Retry-After"] == "10"
@@ -0,0 +1,37 @@
+import pytest
+
+from batch_writer import BatchWriter
+
+
+def test_results_go_to_their_own_callers():
+    def flush(items):
+        return [ValueError(item) if item % 5 == 0 else item * 10 for item in items]
+
+    writer = BatchWriter(flush, max_batch=8, max_wait=0.05)
+    futures = {item: writer.submit(item) for item in range(1, 21)}
+    for item, future in futures.items():
+        if item % 5 == 0:
+            with pytest.raises(ValueError):
+                future.result(timeout=5)
+        else:
+            assert future.result(timeout=5) == item * 10
+    stats = writer.stats()
+    assert stats["items"] == 20
+    assert stats["largest_batch"] <= 8
+
+
+def test_flush_exception_fails_the_whole_batch():
+    writer = BatchWriter(lambda items: 1 / 0, max_wait=0.05)
+    futures = [writer.submit(item) for item in range(3)]
+    for future in futures:
+        with pytest.raises(ZeroDivisionError):
+            future.result(timeout=5)
+
+
+def test_short_result_list_fails_the_unmatched_items():
+    writer = BatchWriter(lambda items: items[:1], max_batch=3, max_wait=1)
+    futures = [writer.submit(item) for item in range(3)]
+    assert futures[0].result(timeout=5) == 0
+    for future in futures[1:]:
+        with pytest.raises(RuntimeError, match="1 results for 3 items"):
+            future.result(timeout=5)
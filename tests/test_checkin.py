@@ -0,0 +1,101 @@
+import uuid
+
+import pytest
+
+import checkin
+from checkin import ADMITTED, ALREADY_CHECKED_IN, INVALID, PAYMENT_UNVERIFIED, WRONG_EVENT, CheckInLog, CheckInService
+from tickets import TicketSigner
+
+SIGNER = TicketSigner(["gate-secret"])
+
+
+@pytest.fixture
+def log_path(tmp_path):
+    return str(tmp_path / "scans.jsonl")
+
+
+def gate(log_path, **options):
+    return CheckInService(SIGNER, CheckInLog(log_path, durable=False), **options)
+
+
+def test_entrance_admits_each_registration_once(log_path):
+    entrance = gate(log_path)
+    ticket = SIGNER.issue(1, ["Quiz"], "Submitted")
+    assert entrance.scan(ticket)["result"] == ADMITTED
+    assert entrance.scan(ticket)["result"] == ALREADY_CHECKED_IN
+    invalid = entrance.scan(TicketSigner(["stolen"]).issue(2, ["Quiz"], "Verified"))
+    assert (invalid["result"], invalid["reason"], invalid["registration_id"]) == (INVALID, "bad signature", None)
+    assert entrance.stats() == {"gate": "", "admitted": 1, ADMITTED: 1, ALREADY_CHECKED_IN: 1, INVALID: 1}
+
+
+def test_event_gate_checks_events_and_payment(log_path):
+    dance = gate(log_path, gate="Dance Competition", require_verified=True)
+    assert dance.scan(SIGNER.issue(1, ["Dance Competition - Solo"], "Verified"))["result"] == ADMITTED
+    assert dance.scan(SIGNER.issue(2, ["Dance Competition Finals"], "Verified"))["result"] == WRONG_EVENT
+    assert dance.scan(SIGNER.issue(3, ["Dance Competition"], "Submitted"))["result"] == PAYMENT_UNVERIFIED
+    assert checkin.attends(["Robo Wars - Heavy"], "Robo Wars - Heavy")
+
+
+def test_admissions_survive_a_restart_per_gate(log_path):
+    ticket = SIGNER.issue(5, ["Quiz"], "Verified")
+    first = gate(log_path, gate="Quiz")
+    first.scan(ticket)
+    first.log.close()
+
+    assert gate(log_path, gate="Quiz").scan(ticket)["result"] == ALREADY_CHECKED_IN
+    assert gate(log_path).scan(ticket)["result"] == ADMITTED
+
+
+def test_torn_last_line_is_closed_off_and_skipped(log_path):
+    log = CheckInLog(log_path, durable=False)
+    log.append({"scan_id": "a"})
+    log.close()
+    with open(log_path, "ab") as fh:
+        fh.write(b'{"scan_id": "tor')
+
+    log = CheckInLog(log_path, durable=False)
+    log.append({"scan_id": "b"})
+    assert [record["scan_id"] for _, record in log.records()] == ["a", "b"]
+
+
+def test_sync_resumes_after_a_failed_push(log_path):
+    log = CheckInLog(log_path, durable=False)
+    for number in range(5):
+        log.append({"scan_id": str(number)})
+
+    received = []
+
+    def push(batch):
+        if len(received) == 2:
+            raise ConnectionError("server unreachable")
+        received.append([record["scan_id"] for record in batch])
+
+    with pytest.raises(ConnectionError):
+        log.sync(push, batch_size=2)
+    assert received == [["0", "1"], ["2", "3"]]
+
+    received.clear()
+    assert log.sync(push, batch_size=2) == 1
+    assert received == [["4"]]
+    assert log.sync(push) == 0
+
+
+def test_sync_endpoint_stores_each_scan_once(client, app_module, monkeypatch, log_path):
+    monkeypatch.setattr(app_module, "CHECKIN_SYNC_TOKEN", "sync-token")
+    device = f"gate-{uuid.uuid4().hex[:6]}"
+    entrance = CheckInService(SIGNER, CheckInLog(log_path, durable=False), device=device)
+    scans = [entrance.scan(SIGNER.issue(number, ["Quiz"], "Verified")) for number in (1, 2, 1)]
+
+    headers = {"Authorization": "Bearer sync-token"}
+    assert client.post("/checkin/sync", json={"scans": scans}, headers={"Authorization": "Bearer x"}).status_code == 403
+    assert client.post("/checkin/sync", json={"scans": "nope"}, headers=headers).status_code == 400
+    assert client.post("/checkin/sync", json={"scans": scans}, headers=headers).json == {"received": 3, "stored": 3}
+    assert client.post("/checkin/sync", json={"scans": scans}, headers=headers).json == {"received": 3, "stored": 0}
+
+    connection = app_module.get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT result FROM checkins WHERE device = %s ORDER BY scanned_at", (device,))
+        assert [row[0] for row in cursor.fetchall()] == [ADMITTED, ADMITTED, ALREADY_CHECKED_IN]
+    finally:
+        connection.close()
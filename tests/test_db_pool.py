@@ -0,0 +1,103 @@
+import threading
+import time
+
+import pytest
+
+from db_pool import ConnectionPool, PoolTimeout
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.in_transaction = False
+        self.fail_rollback = False
+        self.fail_ping = False
+
+    def rollback(self):
+        if self.fail_rollback:
+            raise OSError("connection lost")
+        self.in_transaction = False
+
+    def ping(self, reconnect=False):
+        if self.fail_ping:
+            raise OSError("server has gone away")
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def pool():
+    pool = ConnectionPool({}, size=2, timeout=0.1, ping_interval=0)
+    pool._connect = FakeConnection
+    return pool
+
+
+def test_connections_are_reused(pool):
+    first = pool.acquire()
+    raw = first._connection
+    first.close()
+    first.close()
+    second = pool.acquire()
+    assert second._connection is raw
+    second.close()
+    stats = pool.stats()
+    assert (stats["open"], stats["idle"], stats["in_use"], stats["checkouts"]) == (1, 1, 0, 2)
+
+
+def test_exhausted_pool_times_out(pool):
+    held = [pool.acquire(), pool.acquire()]
+    started = time.monotonic()
+    with pytest.raises(PoolTimeout):
+        pool.acquire()
+    assert time.monotonic() - started >= 0.1
+    assert pool.stats()["timeouts"] == 1
+    assert pool.stats()["waiters"] == 0
+    for connection in held:
+        connection.close()
+
+
+def test_waiter_gets_returned_connection(pool):
+    held = [pool.acquire(), pool.acquire()]
+    threading.Timer(0.02, held[0].close).start()
+    connection = pool.acquire(timeout=2)
+    assert connection._connection is held[0]._connection
+    connection.close()
+    held[1].close()
+
+
+def test_unusable_connections_are_discarded(pool):
+    broken = pool.acquire()
+    broken._connection.in_transaction = True
+    broken._connection.fail_rollback = True
+    broken.close()
+    assert broken._connection.closed
+
+    stale = pool.acquire()
+    stale._connection.fail_ping = True
+    stale.close()
+    fresh = pool.acquire()
+    assert fresh._connection is not stale._connection and stale._connection.closed
+    fresh.close()
+
+    stats = pool.stats()
+    assert stats["discarded"] == 2
+    assert (stats["open"], stats["in_use"]) == (1, 0)
+
+
+def test_close_all_retires_checked_out_connections(pool):
+    idle, held = pool.acquire(), pool.acquire()
+    idle.close()
+    pool.close_all()
+    assert idle._connection.closed and not held._connection.closed
+    assert pool.stats()["open"] == 1
+
+    held.close()
+    assert held._connection.closed
+    stats = pool.stats()
+    assert (stats["open"], stats["idle"], stats["in_use"]) == (0, 0, 0)
+
+    after = pool.acquire()
+    assert after._connection not in (idle._connection, held._connection)
+    after.close()
+    assert not after._connection.closed and pool.stats()["idle"] == 1
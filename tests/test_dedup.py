@@ -0,0 +1,67 @@
+import uuid
+
+from dedup import BloomFilter, RegistrationFilter
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bloom = BloomFilter(2000, error_rate=0.01)
+    for number in range(2000):
+        bloom.add(f"roll:r{number}")
+    assert all(f"roll:r{number}" in bloom for number in range(2000))
+    false_positives = sum(f"roll:x{number}" in bloom for number in range(10000))
+    assert false_positives < 300
+
+
+def test_filter_answers_maybe_until_it_is_built():
+    registrations = RegistrationFilter(capacity=100)
+    assert registrations.might_exist("R1", "a@example.com")
+
+    registrations.rebuild([(3, "R1", "a@example.com"), (9, "R2", "b@example.com")])
+    assert registrations.last_id == 9
+    # Keys are normalized the way MySQL compares them
+    assert registrations.might_exist(" r1 ", "new@example.com")
+    assert registrations.might_exist("R9", "B@Example.com ")
+    assert not registrations.might_exist("R3", "c@example.com")
+    stats = registrations.stats()
+    assert (stats["db_checks"], stats["skipped_db_checks"]) == (2, 1)
+
+
+def test_add_since_advances_last_id_and_sizes_for_growth():
+    registrations = RegistrationFilter()
+    registrations.rebuild([(1, "R1", "a@example.com")], expected=1)
+    registrations.add_since([(5, "R5", "e@example.com"), (4, "R4", "d@example.com")])
+    assert registrations.last_id == 5
+    assert registrations.might_exist("R4", "")
+    assert not registrations.is_saturated()
+
+    small = RegistrationFilter()
+    small.rebuild([])
+    for number in range(small.stats()["capacity"] // 2 + 1):
+        small.add(f"R{number}", f"{number}@example.com")
+    assert small.is_saturated()
+
+
+def test_database_check_finds_roll_number_or_email(app_module, count_rows):
+    roll_no = f"D{uuid.uuid4().hex[:10]}"
+    email = f"{roll_no.lower()}@example.com"
+    connection = app_module.get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute(
+            "INSERT INTO registrations (student_name, roll_no, email, course, college, events, "
+            "contact_numbers, total_amount, payment_status, payment_screenshot_url) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+            ("Dup Check", roll_no, email, "B.Tech", "Bennett University", "Hackathon", "9999999999", 200,
+             "Submitted", ""),
+        )
+        connection.commit()
+    finally:
+        connection.close()
+    assert count_rows(roll_no) == 1
+
+    assert app_module.is_already_registered(roll_no, "other@example.com", use_filter=False)
+    assert app_module.is_already_registered("NOBODY", email, use_filter=False)
+    assert not app_module.is_already_registered("NOBODY", "nobody@example.com", use_filter=False)
+
+    app_module.load_registration_filter()
+    assert app_module.is_already_registered(roll_no, "other@example.com")
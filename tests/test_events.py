@@ -0,0 +1,28 @@
+from werkzeug.datastructures import MultiDict
+
+from events import parse_events_with_categories
+
+PARENTS = frozenset({"Dance Competition", "Singing"})
+
+
+def test_parents_take_categories_in_form_order():
+    form = MultiDict([
+        ("events", "Hackathon"), ("events", "Dance Competition"), ("events", "Singing"),
+        ("category_Dance_Competition", "Solo"), ("category_Singing", ""), ("category_Other", "Duet"),
+    ])
+    assert parse_events_with_categories(form, PARENTS) == [
+        "Hackathon", "Dance Competition - Solo", "Singing - Duet"
+    ]
+
+
+def test_parent_without_category_left_is_kept_plain():
+    form = MultiDict([("events", "Dance Competition"), ("events", "Singing"), ("category_Dance_Competition", "Solo")])
+    assert parse_events_with_categories(form, PARENTS) == ["Dance Competition - Solo", "Singing"]
+
+
+def test_index_keys_are_not_matched_by_position():
+    # As in the original parser: category_1 is handed out in form order, not to event 1
+    form = MultiDict([("events", "Hackathon"), ("events", "Singing"), ("category_1", "Group")])
+    assert parse_events_with_categories(form, PARENTS) == ["Hackathon", "Singing - Group"]
+    form = MultiDict([("events", "Hackathon"), ("events", "Quiz"), ("category_1", "Group")])
+    assert parse_events_with_categories(form, PARENTS) == ["Hackathon", "Quiz"]
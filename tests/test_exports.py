@@ -0,0 +1,70 @@
+import csv
+import io
+import os
+import zipfile
+from datetime import datetime
+
+from openpyxl import load_workbook
+
+import exports
+
+
+def registration(number):
+    return {
+        'id': number, 'student_name': f"Student {number}", 'roll_no': f"R{number:04d}",
+        'email': f"s{number}@example.com", 'course': 'B.Tech', 'college': 'Bennett University',
+        'events': 'Hackathon', 'total_amount': 200, 'payment_status': 'Verified',
+        'created_at': datetime(2026, 2, 1, 9, 30, 0),
+    }
+
+
+def test_csv_is_streamed_in_chunks(monkeypatch):
+    monkeypatch.setattr(exports, 'CHUNK_SIZE', 256)
+    chunks = list(exports.iter_csv(registration(n) for n in range(1, 51)))
+    assert len(chunks) > 1
+    text = ''.join(chunks)
+    assert text.startswith('\ufeff')
+
+    rows = list(csv.reader(io.StringIO(text.lstrip('\ufeff'))))
+    assert rows[0] == exports.EXPORT_COLUMNS
+    assert len(rows) == 51
+    assert rows[1][exports.EXPORT_COLUMNS.index('roll_no')] == 'R0001'
+    assert rows[1][exports.EXPORT_COLUMNS.index('created_at')] == '01-02-2026 09:30:00'
+    assert rows[1][exports.EXPORT_COLUMNS.index('college_id')] == ''
+
+
+def test_xlsx_holds_every_row_past_the_width_sample(tmp_path, monkeypatch):
+    monkeypatch.setattr(exports, 'WIDTH_SAMPLE_ROWS', 5)
+    path = str(tmp_path / 'export.xlsx')
+    assert exports.write_xlsx((registration(n) for n in range(1, 13)), path) == 12
+
+    sheet = load_workbook(path, read_only=True)['Registrations']
+    rows = list(sheet.iter_rows(values_only=True))
+    assert list(rows[0]) == exports.EXPORT_COLUMNS
+    assert [row[exports.EXPORT_COLUMNS.index('id')] for row in rows[1:]] == list(range(1, 13))
+
+
+def test_column_widths_are_capped():
+    widths = exports.column_widths([['x' * 200, None]], columns=['long', 'empty_column'])
+    assert widths == [exports.MAX_COLUMN_WIDTH, len('empty_column') + 2]
+
+
+def test_roster_names_are_safe_for_files_and_sheets():
+    assert exports.roster_name('Robo Wars: Finals [Open]') == 'Robo Wars- Finals -Open'
+    assert exports.roster_name('a/b\\c') == 'a-b-c'
+    assert exports.roster_name(' ?* ') == 'event'
+
+
+def test_rosters_are_zipped_and_removed(tmp_path):
+    events = ['Hackathon', 'Robo Wars: Finals']
+    rosters = list(exports.iter_rosters(events, lambda event: [registration(1), registration(2)], str(tmp_path)))
+    assert [(event, count) for event, _, count in rosters] == [('Hackathon', 2), ('Robo Wars: Finals', 2)]
+
+    entries = [(os.path.basename(path), path) for _, path, _ in rosters]
+    archive = zipfile.ZipFile(io.BytesIO(b''.join(exports.iter_zip(entries))))
+    assert archive.namelist() == ['Hackathon.xlsx', 'Robo Wars- Finals.xlsx']
+    assert all(info.compress_type == zipfile.ZIP_STORED for info in archive.infolist())
+    assert not any(os.path.exists(path) for _, path in entries)
+
+    sheet = load_workbook(io.BytesIO(archive.read('Hackathon.xlsx')), read_only=True).active
+    assert next(sheet.iter_rows(values_only=True)) == tuple(exports.ROSTER_COLUMNS)
@@ -0,0 +1,71 @@
+import io
+
+import pytest
+
+import idempotency
+from idempotency import MemoryIdempotencyStore, SQLiteIdempotencyStore
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, tmp_path):
+    if request.param == "memory":
+        return MemoryIdempotencyStore()
+    return SQLiteIdempotencyStore(str(tmp_path / "keys.sqlite3"))
+
+
+def test_claim_complete_replays_result(store):
+    assert store.claim("k" * 24, "roll|mail").state == idempotency.CLAIMED
+    assert store.claim("k" * 24, "roll|mail").state == idempotency.PENDING
+    store.complete("k" * 24, {"registration_id": 7})
+    assert store.claim("k" * 24, "roll|mail") == (idempotency.DONE, {"registration_id": 7})
+    assert store.claim("k" * 24, "other|mail").state == idempotency.CONFLICT
+
+
+def test_release_frees_pending_key_only(store):
+    store.claim("a" * 24, "roll|mail")
+    store.release("a" * 24)
+    assert store.claim("a" * 24, "roll|mail").state == idempotency.CLAIMED
+
+    store.complete("a" * 24, {"registration_id": 1})
+    store.release("a" * 24)
+    assert store.claim("a" * 24, "roll|mail").state == idempotency.DONE
+
+
+def test_sqlite_purges_expired_keys(tmp_path):
+    store = SQLiteIdempotencyStore(str(tmp_path / "keys.sqlite3"), lease=-1, purge_interval=0)
+    store.claim("e" * 24, "roll|mail")
+    store.claim("f" * 24, "roll|mail")
+    assert store.stats()["expired_purged"] == 1
+
+
+def test_duplicate_final_post_replays_stored_response(app_module, client, final_form, count_rows, screenshot):
+    form = final_form("r" * 24)
+    first = client.post("/", data=dict(form), content_type="multipart/form-data")
+    form["payment_screenshot"] = (io.BytesIO(screenshot), "payment.png")
+    submitted = app_module.upload_queue.stats()["submitted"]
+    second = client.post("/", data=form, content_type="multipart/form-data")
+
+    assert first.status_code == second.status_code == 200
+    assert b'class="success-content"' in first.data
+    assert second.data == first.data
+    assert count_rows(form["roll_no"]) == 1
+    assert app_module.upload_queue.stats()["submitted"] == submitted
+
+
+def test_failed_final_post_releases_key(app_module, client, final_form, count_rows, screenshot, monkeypatch):
+    form = final_form("s" * 24)
+
+    def fail(registration_data):
+        raise RuntimeError("database went away")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(app_module, "add_registration", fail)
+        failed = client.post("/", data=dict(form), content_type="multipart/form-data")
+    assert failed.status_code == 500
+    assert count_rows(form["roll_no"]) == 0
+
+    form["payment_screenshot"] = (io.BytesIO(screenshot), "payment.png")
+    retried = client.post("/", data=form, content_type="multipart/form-data")
+    assert retried.status_code == 200
+    assert b'class="success-content"' in retried.data
+    assert count_rows(form["roll_no"]) == 1
@@ -0,0 +1,161 @@
+import re
+import sqlite3
+
+import pytest
+
+import migrations
+import registration_stats
+import standins
+
+
+class MigrationCursor(standins.SQLiteCursor):
+    """SQLiteCursor that also takes the MySQL DDL and catalog queries the migrations run"""
+
+    def __init__(self, connection):
+        super().__init__(connection)
+        self._raw = connection
+        self._result = None
+
+    def execute(self, query, params=()):
+        self._result = None
+        if "GET_LOCK" in query or "RELEASE_LOCK" in query:
+            self._result = [(1,)]
+        elif "information_schema.COLUMNS" in query:
+            table, column = params
+            self._result = [(int(column in self._columns(table)),)]
+        elif "information_schema.STATISTICS" in query and "'PRIMARY'" in query:
+            primary = [row[1] for row in self._raw.execute("PRAGMA table_info(registration_stats)") if row[5]]
+            self._result = [(int("shard" in primary),)]
+        elif "information_schema.STATISTICS" in query:
+            table, index = params
+            self._result = [(int(index in [row[1] for row in self._raw.execute(f"PRAGMA index_list({table})")]),)]
+        elif query.lstrip().startswith("CREATE TABLE"):
+            self._create_table(query)
+        elif "DROP PRIMARY KEY" in query:
+            raise AssertionError("registration_stats should be created with its sharded key")
+        else:
+            super().execute(re.sub(r" AFTER \w+", "", query), params)
+
+    def _columns(self, table):
+        return [row[1] for row in self._raw.execute(f"PRAGMA table_info({table})")]
+
+    def _create_table(self, query):
+        table = re.search(r"EXISTS (\w+)", query).group(1)
+        indexes = re.findall(r",\s*INDEX (\w+) \(([^)]*)\)", query)
+        query = re.sub(r",\s*INDEX \w+ \([^)]*\)", "", query)
+        query = re.sub(r"\)\s*ENGINE=.*$", ")", query.strip(), flags=re.S)
+        query = re.sub(r"\b(BIG)?INT AUTO_INCREMENT PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT", query)
+        self._raw.execute(query)
+        for index, columns in indexes:
+            self._raw.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table} ({columns})")
+
+    def fetchone(self):
+        return self._result.pop(0) if self._result is not None else super().fetchone()
+
+    def fetchall(self):
+        if self._result is not None:
+            rows, self._result = self._result, []
+            return rows
+        return super().fetchall()
+
+
+class MigrationConnection(standins.SQLiteConnection):
+    def cursor(self, dictionary=False, buffered=None):
+        return MigrationCursor(self._connection)
+
+
+def registration(number, college="Bennett University", events="Dance Competition, Hackathon", amount=400):
+    return (f"Student {number}", f"R{number:04d}", f"s{number}@example.com", "B.Tech", college,
+            events, "9999999999", amount, "", "Submitted" if number % 3 else "Verified")
+
+
+def insert_registrations(connection, rows):
+    cursor = connection.cursor()
+    cursor.executemany(
+        "INSERT INTO registrations (student_name, roll_no, email, course, college, events, contact_numbers, "
+        "total_amount, payment_screenshot_url, payment_status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        rows
+    )
+    connection.commit()
+
+
+@pytest.fixture
+def connection(tmp_path):
+    connection = MigrationConnection(str(tmp_path / "migrate.sqlite3"))
+    yield connection
+    connection.close()
+
+
+def test_migrates_populated_database_from_version_4(connection):
+    assert migrations.migrate(connection, target=4) == [1, 2, 3, 4]
+    insert_registrations(connection, [registration(number) for number in range(1, 31)])
+
+    assert migrations.migrate(connection) == list(range(5, migrations.LATEST_VERSION + 1))
+    assert migrations.schema_version(connection) == migrations.LATEST_VERSION
+
+    cursor = connection.cursor()
+    summary = registration_stats.read(cursor)
+    assert summary["totals"]["registrations"] == 30
+    assert summary["totals"]["verified"] == 10
+    assert summary["totals"]["revenue"] == 12000
+    assert {entry["name"]: entry["registrations"] for entry in summary["events"]} == {
+        "Dance Competition": 30, "Hackathon": 30
+    }
+    cursor.execute("SELECT COUNT(*) FROM registration_events")
+    assert cursor.fetchone()[0] == 60
+    assert migrations.migrate(connection) == []
+
+
+def test_duplicate_identities_leave_unique_migration_unrecorded(connection):
+    migrations.migrate(connection, target=3)
+    insert_registrations(connection, [registration(1), registration(2)])
+    connection.cursor().execute("UPDATE registrations SET roll_no = 'R0001'")
+    connection.commit()
+
+    with pytest.raises(migrations.MigrationError, match="'R0001' x2"):
+        migrations.migrate(connection)
+    assert migrations.schema_version(connection) == 3
+
+
+def test_rerunning_every_step_adopts_an_unversioned_database(connection):
+    # Databases set up before migrations existed have the tables but no schema_migrations rows
+    migrations.migrate(connection)
+    insert_registrations(connection, [registration(number) for number in range(1, 4)])
+    connection.cursor().execute("DELETE FROM schema_migrations")
+    connection.commit()
+    assert migrations.schema_version(connection) == 0
+
+    assert migrations.migrate(connection) == list(range(1, migrations.LATEST_VERSION + 1))
+    assert migrations.pending_migrations(connection) == []
+    assert registration_stats.read(connection.cursor())["totals"]["registrations"] == 3
+
+
+def test_target_stops_early_and_leaves_the_rest_pending(connection):
+    assert migrations.migrate(connection, target=2) == [1, 2]
+    assert [version for version, _, _ in migrations.pending_migrations(connection)] == list(
+        range(3, migrations.LATEST_VERSION + 1))
+
+
+def test_readiness_follows_the_schema_version(client, app_module):
+    assert client.get("/healthz").status_code == 200
+    response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json["schema_version"] == migrations.LATEST_VERSION
+
+    database = app_module.get_db_connection()
+    try:
+        cursor = database.cursor()
+        cursor.execute("SELECT description FROM schema_migrations WHERE version = %s", (migrations.LATEST_VERSION,))
+        description = cursor.fetchone()[0]
+        cursor.execute("DELETE FROM schema_migrations WHERE version = %s", (migrations.LATEST_VERSION,))
+        database.commit()
+        try:
+            response = client.get("/readyz")
+            assert response.status_code == 503
+            assert response.json["schema_version"] == migrations.LATEST_VERSION - 1
+        finally:
+            cursor.execute("INSERT INTO schema_migrations (version, description, duration_ms) VALUES (%s, %s, 0)",
+                           (migrations.LATEST_VERSION, description))
+            database.commit()
+    finally:
+        database.close()
@@ -0,0 +1,139 @@
+import smtplib
+
+import pytest
+
+import outbox
+import standins
+from outbox import BacklogCache, OutboxDispatcher
+
+
+class FakeSMTP:
+    """Answers each recipient from ``replies`` (an exception to raise, or None to accept)"""
+
+    def __init__(self, replies):
+        self.replies = replies
+        self.delivered = []
+
+    def send_message(self, message):
+        reply = self.replies.get(message["To"])
+        if reply is not None:
+            raise reply
+        self.delivered.append(message["To"])
+
+    def quit(self):
+        pass
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = str(tmp_path / "outbox.sqlite3")
+    standins.create_schema(path)
+    return path
+
+
+def queue(database, recipients):
+    connection = standins.SQLiteConnection(database)
+    cursor = connection.cursor()
+    outbox.enqueue(cursor, [
+        outbox.confirmation(number, {"email": recipient, "student_name": "Student", "roll_no": f"R{number}",
+                                     "college": "Bennett University", "events": "Hackathon",
+                                     "total_amount": 200, "payment_status": "Submitted"})
+        for number, recipient in enumerate(recipients, start=1)
+    ])
+    connection.commit()
+    connection.close()
+
+
+def rows(database):
+    connection = standins.SQLiteConnection(database)
+    cursor = connection.cursor()
+    cursor.execute("SELECT recipient, status, attempts FROM email_outbox ORDER BY id")
+    result = cursor.fetchall()
+    connection.close()
+    return result
+
+
+def dispatcher(database, smtp, **options):
+    return OutboxDispatcher(lambda: standins.SQLiteConnection(database), lambda: smtp,
+                            lambda row: outbox.confirmation_email(row, "ZEAL <no-reply@zeal.example>"),
+                            rate=0, **options)
+
+
+def test_permanent_classifies_smtp_refusals():
+    assert outbox._permanent(smtplib.SMTPRecipientsRefused({"a@x": (550, b"no such user")}))
+    assert not outbox._permanent(smtplib.SMTPRecipientsRefused({"a@x": (550, b"no"), "b@x": (451, b"later")}))
+    assert not outbox._permanent(smtplib.SMTPSenderRefused(550, b"bad sender", "no-reply@zeal.example"))
+    assert outbox._permanent(smtplib.SMTPDataError(554, b"rejected"))
+    assert not outbox._permanent(smtplib.SMTPDataError(452, b"try later"))
+
+
+def test_sent_retried_and_failed_rows(database):
+    queue(database, ["ok@example.com", "later@example.com", "gone@example.com"])
+    smtp = FakeSMTP({
+        "later@example.com": smtplib.SMTPRecipientsRefused({"later@example.com": (451, b"greylisted")}),
+        "gone@example.com": smtplib.SMTPRecipientsRefused({"gone@example.com": (550, b"no such user")}),
+    })
+    sender = dispatcher(database, smtp, backoff_base=3600)
+
+    assert sender.drain() == 3
+    assert smtp.delivered == ["ok@example.com"]
+    assert rows(database) == [
+        ("ok@example.com", outbox.SENT, 1),
+        ("later@example.com", outbox.PENDING, 1),
+        ("gone@example.com", outbox.FAILED, 1),
+    ]
+    # The retry is backed off, so nothing is due yet
+    assert sender.drain() == 0
+    stats = sender.stats()
+    assert (stats["sent"], stats["retried"], stats["failed"]) == (1, 1, 1)
+
+
+def test_retries_stop_at_max_attempts(database):
+    queue(database, ["later@example.com"])
+    smtp = FakeSMTP({"later@example.com": smtplib.SMTPDataError(451, b"try later")})
+    sender = dispatcher(database, smtp, backoff_base=0, max_attempts=3)
+    for _ in range(3):
+        sender.drain()
+    assert rows(database) == [("later@example.com", outbox.FAILED, 3)]
+
+
+def test_unreachable_server_releases_rest_of_batch(database):
+    queue(database, ["a@example.com", "b@example.com", "c@example.com"])
+    smtp = FakeSMTP({"a@example.com": ConnectionRefusedError("connection refused")})
+    sender = dispatcher(database, smtp, backoff_base=3600)
+
+    assert sender.run_once() == 3
+    assert rows(database) == [
+        ("a@example.com", outbox.PENDING, 1),
+        ("b@example.com", outbox.PENDING, 0),
+        ("c@example.com", outbox.PENDING, 0),
+    ]
+    assert sender.stats()["released"] == 2
+    # Released rows are due again at once, with no attempt spent
+    smtp.replies.clear()
+    assert sender.drain() == 2
+    assert smtp.delivered == ["b@example.com", "c@example.com"]
+
+
+def test_backlog_cache_refreshes_at_most_every_ttl(database):
+    queue(database, ["a@example.com", "b@example.com"])
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        connection = standins.SQLiteConnection(database)
+        try:
+            return outbox.backlog(connection)
+        finally:
+            connection.close()
+
+    cache = BacklogCache(fetch, ttl=60)
+    first = cache.stats()
+    assert first["pending"] == 2 and first["failed"] == 0 and first["refresh_errors"] == 0
+    cache.stats()
+    assert len(calls) == 1
+
+    cache.fetch = lambda: 1 / 0
+    cache.refresh(force=True)
+    stale = cache.stats()
+    assert stale["pending"] == 2 and stale["refresh_errors"] == 1
@@ -0,0 +1,50 @@
+import uuid
+
+import pytest
+
+
+@pytest.fixture
+def college(app_module):
+    """A college of its own holding four registrations across overlapping event names"""
+    name = f"College {uuid.uuid4().hex[:8]}"
+    students = [
+        ("Chitra", "Dance Competition - Solo, Hackathon"),
+        ("Arjun", "Dance Competition - Solo, Dance Competition - Duet"),
+        ("Bela", "Hackathon League"),
+        ("Dev", "Quiz"),
+    ]
+    batch = []
+    for student, events in students:
+        token = uuid.uuid4().hex[:10]
+        batch.append({
+            "student_name": student, "roll_no": f"P{token}", "email": f"p{token}@example.com",
+            "course": "B.Tech", "college": name, "events": events, "contact_numbers": "9999999999",
+            "total_amount": 200, "payment_screenshot_url": "",
+        })
+    results = app_module.insert_registrations(batch, send_confirmations=False)
+    assert all(isinstance(result, int) for result in results)
+    return name
+
+
+def names(rows):
+    return [row["student_name"] for row in rows]
+
+
+def test_parent_event_lists_every_category_once(app_module, college):
+    assert names(app_module.get_event_participants("Dance Competition", college)) == ["Arjun", "Chitra"]
+    assert names(app_module.get_event_participants("Dance Competition - Duet", college)) == ["Arjun"]
+
+
+def test_event_names_match_exactly(app_module, college):
+    assert names(app_module.get_event_participants("Hackathon", college)) == ["Chitra"]
+    assert names(app_module.get_event_participants("Hackathon League", college)) == ["Bela"]
+    assert app_module.get_event_participants("Hack", college) == []
+
+
+def test_college_listing_and_admin_page_filter(app_module, college):
+    assert names(app_module.get_college_participants(college)) == ["Arjun", "Bela", "Chitra", "Dev"]
+    assert names(app_module.get_college_participants(college, event="Quiz")) == ["Dev"]
+
+    rows, next_cursor = app_module.get_registrations_page(limit=10, college=college, event="Hackathon")
+    assert names(rows) == ["Chitra"]
+    assert next_cursor is None
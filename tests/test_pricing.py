@@ -0,0 +1,79 @@
+import json
+import os
+
+import pytest
+
+from pricing import CatalogError, PricingEngine, compile_catalog, count_group_members, load_catalog
+
+RAW = {
+    "events": {"Hackathon": 200, "Quiz": 99, "Robo Wars - Light": 300, "Robo Wars - Heavy": 500},
+    "discounts": {
+        "colleges": {"Mangalmay": 50},
+        "group_size": [{"min_members": 3, "percent": 10}, {"min_members": 5, "percent": 60}],
+    },
+}
+
+
+def test_quote_applies_the_largest_discount_per_event():
+    catalog = compile_catalog(RAW, "v1")
+    assert catalog.quote(["Hackathon", "Quiz"], "Bennett University") == (299, [])
+    # 99 * 50 // 100 rounds down per event
+    assert catalog.quote(["Hackathon", "Quiz"], "Mangalmay") == (100 + 49, [])
+    assert catalog.quote(["Hackathon"], "Mangalmay", group_size=4) == (100, [])
+    assert catalog.quote(["Hackathon"], "Mangalmay", group_size=5) == (80, [])
+    assert catalog.quote(["Hackathon", "Dance"], "Bennett University") == (200, ["Dance"])
+
+
+def test_compiled_structure():
+    catalog = compile_catalog(RAW, "v1")
+    assert catalog.category_parents == {"Robo Wars"}
+    assert catalog.event_names == ("Hackathon", "Quiz", "Robo Wars")
+    assert catalog.group_discounts == ((5, 60), (3, 10))
+    menu = json.loads(catalog.client_json)["menu"]
+    assert [card["name"] for card in menu] == ["Hackathon", "Quiz", "Robo Wars"]
+    assert [category["name"] for category in menu[2]["categories"]] == ["Light", "Heavy"]
+    with pytest.raises(TypeError):
+        catalog.prices["Hackathon"] = 1
+
+
+def test_achievable_totals_pick_one_category_per_parent():
+    catalog = compile_catalog(RAW, "v1")
+    totals = catalog.achievable_totals
+    assert 200 + 99 + 500 in totals
+    assert 300 + 500 not in totals
+    assert 100 + 49 in totals
+    assert 0 not in totals
+
+
+@pytest.mark.parametrize("raw", [
+    {},
+    {"events": {"Hackathon": "free"}},
+    {"events": {}, "discounts": {"colleges": {"Mangalmay": 150}}},
+    {"events": {}, "discounts": {"group_size": [{"percent": 10}]}},
+])
+def test_malformed_catalogs_are_rejected(raw):
+    with pytest.raises(CatalogError):
+        compile_catalog(raw, "v1")
+
+
+def test_count_group_members():
+    assert count_group_members("") == 0
+    assert count_group_members(None) == 0
+    assert count_group_members("Asha, , Ravi,") == 2
+
+
+def test_engine_reloads_edits_and_keeps_the_last_good_catalog(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(RAW))
+    engine = PricingEngine(str(path), check_interval=0)
+    first = engine.catalog()
+    assert first.version == load_catalog(str(path)).version
+
+    edited = dict(RAW, events={**RAW["events"], "Quiz": 120})
+    path.write_text(json.dumps(edited))
+    os.utime(path, (1, 1))
+    assert engine.catalog().prices["Quiz"] == 120
+
+    path.write_text("{not json")
+    os.utime(path, (2, 2))
+    assert engine.catalog().prices["Quiz"] == 120
@@ -0,0 +1,49 @@
+import io
+
+from PIL import Image
+
+from qr_cache import QRCodeCache, render_qr_png
+
+
+def test_lru_keeps_recently_used_payloads():
+    rendered = []
+
+    def renderer(payload):
+        rendered.append(payload)
+        return payload.encode()
+
+    cache = QRCodeCache(maxsize=2, renderer=renderer)
+    cache.get("a")
+    cache.get("b")
+    cache.get("a")
+    cache.get("c")  # evicts "b", the least recently used
+    cache.get("a")
+    cache.get("b")
+    assert rendered == ["a", "b", "c", "b"]
+    assert cache.stats() == {"entries": 2, "maxsize": 2, "hits": 2, "misses": 4}
+
+
+def test_etag_follows_the_png_bytes():
+    cache = QRCodeCache(renderer=lambda payload: payload.encode())
+    png, etag = cache.get("upi://pay?am=200")
+    assert png == b"upi://pay?am=200"
+    assert cache.get("upi://pay?am=200")[1] == etag
+    assert cache.get("upi://pay?am=300")[1] != etag
+    assert cache.prewarm(["x", "y"]) == 2
+
+
+def test_rendered_png_is_an_image():
+    image = Image.open(io.BytesIO(render_qr_png("upi://pay?pa=zeal@upi&am=200&cu=INR")))
+    assert image.format == "PNG"
+    assert image.size[0] == image.size[1]
+
+
+def test_payment_qr_route_serves_known_totals_with_etag(client, app_module):
+    amount = min(app_module.pricing_engine.catalog().achievable_totals)
+    response = client.get(f"/qr/{amount}.png")
+    assert response.status_code == 200
+    assert response.mimetype == "image/png"
+    etag = response.headers["ETag"]
+
+    assert client.get(f"/qr/{amount}.png", headers={"If-None-Match": etag}).status_code == 304
+    assert client.get("/qr/1.png").status_code == 404
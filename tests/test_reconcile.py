@@ -0,0 +1,149 @@
+import io
+import uuid
+
+import pandas as pd
+import pytest
+
+import reconcile
+from reconcile import MATCH_AMOUNT_TIME, MATCH_REFERENCE, StatementError
+
+
+def statement(lines, header="Txn Date,Description,Ref No,Credit,Dr/Cr"):
+    return reconcile.load_statement(io.StringIO("\n".join([header, *lines])))
+
+
+def registrations(*rows):
+    return reconcile.registrations_frame([
+        (registration_id, roll_no, amount, pd.Timestamp(created_at))
+        for registration_id, roll_no, amount, created_at in rows
+    ])
+
+
+def test_statement_keeps_one_row_per_credit():
+    credits = statement([
+        "01/02/2026 10:00:00,UPI/E22CSEU0001/ZEAL,UTR001,\"1,200.50\",CR",
+        "01/02/2026 10:05:00,NEFT refund,UTR002,300,DR",
+        "01/02/2026 10:06:00,blank amount,UTR003,,CR",
+        "not a date,garbage,UTR004,100,CR",
+        "01/02/2026 10:00:00,UPI/E22CSEU0001/ZEAL,UTR001,\"1,200.50\",CR",
+        "02/02/2026 09:00:00,cash deposit,,500,CR",
+        "02/02/2026 09:00:00,  Cash   DEPOSIT ,,500,CR",
+        "02/02/2026 09:30:00,cash deposit,,500,CR",
+    ])
+    assert list(credits["reference"]) == ["UTR001", "", ""]
+    assert list(credits["amount"]) == [120050, 50000, 50000]
+    assert credits.loc[0, "txn_time"] == pd.Timestamp(2026, 2, 1, 10, 0)
+    assert list(credits["credit_id"]) == [0, 5, 7]
+    assert credits["fingerprint"].is_unique
+
+
+def test_statement_needs_date_and_amount_columns():
+    with pytest.raises(StatementError, match="amount"):
+        statement(["01/02/2026,x,UTR1"], header="Date,Narration,UTR")
+
+
+def test_roll_number_in_narration_matches_at_the_same_amount():
+    credits = statement([
+        "01/02/2026 10:00:00,UPI/e22cseu0001/ZEAL fee,UTR1,400,CR",
+        "01/02/2026 10:01:00,UPI/E22CSEU0002/ZEAL fee,UTR2,300,CR",
+        "01/02/2026 10:02:00,UPI/R7/ZEAL,UTR3,200,CR",
+    ])
+    regs = registrations(
+        (1, "E22CSEU0001", 400, "2026-02-03 12:00:00"),
+        (2, "E22CSEU0002", 400, "2026-02-03 12:00:00"),
+        (3, "R7", 200, "2026-02-03 12:00:00"),
+    )
+    matched = reconcile.match_payments(credits, regs)
+    assert list(zip(matched["registration_id"], matched["reference"], matched["method"])) == [
+        (1, "UTR1", MATCH_REFERENCE)
+    ]
+
+
+def test_a_student_who_paid_twice_keeps_the_first_credit():
+    credits = statement([
+        "01/02/2026 10:00:00,E22CSEU0001 ZEAL,UTR1,400,CR",
+        "01/02/2026 11:00:00,E22CSEU0001 ZEAL again,UTR2,400,CR",
+    ])
+    regs = registrations((1, "E22CSEU0001", 400, "2026-02-03 12:00:00"))
+    matched = reconcile.match_payments(credits, regs, reference_only=True)
+    assert list(matched["reference"]) == ["UTR1"]
+
+
+def test_amount_and_time_pair_only_when_unambiguous():
+    credits = statement([
+        "01/02/2026 10:00:00,UPI payment,UTR1,250,CR",
+        "01/02/2026 12:00:00,UPI payment,UTR2,350,CR",
+        "01/02/2026 15:00:00,UPI payment,UTR3,450,CR",
+    ])
+    regs = registrations(
+        (1, "A0001", 250, "2026-02-01 10:20:00"),
+        (2, "A0002", 350, "2026-02-01 12:15:00"),
+        (3, "A0003", 350, "2026-02-01 12:30:00"),
+        (4, "A0004", 450, "2026-02-01 18:00:00"),
+    )
+    matched = reconcile.match_payments(credits, regs)
+    assert list(zip(matched["registration_id"], matched["reference"], matched["method"])) == [
+        (1, "UTR1", MATCH_AMOUNT_TIME)
+    ]
+    assert reconcile.match_payments(credits, regs, reference_only=True).empty
+
+
+def test_used_credits_are_dropped_by_reference_or_fingerprint():
+    credits = statement([
+        "01/02/2026 10:00:00,one,UTR1,100,CR",
+        "01/02/2026 10:01:00,two,,100,CR",
+        "01/02/2026 10:02:00,three,UTR3,100,CR",
+    ])
+    assert reconcile.without_used_credits(credits, set(), set()) is credits
+    remaining = reconcile.without_used_credits(credits, {"UTR1"}, {credits.loc[1, "fingerprint"]})
+    assert list(remaining["reference"]) == ["UTR3"]
+
+
+def payment(app_module, registration_id):
+    connection = app_module.get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT payment_status, payment_reference, payment_match FROM registrations WHERE id = %s",
+                       (registration_id,))
+        return cursor.fetchone()
+    finally:
+        connection.close()
+
+
+def test_reconcile_verifies_references_and_leaves_guesses_for_review(app_module, tmp_path):
+    token = uuid.uuid4().hex[:8].upper()
+    named, guessed = f"N{token}", f"G{token}"
+    results = app_module.insert_registrations([
+        {"student_name": "Named", "roll_no": named, "email": f"{named.lower()}@example.com", "course": "B.Tech",
+         "college": "Bennett University", "events": "Hackathon", "contact_numbers": "9999999999",
+         "total_amount": 7771, "payment_screenshot_url": ""},
+        {"student_name": "Guessed", "roll_no": guessed, "email": f"{guessed.lower()}@example.com",
+         "course": "B.Tech", "college": "Bennett University", "events": "Hackathon",
+         "contact_numbers": "9999999999", "total_amount": 7772, "payment_screenshot_url": ""},
+    ], send_confirmations=False)
+    connection = app_module.get_db_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT created_at FROM registrations WHERE id = %s", (results[1],))
+        when = pd.Timestamp(cursor.fetchone()[0]).strftime("%d/%m/%Y %H:%M:%S")
+    finally:
+        connection.close()
+    path = tmp_path / "statement.csv"
+    path.write_text("\n".join([
+        "Txn Date,Description,Ref No,Credit,Dr/Cr",
+        f"{when},UPI/{named}/ZEAL,REF{token}1,7771,CR",
+        f"{when},UPI/someone/ZEAL,REF{token}2,7772,CR",
+    ]))
+    review = tmp_path / "review.csv"
+
+    summary = app_module.reconcile_payments(str(path), review_path=str(review))
+    assert (summary["by_reference"], summary["needs_review"], summary["verified"]) == (1, 1, 1)
+    assert payment(app_module, results[0]) == ("Verified", f"REF{token}1", MATCH_REFERENCE)
+    assert payment(app_module, results[1])[0] == "Submitted"
+
+    # Run again: the used credit is not offered a second time
+    assert app_module.reconcile_payments(str(path), dry_run=True)["by_reference"] == 0
+
+    assert app_module.confirm_payments(str(review)) == {"reviewed": 1, "already_used": 0, "verified": 1, "skipped": 0}
+    assert payment(app_module, results[1]) == ("Verified", f"REF{token}2", MATCH_AMOUNT_TIME)
+    assert app_module.confirm_payments(str(review))["already_used"] == 1
@@ -0,0 +1,58 @@
+import threading
+import time
+
+
+def slow_flush(app_module, monkeypatch, started, release):
+    flush = app_module.registration_writer.flush
+
+    def slow(items):
+        started.set()
+        release.wait(10)
+        return flush(items)
+
+    monkeypatch.setattr(app_module.registration_writer, "flush", slow)
+
+
+def test_slow_batch_is_waited_for(app_module, client, final_form, count_rows, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    monkeypatch.setattr(app_module, "REGISTRATION_BATCHING", True)
+    monkeypatch.setattr(app_module, "REGISTRATION_BATCH_TIMEOUT", 0.05)
+    monkeypatch.setattr(app_module, "REGISTRATION_BATCH_GIVE_UP", 10)
+    slow_flush(app_module, monkeypatch, started, release)
+
+    def finish_late():
+        started.wait(5)
+        time.sleep(0.3)
+        release.set()
+
+    threading.Thread(target=finish_late).start()
+
+    form = final_form()
+    response = client.post("/", data=form, content_type="multipart/form-data")
+    assert response.status_code == 200
+    assert count_rows(form["roll_no"]) == 1
+
+
+def test_batch_past_give_up_answers_503_and_keeps_screenshot(app_module, client, final_form, count_rows,
+                                                             monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    monkeypatch.setattr(app_module, "REGISTRATION_BATCHING", True)
+    monkeypatch.setattr(app_module, "REGISTRATION_BATCH_TIMEOUT", 0.05)
+    monkeypatch.setattr(app_module, "REGISTRATION_BATCH_GIVE_UP", 0.1)
+    slow_flush(app_module, monkeypatch, started, release)
+    submitted = app_module.upload_queue.stats()["submitted"]
+
+    form = final_form()
+    response = client.post("/", data=form, content_type="multipart/form-data")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"]
+    assert count_rows(form["roll_no"]) == 0
+    assert app_module.upload_queue.stats()["submitted"] == submitted
+
+    # The batch commits after the request gave up; its screenshot is queued against the row
+    release.set()
+    deadline = time.monotonic() + 5
+    while app_module.upload_queue.stats()["submitted"] == submitted and time.monotonic() < deadline:
+        time.sleep(0.02)
+    assert app_module.upload_queue.stats()["submitted"] == submitted + 1
+    assert count_rows(form["roll_no"]) == 1
@@ -0,0 +1,69 @@
+import pytest
+
+import registration_stats
+import standins
+
+
+@pytest.fixture
+def connection(tmp_path):
+    path = str(tmp_path / "stats.sqlite3")
+    standins.create_schema(path)
+    connection = standins.SQLiteConnection(path)
+    yield connection
+    connection.close()
+
+
+def insert(cursor, number, college, events, amount, status="Submitted"):
+    registration = {"college": college, "events": events, "total_amount": amount, "payment_status": status}
+    cursor.execute(
+        "INSERT INTO registrations (student_name, roll_no, email, course, college, events, contact_numbers, "
+        "total_amount, payment_screenshot_url, payment_status) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+        (f"Student {number}", f"R{number}", f"s{number}@example.com", "B.Tech", college, events,
+         "9999999999", amount, "", status)
+    )
+    registration_stats.record_registrations(cursor, [(cursor.lastrowid, registration)])
+    return registration
+
+
+def test_split_events_drops_blanks_and_repeats():
+    assert registration_stats.split_events("Dance, Hackathon, , Dance") == ["Dance", "Hackathon"]
+    assert registration_stats.split_events(None) == []
+
+
+def test_sharded_counts_match_rebuild(connection):
+    cursor = connection.cursor()
+    colleges = ["Bennett University", "Mangalmay Group of Institutions", "Other"]
+    events = ["Dance Competition", "Hackathon", "Dance Competition, Quiz", "Hackathon, Quiz, Debate"]
+    for number in range(200):
+        insert(cursor, number, colleges[number % 3], events[number % 4], 150 + number % 5 * 50,
+               "Verified" if number % 4 == 0 else "Submitted")
+    connection.commit()
+
+    cursor.execute("SELECT COUNT(DISTINCT shard), MAX(shard) FROM registration_stats")
+    shards, highest = cursor.fetchone()
+    assert shards > 1 and highest < registration_stats.SHARDS
+
+    incremental = registration_stats.read(cursor)
+    assert incremental["totals"]["registrations"] == 200
+    assert registration_stats.rebuild(cursor) == 200
+    connection.commit()
+    assert registration_stats.read(cursor) == incremental
+
+
+def test_status_change_moves_counts(connection):
+    cursor = connection.cursor()
+    registration = insert(cursor, 1, "Bennett University", "Dance Competition, Quiz", 300)
+    delta = registration_stats.StatsDelta()
+    delta.change_status(registration, "Submitted", "Verified")
+    registration_stats.apply_delta(cursor, delta)
+    cursor.execute("UPDATE registrations SET payment_status = 'Verified'")
+    connection.commit()
+
+    summary = registration_stats.read(cursor)
+    assert summary["totals"]["submitted"] == 0
+    assert summary["totals"]["verified"] == 1
+    assert [(entry["name"], entry["verified"]) for entry in summary["events"]] == [
+        ("Dance Competition", 1), ("Quiz", 1)
+    ]
+    registration_stats.rebuild(cursor)
+    assert registration_stats.read(cursor) == summary
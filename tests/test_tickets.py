@@ -0,0 +1,82 @@
+import pytest
+
+from tickets import TICKET_PREFIX, InvalidTicket, Ticket, TicketSigner, _b64decode, _b64encode
+
+
+def test_issued_ticket_verifies_to_its_payload():
+    signer = TicketSigner(["current"])
+    token = signer.issue(42, ["Hackathon", "Dance Competition - Solo"], "Submitted", issued_at=1760000000)
+    assert token.startswith(TICKET_PREFIX + ".")
+    assert signer.verify(f"  {token}\n") == Ticket(42, ("Hackathon", "Dance Competition - Solo"), "Submitted",
+                                                   1760000000)
+
+
+def test_rotation_signs_with_the_first_secret_and_accepts_all():
+    old = TicketSigner(["old"])
+    rotated = TicketSigner(["new", "old"])
+    retired = TicketSigner(["new"])
+
+    old_token = old.issue(1, ["Quiz"], "Verified")
+    new_token = rotated.issue(1, ["Quiz"], "Verified", issued_at=old.verify(old_token).issued_at)
+    assert rotated.verify(old_token).registration_id == 1
+    assert new_token != old_token
+    assert retired.verify(new_token).registration_id == 1
+    with pytest.raises(InvalidTicket, match="bad signature"):
+        retired.verify(old_token)
+
+
+def test_tampered_or_foreign_tokens_are_rejected():
+    signer = TicketSigner([b"secret"])
+    prefix, payload, signature = signer.issue(7, ["Quiz"], "Submitted").split(".")
+
+    verified = _b64decode(payload).replace(b'"Submitted"', b'"Verified"')
+    with pytest.raises(InvalidTicket, match="bad signature"):
+        signer.verify(f"{prefix}.{_b64encode(verified)}.{signature}")
+    with pytest.raises(InvalidTicket, match="bad signature"):
+        TicketSigner(["other"]).verify(f"{prefix}.{payload}.{signature}")
+    with pytest.raises(InvalidTicket, match="not a ticket"):
+        signer.verify("upi://pay?pa=zeal@upi")
+    with pytest.raises(InvalidTicket):
+        signer.verify(f"{prefix}.{payload}.{signature[:-2]}")
+
+
+def test_signed_but_malformed_payload_is_rejected():
+    signer = TicketSigner(["secret"])
+    signed = f"{TICKET_PREFIX}.{_b64encode(b'{}')}"
+    token = f"{signed}.{_b64encode(signer._signature(signer._macs[0], signed.encode()))}"
+    with pytest.raises(InvalidTicket, match="malformed payload"):
+        signer.verify(token)
+
+
+def test_a_secret_is_required():
+    with pytest.raises(ValueError):
+        TicketSigner([])
+
+
+def test_ticket_qr_is_resigned_once_the_payment_is_verified(client, app_module, final_form):
+    form = final_form()
+    results = app_module.insert_registrations([{
+        "student_name": form["student_name"], "roll_no": form["roll_no"], "email": form["email"],
+        "course": "B.Tech", "college": "Bennett University", "events": form["events"],
+        "contact_numbers": "9999999999", "total_amount": 200, "payment_screenshot_url": "",
+    }], send_confirmations=False)
+    registration_id = results[0]
+    token = app_module.issue_ticket(registration_id, [form["events"]], "Submitted", issued_at=1760000000)
+
+    submitted = client.get(f"/ticket/{token}.png")
+    assert submitted.status_code == 200
+    assert submitted.cache_control.no_cache
+
+    connection = app_module.get_db_connection()
+    try:
+        connection.cursor().execute("UPDATE registrations SET payment_status = 'Verified' WHERE id = %s",
+                                    (registration_id,))
+        connection.commit()
+    finally:
+        connection.close()
+
+    verified = client.get(f"/ticket/{token}.png")
+    reissued = app_module.issue_ticket(registration_id, [form["events"]], "Verified", issued_at=1760000000)
+    assert verified.headers["ETag"].strip('"') == app_module.ticket_qr_cache.get(reissued)[1]
+    assert verified.cache_control.max_age == 86400
+    assert client.get("/ticket/Z1.forged.token.png").status_code == 404
@@ -0,0 +1,160 @@
+import io
+import os
+import threading
+import time
+
+from upload_queue import UploadQueue
+
+
+class Recorder:
+    """Collects on_complete/on_failure callbacks and lets a test wait for them"""
+
+    def __init__(self):
+        self.completed = {}
+        self.failed = {}
+        self._done = threading.Semaphore(0)
+
+    def complete(self, registration_id, url):
+        self.completed[registration_id] = url
+        self._done.release()
+
+    def fail(self, registration_id, error):
+        self.failed[registration_id] = error
+        self._done.release()
+
+    def wait(self, count=1):
+        for _ in range(count):
+            assert self._done.acquire(timeout=5)
+
+
+def make_queue(tmp_path, uploader, recorder, **options):
+    queue = UploadQueue(str(tmp_path / "spool"), uploader, recorder.complete, recorder.fail,
+                        workers=1, backoff_base=0.01, backoff_max=0.01, **options)
+    queue.start()
+    return queue
+
+
+def spool_files(tmp_path, state):
+    return sorted(os.listdir(tmp_path / "spool" / state))
+
+
+def test_submitted_file_is_uploaded_and_removed(tmp_path):
+    recorder = Recorder()
+    queue = make_queue(tmp_path, lambda path, roll_no: f"/uploads/{roll_no}", recorder)
+    try:
+        queue.submit(7, "R007", io.BytesIO(b"png"))
+        recorder.wait()
+    finally:
+        queue.stop()
+    assert recorder.completed == {7: "/uploads/R007"}
+    assert spool_files(tmp_path, "pending") == []
+    assert spool_files(tmp_path, "inflight") == []
+    assert queue.stats()["completed"] == 1
+
+
+def test_upload_failures_are_retried_then_reported(tmp_path):
+    calls = []
+
+    def uploader(path, roll_no):
+        calls.append(roll_no)
+        raise OSError("cloud down")
+
+    recorder = Recorder()
+    queue = make_queue(tmp_path, uploader, recorder, max_attempts=3)
+    try:
+        job_id = queue.submit(8, "R008", io.BytesIO(b"png"))
+        recorder.wait()
+    finally:
+        queue.stop()
+    assert len(calls) == 3
+    assert recorder.failed == {8: "cloud down"}
+    assert spool_files(tmp_path, "failed") == [f"{job_id}.bin", f"{job_id}.json"]
+    stats = queue.stats()
+    assert (stats["retried"], stats["failed"]) == (2, 1)
+
+
+def test_url_is_kept_when_the_completion_callback_fails(tmp_path):
+    uploads = []
+    recorder = Recorder()
+    flaky = {"left": 1}
+
+    def complete(registration_id, url):
+        if flaky["left"]:
+            flaky["left"] -= 1
+            raise RuntimeError("database busy")
+        recorder.complete(registration_id, url)
+
+    def uploader(path, roll_no):
+        uploads.append(roll_no)
+        return f"/uploads/{roll_no}"
+
+    queue = UploadQueue(str(tmp_path / "spool"), uploader, complete, recorder.fail,
+                        workers=1, backoff_base=0.01, backoff_max=0.01)
+    queue.start()
+    try:
+        queue.submit(9, "R009", io.BytesIO(b"png"))
+        recorder.wait()
+    finally:
+        queue.stop()
+    assert uploads == ["R009"]
+    assert recorder.completed == {9: "/uploads/R009"}
+
+
+def test_preprocess_failure_is_permanent(tmp_path):
+    def preprocess(path):
+        raise ValueError("not an image")
+
+    recorder = Recorder()
+    queue = make_queue(tmp_path, lambda path, roll_no: "/never", recorder, preprocess=preprocess)
+    try:
+        queue.submit(10, "R010", io.BytesIO(b"junk"))
+        recorder.wait()
+    finally:
+        queue.stop()
+    assert recorder.failed == {10: "preprocess: not an image"}
+    assert queue.stats()["retried"] == 0
+
+
+def test_spooled_file_waits_for_enqueue_or_discard(tmp_path):
+    recorder = Recorder()
+    queue = make_queue(tmp_path, lambda path, roll_no: f"/uploads/{roll_no}", recorder)
+    try:
+        kept = queue.spool(io.BytesIO(b"png"))
+        dropped = queue.spool(io.BytesIO(b"png"))
+        assert spool_files(tmp_path, "pending") == sorted([f"{kept}.bin", f"{dropped}.bin"])
+        assert queue.stats()["submitted"] == 0
+
+        queue.discard(dropped)
+        queue.discard(dropped)
+        assert spool_files(tmp_path, "pending") == [f"{kept}.bin"]
+
+        queue.enqueue(kept, 11, "R011")
+        recorder.wait()
+    finally:
+        queue.stop()
+    assert recorder.completed == {11: "/uploads/R011"}
+
+
+def test_start_recovers_jobs_and_sweeps_stale_orphans(tmp_path):
+    pending = tmp_path / "spool" / "pending"
+    inflight = tmp_path / "spool" / "inflight"
+    pending.mkdir(parents=True)
+    inflight.mkdir()
+    (pending / "crashed.bin").write_bytes(b"png")
+    (inflight / "crashed.json").write_text(
+        '{"id": "crashed", "registration_id": 12, "roll_no": "R012", "attempts": 0, "url": null}')
+    (pending / "orphan.bin").write_bytes(b"png")
+    (pending / "fresh.bin").write_bytes(b"png")
+    old = time.time() - 3600
+    for path in (inflight / "crashed.json", pending / "orphan.bin"):
+        os.utime(path, (old, old))
+
+    recorder = Recorder()
+    queue = make_queue(tmp_path, lambda path, roll_no: f"/uploads/{roll_no}", recorder, stale_after=60)
+    try:
+        recorder.wait()
+    finally:
+        queue.stop()
+    assert recorder.completed == {12: "/uploads/R012"}
+    # A recent unqueued file may still belong to a request in progress
+    assert spool_files(tmp_path, "pending") == ["fresh.bin"]
@@ -0,0 +1,319 @@
+import heapq
+import json
+import logging
+import os
+import random
+import shutil
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+
+class LocalUploader:
+    """Stand-in for Cloudinary that copies screenshots under a local static folder"""
+
+    def __init__(self, directory="static/uploads", base_url="/static/uploads"):
+        self.directory = directory
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(directory, exist_ok=True)
+
+    def __call__(self, file, roll_no):
+        filename = f"{roll_no}_{uuid.uuid4().hex[:8]}.img"
+        shutil.copyfile(file, os.path.join(self.directory, filename))
+        return f"{self.base_url}/{filename}"
+
+
+class UploadQueue:
+    """Background payment-screenshot uploader with a durable local spool.
+
+    ``submit()`` writes the screenshot and a small JSON job record into
+    ``<spool_dir>/pending`` and returns immediately; ``spool()`` and
+    ``enqueue()`` do the same in two steps. Worker threads claim a
+    job by renaming its record into ``inflight``, call ``uploader(path,
+    roll_no)`` and hand the resulting URL to ``on_complete(registration_id,
+    url)``. An optional ``preprocess(path)`` runs first, once per job, and
+    may rewrite the file in place (e.g. shrink an image); if it raises, the
+    file is unusable and the job fails at once without retries. Upload
+    failures are retried with exponential backoff; jobs that run out of
+    attempts move to ``failed`` and are reported via ``on_failure``.
+    Jobs left behind by a crashed process are picked up again by ``start()``.
+    """
+
+    def __init__(self, spool_dir, uploader, on_complete, on_failure=None,
+                 workers=2, max_attempts=5, backoff_base=2.0, backoff_max=120.0,
+                 stale_after=600.0, preprocess=None):
+        self.spool_dir = spool_dir
+        self.uploader = uploader
+        self.preprocess = preprocess
+        self.on_complete = on_complete
+        self.on_failure = on_failure
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.stale_after = stale_after
+
+        self._pending_dir = os.path.join(spool_dir, "pending")
+        self._inflight_dir = os.path.join(spool_dir, "inflight")
+        self._failed_dir = os.path.join(spool_dir, "failed")
+
+        self._lock = threading.Condition()
+        self._heap = []  # (due_at, seq, job_id)
+        self._seq = 0
+        self._threads = []
+        self._stopping = False
+
+        self._submitted = 0
+        self._completed = 0
+        self._retried = 0
+        self._failed = 0
+        self._preprocessed = 0
+        self._bytes_in = 0
+        self._bytes_out = 0
+
+    # ---------------- LIFECYCLE ----------------
+    def start(self):
+        """Create the spool folders, recover unfinished jobs and start workers"""
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+
+        for directory in (self._pending_dir, self._inflight_dir, self._failed_dir):
+            os.makedirs(directory, exist_ok=True)
+
+        self._recover()
+
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"upload-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5.0):
+        with self._lock:
+            self._stopping = True
+            self._lock.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    # ---------------- PRODUCER ----------------
+    def submit(self, registration_id, roll_no, file):
+        """Spool an uploaded file for background upload and return its job id"""
+        return self.enqueue(self.spool(file), registration_id, roll_no)
+
+    def spool(self, file):
+        """Write an uploaded file into the spool and return a job id for ``enqueue()``
+
+        Nothing is uploaded until the job is enqueued, so callers can spool
+        before they create the registration row and ``discard()`` the file if
+        that fails. Files never enqueued are swept by ``start()``.
+        """
+        job_id = uuid.uuid4().hex
+        data_path = os.path.join(self._pending_dir, f"{job_id}.bin")
+
+        if hasattr(file, "save"):
+            file.save(data_path)
+        else:
+            with open(data_path, "wb") as fh:
+                shutil.copyfileobj(file, fh)
+        return job_id
+
+    def enqueue(self, job_id, registration_id, roll_no):
+        """Queue a spooled file for upload against its registration"""
+        job = {
+            "id": job_id,
+            "registration_id": registration_id,
+            "roll_no": roll_no,
+            "attempts": 0,
+            "url": None,
+            "created_at": time.time(),
+        }
+        self._write_job(self._pending_dir, job)
+        with self._lock:
+            self._submitted += 1
+        self._schedule(job_id, 0)
+        return job_id
+
+    def discard(self, job_id):
+        """Delete a spooled file that was never enqueued"""
+        try:
+            os.remove(os.path.join(self._pending_dir, f"{job_id}.bin"))
+        except FileNotFoundError:
+            pass
+
+    # ---------------- WORKERS ----------------
+    def _run(self):
+        while True:
+            job_id = self._next_due()
+            if job_id is None:
+                return
+            job = self._claim(job_id)
+            if job is not None:
+                self._process(job)
+
+    def _next_due(self):
+        with self._lock:
+            while True:
+                if self._stopping:
+                    return None
+                if self._heap:
+                    due_at, _, job_id = self._heap[0]
+                    delay = due_at - time.monotonic()
+                    if delay <= 0:
+                        heapq.heappop(self._heap)
+                        return job_id
+                    self._lock.wait(delay)
+                else:
+                    self._lock.wait()
+
+    def _claim(self, job_id):
+        """Move a job record into inflight; returns None if another worker owns it"""
+        src = os.path.join(self._pending_dir, f"{job_id}.json")
+        dst = os.path.join(self._inflight_dir, f"{job_id}.json")
+        try:
+            os.rename(src, dst)
+        except FileNotFoundError:
+            return None
+        with open(dst) as fh:
+            return json.load(fh)
+
+    def _process(self, job):
+        data_path = os.path.join(self._pending_dir, f"{job['id']}.bin")
+        if self.preprocess is not None and not job.get("preprocessed"):
+            if not self._preprocess(job, data_path):
+                return
+        try:
+            if not job["url"]:
+                job["url"] = self.uploader(data_path, job["roll_no"])
+                # Remember the URL so a failed DB update does not re-upload
+                self._write_job(self._inflight_dir, job)
+            self.on_complete(job["registration_id"], job["url"])
+        except Exception as e:
+            job["attempts"] += 1
+            job["last_error"] = str(e)
+            logger.warning("Screenshot upload failed (attempt %d/%d): %s",
+                           job["attempts"], self.max_attempts, e,
+                           extra={"registration_id": job["registration_id"]})
+            self._retry_or_fail(job)
+            return
+
+        self._remove(job["id"])
+        with self._lock:
+            self._completed += 1
+        logger.info("Screenshot uploaded: %s", job["url"], extra={"registration_id": job["registration_id"]})
+
+    def _preprocess(self, job, data_path):
+        """Run the preprocess hook once; a failure is permanent, so the job fails now"""
+        size_before = os.path.getsize(data_path)
+        try:
+            self.preprocess(data_path)
+        except Exception as e:
+            job["attempts"] += 1
+            job["last_error"] = f"preprocess: {e}"
+            logger.warning("Screenshot rejected during preprocessing: %s", e,
+                           extra={"registration_id": job["registration_id"]})
+            self._retry_or_fail(job, permanent=True)
+            return False
+        job["preprocessed"] = True
+        self._write_job(self._inflight_dir, job)
+        with self._lock:
+            self._preprocessed += 1
+            self._bytes_in += size_before
+            self._bytes_out += os.path.getsize(data_path)
+        return True
+
+    def _retry_or_fail(self, job, permanent=False):
+        inflight = os.path.join(self._inflight_dir, f"{job['id']}.json")
+
+        if job["attempts"] < self.max_attempts and not permanent:
+            self._write_job(self._pending_dir, job)
+            os.remove(inflight)
+            delay = min(self.backoff_base * (2 ** (job["attempts"] - 1)), self.backoff_max)
+            self._schedule(job["id"], delay * random.uniform(0.8, 1.2))
+            with self._lock:
+                self._retried += 1
+            return
+
+        self._write_job(self._failed_dir, job)
+        os.remove(inflight)
+        os.replace(
+            os.path.join(self._pending_dir, f"{job['id']}.bin"),
+            os.path.join(self._failed_dir, f"{job['id']}.bin")
+        )
+        with self._lock:
+            self._failed += 1
+        if self.on_failure is not None:
+            try:
+                self.on_failure(job["registration_id"], job.get("last_error"))
+            except Exception:
+                logger.exception("Upload failure callback raised", extra={"registration_id": job["registration_id"]})
+
+    # ---------------- SPOOL ----------------
+    def _schedule(self, job_id, delay):
+        with self._lock:
+            self._seq += 1
+            heapq.heappush(self._heap, (time.monotonic() + delay, self._seq, job_id))
+            self._lock.notify()
+
+    def _write_job(self, directory, job):
+        path = os.path.join(directory, f"{job['id']}.json")
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as fh:
+            json.dump(job, fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+
+    def _remove(self, job_id):
+        for path in (os.path.join(self._inflight_dir, f"{job_id}.json"),
+                     os.path.join(self._pending_dir, f"{job_id}.bin")):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _recover(self):
+        """Re-queue pending jobs and ones stuck inflight after a crash"""
+        now = time.time()
+        for name in os.listdir(self._inflight_dir):
+            if not name.endswith(".json"):
+                continue
+            path = os.path.join(self._inflight_dir, name)
+            try:
+                if now - os.path.getmtime(path) >= self.stale_after:
+                    os.rename(path, os.path.join(self._pending_dir, name))
+            except FileNotFoundError:
+                pass
+
+        recovered = 0
+        for name in os.listdir(self._pending_dir):
+            if name.endswith(".json"):
+                self._schedule(name[:-len(".json")], 0)
+                recovered += 1
+            elif name.endswith(".bin") and not os.path.exists(os.path.join(self._pending_dir, f"{name[:-len('.bin')]}.json")):
+                # Spooled but never enqueued: the registration insert failed or the process died first
+                path = os.path.join(self._pending_dir, name)
+                try:
+                    if now - os.path.getmtime(path) >= self.stale_after:
+                        os.remove(path)
+                except FileNotFoundError:
+                    pass
+        if recovered:
+            logger.info("Recovered %d spooled screenshot upload(s)", recovered)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "scheduled": len(self._heap),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "retried": self._retried,
+                "failed": self._failed,
+                "preprocessed": self._preprocessed,
+                "bytes_in": self._bytes_in,
+                "bytes_out": self._bytes_out,
+                "workers": len(self._threads),
+            }